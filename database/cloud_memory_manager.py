@@ -6,6 +6,14 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
 import shutil
+import sys
+
+# sqlite_pool por su nombre plano (una sola copia, compartida con ava_bot)
+AVA_BOT_DIR = str(Path(__file__).resolve().parent.parent / 'llmpagina' / 'ava_bot')
+if AVA_BOT_DIR not in sys.path:
+    sys.path.insert(0, AVA_BOT_DIR)
+
+from sqlite_pool import get_connection
 
 logger = logging.getLogger(__name__)
 
@@ -90,7 +98,7 @@ class CloudMemoryManager:
         db_path = self.memory_paths['users_db']
         
         try:
-            conn = sqlite3.connect(db_path)
+            conn = get_connection(db_path)
             cursor = conn.cursor()
             
             # Tabla de usuarios
@@ -146,8 +154,7 @@ class CloudMemoryManager:
         db_path = self.memory_paths['memory_db']
         
         try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
+            conn = get_connection(db_path, row_factory=sqlite3.Row)
             cursor = conn.cursor()
             
             # Tabla de conversaciones
@@ -210,8 +217,7 @@ class CloudMemoryManager:
         db_path = self.memory_paths['multimodal_db']
         
         try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
+            conn = get_connection(db_path, row_factory=sqlite3.Row)
             cursor = conn.cursor()
             
             # Tabla principal de memoria multimodal
@@ -432,7 +438,7 @@ class CloudMemoryManager:
         
         for db_name, db_path in db_paths.items():
             try:
-                conn = sqlite3.connect(db_path)
+                conn = get_connection(db_path)
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
                 tables = [row[0] for row in cursor.fetchall()]
@@ -1,16 +1,25 @@
 import sqlite3
+import sys
 import uuid
 import logging
 from datetime import datetime, timedelta
+from pathlib import Path
 from werkzeug.security import generate_password_hash
 
+# Módulos de AVA por su nombre plano, igual que los importan ava_bot y sus workers:
+# una sola entrada en sys.path => un solo pool de conexiones por proceso
+AVA_BOT_DIR = str(Path(__file__).resolve().parent.parent / 'llmpagina' / 'ava_bot')
+if AVA_BOT_DIR not in sys.path:
+    sys.path.insert(0, AVA_BOT_DIR)
+
+from sqlite_pool import database_path, get_connection
+from stats_rollups import ensure_login_rollups
+
 logger = logging.getLogger(__name__)
 
 def get_db_connection():
-    """Obtener conexión a la base de datos"""
-    conn = sqlite3.connect('instance/users.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Obtener conexión a la base de datos (del pool; conn.close() la devuelve)"""
+    return get_connection(database_path('users'), row_factory=sqlite3.Row)
 
 def init_db():
     """Inicializar base de datos - Solo usuarios y autenticación"""
@@ -68,6 +77,9 @@ def init_db():
     _create_default_users(cursor)
     
     conn.commit()
+    
+    # Agregados de login_attempts para el dashboard (mantenidos por triggers)
+    ensure_login_rollups(conn)
     conn.close()
     logger.info("Base de datos inicializada correctamente")
 
@@ -5,7 +5,7 @@ import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List, Union
-from groq import Groq
+from groq import AsyncGroq
 from mcp_client import MCPClient
 import re
 from dataclasses import dataclass
@@ -16,6 +16,10 @@ from role_promt import get_role_prompt
 from operational_promt import get_operational_prompt
 from tools.adapters.memory_adapter import SQLiteMemoryManager, MemoryAdapter
 from tools.adapters.multimodal_memory_adapter import MultimodalMemoryAdapter
+from ipc_protocol import (
+    encode_frame, decode_line, extract_generated_images,
+    REQUEST_MESSAGE, REQUEST_PING, FRAME_READY, FRAME_TEXT, FRAME_IMAGE, FRAME_ERROR, FRAME_END
+)
 
 # Setup logging - COMPLETAMENTE SILENCIOSO
 logging.basicConfig(
@@ -302,17 +306,26 @@ class LLMWithMCPTools:
     """LLM Groq Llama con herramientas MCP + MEMORIA MULTIMODAL AUTOMÁTICA"""
     
     def __init__(self, groq_api_key: str, mcp_server_path: str):
-        self.groq_client = Groq(api_key=groq_api_key)
+        # ✅ CLIENTE ASÍNCRONO: una sola conexión HTTP reutilizada, sin bloquear el event loop
+        self.groq_client = AsyncGroq(api_key=groq_api_key)
         self.config = AvaConfig()
         
         if not os.path.exists(mcp_server_path):
             raise FileNotFoundError(f"MCP server not found at: {mcp_server_path}")
         
-        self.mcp_client = MCPClient([sys.executable, mcp_server_path, "server"])
+        # ✅ EL SERVIDOR MCP SIEMPRE CORRE DESDE EL DIRECTORIO DE AVA (rutas relativas de imágenes)
+        self.mcp_client = MCPClient(
+            [sys.executable, mcp_server_path, "server"],
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
         self.available_tools = []
         self.conversation_history = []
+        self.last_tool_results = []  # Resultados de herramientas del último turno
+        self._event_callback = None  # Receptor de eventos del turno actual (tool, token, reset)
+        self._emitted_chars = 0      # Caracteres ya transmitidos de la última llamada al LLM
         self.current_user_email = None
         self._cached_schemas = {}
+        self._background_tasks = set()  # Guardados en memoria que corren tras responder
         
         # ✅ INICIALIZAR AMBOS SISTEMAS DE MEMORIA
         self._initialize_memory()
@@ -467,7 +480,7 @@ class LLMWithMCPTools:
         # ✅ 3. MEMORIA TRADICIONAL como fallback rápido
         else:
             if self.memory_adapter:
-                traditional_context = self._get_traditional_memory_context_sync(user_id)
+                traditional_context = await asyncio.to_thread(self._get_traditional_memory_context_sync, user_id)
                 if traditional_context:
                     context_parts.append(f"\n📊 INFO BÁSICA:\n{traditional_context}")
         
@@ -537,13 +550,14 @@ class LLMWithMCPTools:
             logger.error(f"Error memoria rápida: {e}")
             return ""
 
-    async def _extract_and_store_multimodal_memory(self, user_input: str, response: str) -> bool:
+    async def _extract_and_store_multimodal_memory(self, user_input: str, response: str,
+                                                   user_id: Optional[str] = None) -> bool:
         """✅ GUARDADO MULTIMODAL SIMPLIFICADO - SIN DUPLICACIÓN"""
         if not self.multimodal_memory:
             return False
         
         try:
-            user_id = self.current_user_email or "unknown_user"
+            user_id = user_id or self.current_user_email or "unknown_user"
             session_id = f"auto_session_{datetime.now().strftime('%Y%m%d_%H%M')}"
             
             # Combinar contenido
@@ -619,28 +633,111 @@ class LLMWithMCPTools:
                 
         return False  # Por defecto NO guardar
 
-    def _save_conversation_simple(self, user_input: str, response: str):
-        """Guarda conversación SOLO en historial local + SQLite básico"""
-        # Historial local
-        self.conversation_history.append({
-            'role': 'assistant',
-            'content': response,
-            'timestamp': datetime.now().isoformat()
-        })
-        
+    def _save_conversation_simple(self, user_input: str, response: str, user_id: Optional[str] = None):
+        """Encola la conversación para SQLite básico (write-behind: no espera al commit)"""
         # SQLite básico si está disponible
         if self.memory_adapter:
             try:
-                user_id = self.current_user_email or "unknown_user"
+                user_id = user_id or self.current_user_email or "unknown_user"
                 if hasattr(self.memory_adapter, 'add_conversation'):
                     self.memory_adapter.add_conversation(user_id, user_input, response)
-                print(f"💬 Mensaje agregado a SQLite para {user_id}")
             except Exception:
                 pass
 
+    def _emit(self, event_type: str, **data):
+        """Notifica un evento del turno (ej. ejecución de herramienta) al receptor registrado"""
+        if self._event_callback:
+            try:
+                self._event_callback(event_type, data)
+            except Exception:
+                pass
+
+    def _run_in_background(self, coro):
+        """Lanza trabajo no crítico del turno (guardados) sin retrasar la respuesta"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _save_turn_memory(self, user_input: str, response: str, user_id: str):
+        """Persiste el turno: SQLite por la cola write-behind y memoria multimodal si es importante.
+
+        user_id se fija al lanzar la tarea: cuando se ejecuta, el worker puede
+        estar ya atendiendo el turno de otro usuario.
+        """
+        self._save_conversation_simple(user_input, response, user_id=user_id)
+        
+        if await self._should_store_in_multimodal_memory(user_input, response):
+            await self._extract_and_store_multimodal_memory(user_input, response, user_id=user_id)
+            print("🧠 Guardado en memoria multimodal")
+
+    async def _complete(self, messages: List[Dict], temperature: float, max_tokens: int, hold_on_json: bool = False) -> str:
+        """Llama al LLM. Con receptor de eventos activo transmite los tokens a medida que llegan.
+
+        hold_on_json deja de transmitir al aparecer '{' (posible solicitud de herramienta);
+        el llamador decide luego si libera el resto o descarta lo enviado con un evento 'reset'.
+        """
+        self._emitted_chars = 0
+        
+        if not self._event_callback:
+            response = await self.groq_client.chat.completions.create(
+                messages=messages,
+                model=self.config.PRIMARY_MODEL,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return response.choices[0].message.content
+        
+        stream = await self.groq_client.chat.completions.create(
+            messages=messages,
+            model=self.config.PRIMARY_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        
+        parts = []
+        holding = False
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            
+            if holding:
+                continue
+            if hold_on_json and '{' in delta:
+                holding = True
+                delta = delta[:delta.index('{')]
+            if delta:
+                self._emitted_chars += len(delta)
+                self._emit("token", text=delta)
+        
+        return "".join(parts)
+
+    async def process_user_input(self, user_input: str, on_event=None,
+                                 user_email: Optional[str] = None,
+                                 history: Optional[List[Dict]] = None) -> str:
+        """Procesa un turno; on_event(tipo, datos) recibe los eventos intermedios.
+
+        Con history (aunque sea una lista vacía) el turno pertenece a una sesión
+        externa (pool de workers): el historial y el email del usuario se
+        reemplazan por los de esa sesión en vez de arrastrar los del turno anterior.
+        """
+        if history is not None:
+            self.conversation_history = list(history)
+            self.current_user_email = user_email or None
+        self._event_callback = on_event
+        try:
+            return await self._process_user_input(user_input)
+        finally:
+            self._event_callback = None
+
     @handle_errors(default_return="Error procesando solicitud")
-    async def process_user_input(self, user_input: str) -> str:
+    async def _process_user_input(self, user_input: str) -> str:
         """✅ PROCESADOR PRINCIPAL CON MEMORIA SELECTIVA"""
+        self.last_tool_results = []
+        
         # ✅ AÑADIR A MEMORIA LOCAL
         self.conversation_history.append({
             'role': 'user',
@@ -657,14 +754,17 @@ class LLMWithMCPTools:
         # ✅ GENERAR RESPUESTA
         final_response = await self._generate_llm_response(user_input, memory_context)
         
-        # ✅ GUARDAR EN SQLITE (siempre, es rápido)
-        self._save_conversation_simple(user_input, final_response)
+        # ✅ HISTORIAL LOCAL INMEDIATO (el siguiente turno lo necesita)
+        self.conversation_history.append({
+            'role': 'assistant',
+            'content': final_response,
+            'timestamp': datetime.now().isoformat()
+        })
         
-        # ✅ MEMORIA MULTIMODAL SOLO SI ES IMPORTANTE
-        should_store_multimodal = await self._should_store_in_multimodal_memory(user_input, final_response)
-        if should_store_multimodal:
-            await self._extract_and_store_multimodal_memory(user_input, final_response)
-            print("🧠 Guardado en memoria multimodal")
+        # ✅ SQLITE + MEMORIA MULTIMODAL EN BACKGROUND, SIN RETRASAR LA RESPUESTA
+        self._run_in_background(
+            self._save_turn_memory(user_input, final_response, self.current_user_email or "unknown_user")
+        )
         
         return final_response
 
@@ -699,22 +799,27 @@ class LLMWithMCPTools:
                 {"role": "user", "content": user_input}
             ]
             
-            # STEP 7: PRIMERA LLAMADA AL LLM - SILENCIOSA
-            response = self.groq_client.chat.completions.create(
-                messages=messages,
-                model=self.config.PRIMARY_MODEL,
+            # STEP 7: PRIMERA LLAMADA AL LLM - SILENCIOSA (stream retenido si aparece JSON)
+            first_llm_response = await self._complete(
+                messages,
                 temperature=self.config.DECISION_TEMPERATURE,
-                max_tokens=1500
+                max_tokens=1500,
+                hold_on_json=True
             )
             
-            first_llm_response = response.choices[0].message.content
-            
             # STEP 8: Tool extraction - SILENCIOSO
             tool_request = JSONUtils.extract_tool_request(first_llm_response)
             
             if tool_request:
+                # Lo transmitido era texto previo a la herramienta, no la respuesta final
+                if self._emitted_chars:
+                    self._emit("reset")
                 return await self._execute_tool_and_respond(user_input, tool_request, memory_context, first_llm_response)
             
+            # No era herramienta: liberar lo retenido
+            if self._event_callback and self._emitted_chars < len(first_llm_response):
+                self._emit("token", text=first_llm_response[self._emitted_chars:])
+            
             return first_llm_response
         
         except Exception as e:
@@ -754,7 +859,12 @@ Analiza la solicitud del usuario: "{user_input}"
         arguments = tool_request['arguments']
         
         # ✅ EJECUTAR HERRAMIENTA REAL - SIN PRINTS
+        self._emit("tool", name=tool_name, status="started", arguments=arguments)
         tool_result = await self.execute_tool(tool_name, arguments)
+        self.last_tool_results.append({'tool': tool_name, 'arguments': arguments, 'result': tool_result})
+        
+        failed = isinstance(tool_result, dict) and ("error" in tool_result or tool_result.get("status") in ("failed", "timeout"))
+        self._emit("tool", name=tool_name, status="failed" if failed else "completed")
         
         if tool_result is not None:
             # ✅ SEGUNDA LLAMADA AL LLM - PROCESAR RESULTADO
@@ -816,20 +926,27 @@ Por favor, interpreta este resultado y proporciona una respuesta final clara y 
                 {"role": "user", "content": f"Analiza y responde sobre el resultado de la herramienta para: '{user_input}'"}
             ]
             
-            response = self.groq_client.chat.completions.create(
-                messages=messages,
-                model=self.config.PRIMARY_MODEL,
+            return await self._complete(
+                messages,
                 temperature=self.config.RESPONSE_TEMPERATURE,
                 max_tokens=1000
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             return f"Completé la operación. Resultado: {str(tool_result)}"
 
     async def cleanup(self):
         """Limpieza de recursos"""
+        try:
+            if self._background_tasks:
+                await asyncio.gather(*self._background_tasks, return_exceptions=True)
+            # Mensajes aún en la cola write-behind
+            if self.memory_adapter and hasattr(self.memory_adapter, 'flush'):
+                await asyncio.to_thread(self.memory_adapter.flush, 5)
+            await self.groq_client.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Error cerrando cliente Groq: {e}")
+        
         try:
             if self.mcp_client:
                 await self.mcp_client.cleanup()
@@ -838,8 +955,8 @@ Por favor, interpreta este resultado y proporciona una respuesta final clara y 
             logger.warning(f"⚠️ Error en cleanup: {e}")
 
 # ✅ FUNCIÓN MAIN RESTAURADA
-async def main():
-    """Función principal optimizada"""
+async def main(ipc_stream=None):
+    """Función principal optimizada. Con ipc_stream habla el protocolo NDJSON en vez del chat de consola"""
     print("\n🎯 INICIANDO SISTEMA AVA...")
     print("-" * 40)
     
@@ -873,8 +990,11 @@ async def main():
         print("💾 Memoria SQLite: " + memory_status)
         print("🧠 Memoria Multimodal: " + multimodal_status)
         
-        # Loop principal de conversación CON MARCADOR
-        await conversation_loop_with_marker(llm, mcp_initialized)
+        if ipc_stream is not None:
+            await ipc_loop(llm, ipc_stream)
+        else:
+            # Loop principal de conversación CON MARCADOR
+            await conversation_loop_with_marker(llm, mcp_initialized)
         
     except Exception as e:
         logger.error("❌ ERROR FATAL: " + str(e))
@@ -882,6 +1002,63 @@ async def main():
         if llm:
             await llm.cleanup()
 
+# ✅ LOOP IPC: PETICIONES Y RESPUESTAS NDJSON CON ID
+async def ipc_loop(llm: LLMWithMCPTools, out_stream):
+    """Lee peticiones NDJSON de stdin y responde con frames tipados por el canal IPC"""
+    loop = asyncio.get_running_loop()
+    turn_lock = asyncio.Lock()  # LLMWithMCPTools mantiene estado por turno
+    pending = set()
+    
+    def write(line: str):
+        out_stream.write(line)
+        out_stream.flush()
+    
+    async def handle(request: Dict[str, Any]):
+        request_id = request.get("id")
+        try:
+            if request.get("type") == REQUEST_PING:
+                return
+            
+            if request.get("type") != REQUEST_MESSAGE or not str(request.get("message", "")).strip():
+                write(encode_frame(request_id, FRAME_ERROR, message="Petición inválida"))
+                return
+            
+            async with turn_lock:
+                response = await llm.process_user_input(
+                    request["message"].strip(),
+                    on_event=lambda event_type, data: write(encode_frame(request_id, event_type, **data)),
+                    user_email=request.get("user_email"),
+                    history=request.get("history")
+                )
+                images = extract_generated_images(llm.last_tool_results)
+            
+            write(encode_frame(request_id, FRAME_TEXT, text=str(response)))
+            for image in images:
+                write(encode_frame(request_id, FRAME_IMAGE, **image))
+        except Exception as e:
+            write(encode_frame(request_id, FRAME_ERROR, message=str(e)))
+        finally:
+            write(encode_frame(request_id, FRAME_END))
+    
+    write(encode_frame(None, FRAME_READY, tools=len(llm.available_tools)))
+    
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            break
+        
+        request = decode_line(line)
+        if request is None:
+            write(encode_frame(None, FRAME_ERROR, message="Frame inválido"))
+            continue
+        
+        task = asyncio.create_task(handle(request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
 # ✅ LOOP DE CONVERSACIÓN CON MARCADOR
 async def conversation_loop_with_marker(llm: LLMWithMCPTools, mcp_initialized: bool):
     """Loop principal de conversación optimizada CON MARCADOR DE FIN"""
@@ -1112,10 +1289,16 @@ async def show_full_system_stats(llm: LLMWithMCPTools, mcp_initialized: bool):
 # ✅ PUNTO DE ENTRADA PRINCIPAL
 if __name__ == "__main__":
     """Punto de entrada principal"""
+    # En modo IPC stdout queda reservado para frames; todo print va a stderr
+    ipc_stream = None
+    if "--ipc" in sys.argv:
+        ipc_stream = sys.stdout
+        sys.stdout = sys.stderr
+    
     try:
         print("🎭 SISTEMA AVA - AGENTE VIRTUAL AVANZADO")
         print("=" * 50)
-        asyncio.run(main())
+        asyncio.run(main(ipc_stream))
     except KeyboardInterrupt:
         print("\n👋 Programa terminado por el usuario.")
     except Exception as e:
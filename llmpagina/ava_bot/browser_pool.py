@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Pool de Navegadores Chromium
+============================
+
+Chromium headless de larga vida para PlaywrightAdapter, en lugar de lanzar
+un navegador nuevo por acción.
+
+- Un hilo propio con su event loop: los objetos de Playwright quedan atados a
+  ese loop y cualquier hilo (executor MCP, Flask) entrega corutinas con run().
+- N navegadores calientes (PLAYWRIGHT_BROWSERS); los contextos se reparten
+  entre ellos y como máximo PLAYWRIGHT_MAX_CONTEXTS están en uso a la vez.
+- Lo que se reutiliza es el navegador, no el contexto: cada llamada crea un
+  new_context() y lo cierra al salir, así cookies, storage, service workers y
+  caché nunca pasan de una llamada a otra (crear un contexto cuesta
+  milisegundos; lanzar Chromium, segundos).
+- run() espera como mucho PLAYWRIGHT_RUN_TIMEOUT segundos por defecto.
+- Navegadores desconectados (crash, OOM) se relanzan en el siguiente uso.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+try:
+    from playwright.async_api import async_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+POOL_BROWSERS = int(os.environ.get('PLAYWRIGHT_BROWSERS', '2'))
+POOL_MAX_CONTEXTS = int(os.environ.get('PLAYWRIGHT_MAX_CONTEXTS', '4'))
+DEFAULT_RUN_TIMEOUT = float(os.environ.get('PLAYWRIGHT_RUN_TIMEOUT', '120'))
+PAGE_TIMEOUT_MS = 20000
+
+LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-blink-features=AutomationControlled'
+]
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+}
+
+T = TypeVar('T')
+
+
+class _PooledContext:
+    """Contexto + página de una sola llamada, asociado a un navegador del pool"""
+
+    def __init__(self, slot: int, browser, context, page):
+        self.slot = slot
+        self.browser = browser
+        self.context = context
+        self.page = page
+
+
+class BrowserPool:
+    """Navegadores Chromium calientes con un contexto nuevo por llamada"""
+
+    def __init__(self, browsers: int = POOL_BROWSERS, max_contexts: int = POOL_MAX_CONTEXTS,
+                 headless: bool = True):
+        self.browser_count = max(1, browsers)
+        self.max_contexts = max(1, max_contexts)
+        self.headless = headless
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+        # Estado del loop del pool (solo se toca desde ese loop)
+        self._playwright = None
+        self._browsers: List = []
+        self._live_contexts = [0] * self.browser_count
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._launch_locks: List[asyncio.Lock] = []
+
+        # Contadores para diagnóstico
+        self.launches = 0
+        self.contexts_created = 0
+
+    # ------------------------------------------------------------------
+    # Hilo del event loop
+    # ------------------------------------------------------------------
+    def _ensure_loop(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # El loop existe antes de publicar el hilo: otros llamadores ya pueden encolar
+            loop = asyncio.new_event_loop()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.run_forever()
+
+            self._loop = loop
+            self._thread = threading.Thread(target=run_loop, name="browser-pool", daemon=True)
+            self._thread.start()
+
+    def submit(self, coro_factory: Callable[[], Awaitable[T]]) -> concurrent.futures.Future:
+        """Programa la corutina en el loop del pool (seguro desde cualquier hilo)"""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro_factory(), self._loop)
+
+    def run(self, coro_factory: Callable[[], Awaitable[T]], timeout: Optional[float] = DEFAULT_RUN_TIMEOUT) -> T:
+        """Versión síncrona: bloquea el hilo llamador hasta el resultado (timeout en segundos)"""
+        future = self.submit(coro_factory)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    # ------------------------------------------------------------------
+    # Navegadores
+    # ------------------------------------------------------------------
+    async def _ensure_started(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._playwright is not None:
+                return
+            self._semaphore = asyncio.Semaphore(self.max_contexts)
+            self._launch_locks = [asyncio.Lock() for _ in range(self.browser_count)]
+            self._browsers = [None] * self.browser_count
+            self._playwright = await async_playwright().start()
+            await asyncio.gather(*(self._browser(slot) for slot in range(self.browser_count)))
+            logger.info(f"🎭 Pool de navegadores listo: {self.browser_count} Chromium, {self.max_contexts} contextos")
+
+    async def _browser(self, slot: int):
+        """Navegador del slot, relanzado si se desconectó"""
+        async with self._launch_locks[slot]:
+            browser = self._browsers[slot]
+            if browser is not None and browser.is_connected():
+                return browser
+            if browser is not None:
+                logger.warning(f"⚠️ Chromium #{slot} desconectado: relanzando")
+                self._live_contexts[slot] = 0
+
+            browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+            self._browsers[slot] = browser
+            self.launches += 1
+            return browser
+
+    # ------------------------------------------------------------------
+    # Contextos
+    # ------------------------------------------------------------------
+    async def _new_context(self) -> _PooledContext:
+        # El navegador con menos contextos vivos recibe el nuevo
+        slot = min(range(self.browser_count), key=lambda i: self._live_contexts[i])
+        browser = await self._browser(slot)
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        try:
+            page = await context.new_page()
+        except BaseException:
+            await context.close()
+            raise
+        page.set_default_timeout(PAGE_TIMEOUT_MS)
+        self._live_contexts[slot] += 1
+        self.contexts_created += 1
+        return _PooledContext(slot, browser, context, page)
+
+    async def _close_context(self, pooled: _PooledContext):
+        if pooled.browser is self._browsers[pooled.slot]:
+            self._live_contexts[pooled.slot] = max(0, self._live_contexts[pooled.slot] - 1)
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        """Página en un contexto nuevo; el contexto se cierra al salir"""
+        await self._ensure_started()
+        async with self._semaphore:
+            pooled = await self._new_context()
+            try:
+                yield pooled.page
+            finally:
+                await self._close_context(pooled)
+
+    # ------------------------------------------------------------------
+    # Cierre y diagnóstico
+    # ------------------------------------------------------------------
+    async def _shutdown(self):
+        for browser in self._browsers:
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self, timeout: float = 10):
+        """Cierra navegadores y detiene el loop del pool"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ Error cerrando pool de navegadores: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def stats(self) -> dict:
+        return {
+            'browsers': sum(1 for b in self._browsers if b is not None and b.is_connected()),
+            'live_contexts': sum(self._live_contexts),
+            'launches': self.launches,
+            'contexts_created': self.contexts_created
+        }
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Pool compartido del proceso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+        return _pool
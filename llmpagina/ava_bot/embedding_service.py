@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Servicio de Embeddings Compartido
+=================================
+
+Un único SentenceTransformer por proceso para todas las memorias
+(MultimodalMemoryAdapter, QdrantMultimodalMemory, ...).
+
+Las peticiones concurrentes de encode se agrupan durante unos milisegundos
+(micro-batching) y se resuelven con una sola llamada batched al modelo.
+Devuelve arrays NumPy float32 normalizados (norma L2 = 1).
+
+API:
+- encode(texto | [textos])          síncrona, bloquea hasta tener el vector
+- await aencode(texto | [textos])   asíncrona, no bloquea el event loop
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_DIMENSION = 384
+DEFAULT_MAX_BATCH_SIZE = int(os.environ.get('EMBEDDING_MAX_BATCH', '64'))
+DEFAULT_MAX_WAIT_MS = float(os.environ.get('EMBEDDING_MAX_WAIT_MS', '5'))
+
+TextInput = Union[str, List[str]]
+
+
+class _EncodeRequest:
+    """Textos de un llamador y el future donde recibe sus vectores"""
+
+    def __init__(self, texts: List[str], single: bool):
+        self.texts = texts
+        self.single = single
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+class EmbeddingService:
+    """Dueño del modelo de embeddings; agrupa peticiones concurrentes en lotes"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.dimension = DEFAULT_DIMENSION
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._requests: queue.Queue = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+        # Contadores para diagnóstico
+        self.batches = 0
+        self.texts_encoded = 0
+
+    @property
+    def available(self) -> bool:
+        return SENTENCE_TRANSFORMERS_AVAILABLE
+
+    def _get_model(self):
+        """Carga el modelo la primera vez que se necesita (una sola vez por proceso)"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    started = time.time()
+                    self._model = SentenceTransformer(self.model_name)
+                    self.dimension = self._model.get_sentence_embedding_dimension()
+                    logger.info(f"✅ Modelo de embeddings cargado: {self.model_name} ({time.time() - started:.1f}s)")
+        return self._model
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect_batch(self) -> List[_EncodeRequest]:
+        """Bloquea hasta la primera petición y junta las que lleguen en max_wait"""
+        batch = [self._requests.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for request in batch for text in request.texts]
+
+            try:
+                vectors = self._get_model().encode(
+                    texts,
+                    batch_size=self.max_batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ).astype(np.float32, copy=False)
+            except Exception as e:
+                logger.error(f"❌ Error generando embeddings ({len(texts)} textos): {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts_encoded += len(texts)
+
+            offset = 0
+            for request in batch:
+                chunk = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+                if not request.future.done():
+                    request.future.set_result(chunk[0] if request.single else chunk)
+
+    def submit(self, texts: TextInput) -> concurrent.futures.Future:
+        """Encola textos para el próximo lote. Un str devuelve (dim,), una lista (n, dim)"""
+        if not self.available:
+            raise RuntimeError("sentence-transformers no disponible")
+
+        single = isinstance(texts, str)
+        request = _EncodeRequest([texts] if single else list(texts), single)
+
+        if not request.texts:
+            request.future.set_result(np.zeros((0, self.dimension), dtype=np.float32))
+            return request.future
+
+        self._ensure_worker()
+        self._requests.put(request)
+        return request.future
+
+    def encode(self, texts: TextInput, timeout: Optional[float] = None) -> np.ndarray:
+        """Versión síncrona (hilos, adapters MCP)"""
+        return self.submit(texts).result(timeout=timeout)
+
+    async def aencode(self, texts: TextInput) -> np.ndarray:
+        """Versión asíncrona: espera el lote sin bloquear el event loop"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def stats(self) -> Dict[str, Union[str, int, bool]]:
+        return {
+            'model': self.model_name,
+            'loaded': self._model is not None,
+            'batches': self.batches,
+            'texts_encoded': self.texts_encoded,
+            'pending': self._requests.qsize()
+        }
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_MODEL) -> EmbeddingService:
+    """Servicio compartido del proceso para el modelo dado"""
+    # 'all-MiniLM-L6-v2' y 'sentence-transformers/all-MiniLM-L6-v2' son el mismo modelo
+    if '/' not in model_name:
+        model_name = f"sentence-transformers/{model_name}"
+
+    with _services_lock:
+        if model_name not in _services:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services[model_name]
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Almacén de Embeddings Memory-Mapped
+===================================
+
+Reemplaza el cache de un archivo .npy por hash. Todo vive en tres archivos
+dentro del directorio del cache:
+
+- <nombre>.f32         matriz float32 (filas x dim) abierta con np.memmap
+- <nombre>.index.log   log append-only "hash fila" / "- hash" (eviction)
+- <nombre>.meta.json   dimensión y capacidad reservada
+
+Las lecturas son vistas sin copia sobre el mmap. Al llegar a max_rows se
+reutiliza la fila del hash menos usado (LRU), así el archivo no crece sin límite.
+
+Varios procesos (workers del pool, subprocesos MCP) comparten los archivos:
+toda asignación de filas se hace bajo flock sobre <nombre>.lock, después de
+leer la cola del log que hayan escrito los demás, y la línea del log se
+escribe antes que el vector. Cada proceso aplica las líneas nuevas de forma
+incremental (desde el último byte leído) y vuelve a mapear la matriz si otro
+proceso la amplió.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo un proceso escribe en el store
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSION = 384
+DEFAULT_MAX_ROWS = int(os.environ.get('EMBEDDING_STORE_MAX_ROWS', '50000'))
+INITIAL_CAPACITY = 1024
+
+
+class EmbeddingStore:
+    """Matriz float32 append-only en disco con índice hash -> fila y eviction LRU"""
+
+    def __init__(self, directory: str, name: str = "text", dim: int = DEFAULT_DIMENSION,
+                 max_rows: int = DEFAULT_MAX_ROWS):
+        self.directory = directory
+        self.name = name
+        self.dim = dim
+        self.max_rows = max_rows
+
+        self.matrix_path = os.path.join(directory, f"{name}.f32")
+        self.index_path = os.path.join(directory, f"{name}.index.log")
+        self.meta_path = os.path.join(directory, f"{name}.meta.json")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+
+        self._lock = threading.RLock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # hash -> fila, orden = uso reciente
+        self._owners: Dict[int, str] = {}  # fila -> hash
+        self._free_rows: Set[int] = set()
+        self._next_row = 0
+        self._capacity = 0
+        self._matrix: Optional[np.memmap] = None
+        self._log_lines = 0
+        self._log_inode = None  # compactar reemplaza el archivo: inodo nuevo = releer entero
+        self._log_offset = 0    # bytes del log ya aplicados
+        self.generation = 0     # cambia cuando el índice cambia por líneas de otro proceso
+
+        os.makedirs(directory, exist_ok=True)
+        with self._file_lock():
+            self._open()
+        self._import_legacy_npy()
+
+    # ------------------------------------------------------------------
+    # Apertura y persistencia
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _file_lock(self):
+        """Lock de hilos del proceso + flock exclusivo entre procesos"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            # Un descriptor propio por operación: flock heredado tras fork se comparte con el padre
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _open(self):
+        if os.path.exists(self.meta_path):
+            meta = self._read_meta()
+            if meta.get('dim') != self.dim:
+                logger.warning(f"⚠️ Dimensión del store ({meta.get('dim')}) distinta de {self.dim}: se recrea")
+                self._reset_files()
+            else:
+                self._capacity = meta.get('capacity', 0)
+
+        if self._capacity and os.path.exists(self.matrix_path):
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(self._capacity, self.dim))
+        else:
+            self._grow(INITIAL_CAPACITY)
+
+        self._sync_log()
+        if self._log_lines > 4 * max(len(self._index), 1024):
+            self._compact_log()
+
+    def _reset_files(self):
+        for path in (self.matrix_path, self.index_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._capacity = 0
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'dim': self.dim, 'capacity': self._capacity}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _grow(self, capacity: int):
+        """Amplía el archivo de la matriz y lo vuelve a mapear (bajo _file_lock)"""
+        if self._matrix is not None:
+            self._matrix.flush()
+        with open(self.matrix_path, 'r+b' if os.path.exists(self.matrix_path) else 'wb') as f:
+            f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        self._capacity = capacity
+        self._write_meta()
+
+    def _refresh_capacity(self):
+        """Vuelve a mapear la matriz si otro proceso la amplió"""
+        capacity = self._read_meta().get('capacity', 0)
+        if capacity > self._capacity:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+            self._capacity = capacity
+
+    def _clear_index(self):
+        self._index.clear()
+        self._owners.clear()
+        self._free_rows.clear()
+        self._next_row = 0
+        self._log_lines = 0
+        self._log_offset = 0
+
+    def _sync_log(self) -> bool:
+        """Aplica las líneas del log escritas desde la última lectura. True si hubo cambios"""
+        try:
+            f = open(self.index_path, 'rb')
+        except FileNotFoundError:
+            if self._log_inode is None:
+                return False
+            self._clear_index()
+            self._log_inode = None
+            return True
+
+        with f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._log_inode:
+                # Log nuevo o compactado por otro proceso: se relee desde el principio
+                self._clear_index()
+                self._log_inode = inode
+            f.seek(self._log_offset)
+            data = f.read()
+
+        # Solo líneas completas: otro proceso puede estar a mitad de una escritura
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return False
+        self._refresh_capacity()
+        for line in data[:end].decode('utf-8').splitlines():
+            self._log_lines += 1
+            self._apply_log_line(line)
+        self._log_offset += end
+        return True
+
+    def _apply_log_line(self, line: str):
+        """'hash fila' asigna la fila al hash; '- hash' la libera (la última entrada gana)"""
+        parts = line.split()
+        if len(parts) != 2:
+            return
+        if parts[0] == '-':
+            row = self._index.pop(parts[1], None)
+            if row is not None and self._owners.get(row) == parts[1]:
+                del self._owners[row]
+                self._free_rows.add(row)
+            return
+
+        content_hash, row = parts[0], int(parts[1])
+        if row >= self._capacity:
+            return
+        # La fila pudo reutilizarse para otro hash: conservar solo el último dueño
+        previous_owner = self._owners.get(row)
+        if previous_owner is not None and previous_owner != content_hash:
+            self._index.pop(previous_owner, None)
+        previous_row = self._index.pop(content_hash, None)
+        if previous_row is not None and previous_row != row and self._owners.get(previous_row) == content_hash:
+            del self._owners[previous_row]
+            self._free_rows.add(previous_row)
+
+        self._index[content_hash] = row
+        self._owners[row] = content_hash
+        self._free_rows.discard(row)
+        if row >= self._next_row:
+            # Huecos (filas borradas antes de compactar) quedan libres
+            self._free_rows.update(r for r in range(self._next_row, row) if r not in self._owners)
+            self._next_row = row + 1
+
+    def _append_log(self, line: str):
+        """Escribe y aplica una línea (bajo _file_lock, con el log ya sincronizado)"""
+        data = (line + "\n").encode('utf-8')
+        with open(self.index_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            inode = os.fstat(f.fileno()).st_ino
+        if inode != self._log_inode:
+            # Primer append: el log acaba de crearse
+            self._log_inode = inode
+            self._log_offset = 0
+        self._log_offset += len(data)
+        self._log_lines += 1
+        self._apply_log_line(line)
+
+    def _compact_log(self):
+        """Reescribe el log con una línea por hash vivo (bajo _file_lock)"""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for content_hash, row in self._index.items():
+                f.write(f"{content_hash} {row}\n")
+        os.replace(tmp_path, self.index_path)
+        stat = os.stat(self.index_path)
+        self._log_inode = stat.st_ino
+        self._log_offset = stat.st_size
+        self._log_lines = len(self._index)
+
+    def _import_legacy_npy(self):
+        """Migra el cache antiguo (<nombre>_<md5>.npy) al store y borra los archivos"""
+        prefix = f"{self.name}_"
+        try:
+            legacy = [f for f in os.listdir(self.directory) if f.startswith(prefix) and f.endswith('.npy')]
+        except OSError:
+            return
+        if not legacy:
+            return
+
+        imported = 0
+        for filename in legacy:
+            path = os.path.join(self.directory, filename)
+            try:
+                self.put(filename[len(prefix):-4], np.load(path))
+                imported += 1
+            except Exception as e:
+                logger.debug(f"Embedding legacy ignorado {filename}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        logger.info(f"📦 {imported} embeddings .npy migrados a {self.matrix_path}")
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self._index
+
+    def refresh(self) -> bool:
+        """Incorpora lo que otros procesos hayan escrito. True si el índice cambió"""
+        with self._lock:
+            if not self._sync_log():
+                return False
+            self.generation += 1
+            return True
+
+    def get(self, content_hash: str) -> Optional[np.ndarray]:
+        """Vista sin copia de la fila (solo lectura por convención)"""
+        with self._lock:
+            row = self._index.get(content_hash)
+            if row is None:
+                # Puede haberlo escrito otro proceso
+                if not self.refresh():
+                    return None
+                row = self._index.get(content_hash)
+                if row is None:
+                    return None
+            self._index.move_to_end(content_hash)
+            return self._matrix[row]
+
+    def put(self, content_hash: str, embedding: np.ndarray) -> int:
+        """Guarda (o reemplaza) el embedding de un hash. Retorna la fila usada"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Embedding de dimensión {vector.shape[0]}, el store usa {self.dim}")
+
+        with self._file_lock():
+            if self._sync_log():
+                self.generation += 1
+            row = self._index.get(content_hash)
+            if row is None:
+                row = self._allocate_row()
+                # Primero el log (la fila queda reservada para los demás procesos), luego el vector
+                self._append_log(f"{content_hash} {row}")
+            self._index.move_to_end(content_hash)
+            self._matrix[row] = vector
+            return row
+
+    def _allocate_row(self) -> int:
+        """Fila libre (bajo _file_lock, con el log ya sincronizado)"""
+        if len(self._index) >= self.max_rows:
+            evicted_hash = next(iter(self._index))
+            self._append_log(f"- {evicted_hash}")
+            if self._log_lines > 4 * max(len(self._index), 1024):
+                self._compact_log()
+
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        if self._next_row >= self._capacity:
+            self._grow(min(self._capacity * 2, max(self.max_rows, INITIAL_CAPACITY)))
+
+        row = self._next_row
+        self._next_row += 1
+        return row
+
+    def delete(self, content_hash: str) -> bool:
+        with self._file_lock():
+            if self._sync_log():
+                self.generation += 1
+            if content_hash not in self._index:
+                return False
+            self._append_log(f"- {content_hash}")
+            return True
+
+    def snapshot(self) -> Tuple[List[str], np.ndarray]:
+        """Hashes vivos y sus filas (vista del mmap si son contiguas) para escaneos masivos"""
+        with self._lock:
+            self.refresh()
+            hashes = list(self._index.keys())
+            rows = np.fromiter(self._index.values(), dtype=np.int64, count=len(hashes))
+        order = np.argsort(rows)
+        if np.array_equal(rows[order], np.arange(len(rows))):
+            # Filas 0..n-1 ocupadas: la matriz es un slice contiguo del mmap, sin copia
+            return [hashes[i] for i in order], self._matrix[:len(rows)]
+        return hashes, self._matrix[rows]
+
+    def search(self, query: np.ndarray, k: int = 5,
+               candidates: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Producto punto contra el mmap (vectores normalizados = similitud coseno)"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if candidates is not None:
+            with self._lock:
+                self.refresh()
+                pairs = [(h, self._index[h]) for h in candidates if h in self._index]
+            if not pairs:
+                return []
+            hashes = [h for h, _ in pairs]
+            matrix = self._matrix[[r for _, r in pairs]]
+        else:
+            hashes, matrix = self.snapshot()
+            if not hashes:
+                return []
+
+        scores = matrix @ query
+        k = min(k, len(hashes))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(hashes[i], float(scores[i])) for i in top]
+
+    def flush(self):
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'rows': len(self._index),
+            'capacity': self._capacity,
+            'max_rows': self.max_rows,
+            'free_rows': len(self._free_rows),
+            'dim': self.dim
+        }
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Búsqueda Full-Text (SQLite FTS5)
+================================
+
+Índices FTS5 "external content" sobre las tablas de conversación/memoria,
+sincronizados por triggers (insert/update/delete). No duplican el texto:
+el contenido se lee de la tabla original por rowid.
+
+- ensure_fts(conn, spec)  crea tabla virtual + triggers y hace backfill la primera vez
+- fts_match_query(texto)  convierte texto libre en una expresión MATCH segura
+- fts_ready(conn, spec)   True si el índice existe (si no, usar LIKE como antes)
+
+Sin dependencias externas: también lo importan las rutas del dashboard.
+"""
+import logging
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TOKENS = 16
+
+
+@dataclass(frozen=True)
+class FtsSpec:
+    """Tabla origen, tabla FTS y columnas indexadas"""
+    table: str
+    fts_table: str
+    columns: Tuple[str, ...]
+    rowid: str = "id"
+
+
+# memory.db (SQLiteMemoryManager / dashboard)
+MEMORY_ENTRIES_FTS = FtsSpec("memory_entries", "memory_entries_fts", ("content", "response", "user_id"))
+
+# multimodal_memory.db (MultimodalMemoryAdapter)
+TEXT_MEMORIES_FTS = FtsSpec("text_memories", "text_memories_fts", ("content",))
+
+
+def fts_match_query(text: str, prefix: bool = True) -> str:
+    """Texto libre -> '"tok1"* "tok2"*' (AND implícito). Vacío si no hay tokens"""
+    tokens = TOKEN_PATTERN.findall((text or "").lower())[:MAX_QUERY_TOKENS]
+    suffix = "*" if prefix else ""
+    return " ".join(f'"{token}"{suffix}' for token in tokens)
+
+
+def fts_ready(conn: sqlite3.Connection, spec: FtsSpec) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (spec.fts_table,)
+    ).fetchone()
+    return row is not None
+
+
+def ensure_fts(conn: sqlite3.Connection, spec: FtsSpec) -> bool:
+    """Crea el índice FTS5 y sus triggers si faltan. Retorna False si SQLite no tiene FTS5"""
+    columns = ", ".join(spec.columns)
+    new_columns = ", ".join(f"new.{c}" for c in spec.columns)
+    old_columns = ", ".join(f"old.{c}" for c in spec.columns)
+
+    existed = fts_ready(conn, spec)
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {spec.fts_table} USING fts5(
+                {columns},
+                content='{spec.table}',
+                content_rowid='{spec.rowid}',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"⚠️ FTS5 no disponible ({e}): búsqueda con LIKE")
+        return False
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_ai AFTER INSERT ON {spec.table} BEGIN
+            INSERT INTO {spec.fts_table}(rowid, {columns}) VALUES (new.{spec.rowid}, {new_columns});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_ad AFTER DELETE ON {spec.table} BEGIN
+            INSERT INTO {spec.fts_table}({spec.fts_table}, rowid, {columns}) VALUES ('delete', old.{spec.rowid}, {old_columns});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {spec.fts_table}_au AFTER UPDATE ON {spec.table} BEGIN
+            INSERT INTO {spec.fts_table}({spec.fts_table}, rowid, {columns}) VALUES ('delete', old.{spec.rowid}, {old_columns});
+            INSERT INTO {spec.fts_table}(rowid, {columns}) VALUES (new.{spec.rowid}, {new_columns});
+        END
+    """)
+
+    if not existed:
+        # Migración: indexar las filas que ya existían
+        conn.execute(f"INSERT INTO {spec.fts_table}({spec.fts_table}) VALUES ('rebuild')")
+        conn.commit()
+        logger.info(f"✅ Índice {spec.fts_table} creado y poblado")
+    return True
+
+
+def fts_rowids_sql(spec: FtsSpec, columns: Optional[Tuple[str, ...]] = None) -> str:
+    """Subconsulta 'rowid IN (...)' para filtrar la tabla origen con un MATCH (parámetro: expresión)"""
+    target = spec.fts_table
+    if columns:
+        # Restringir el MATCH a ciertas columnas: {content response} : expr
+        return f"SELECT rowid FROM {target} WHERE {target} MATCH '{{{' '.join(columns)}}} : (' || ? || ')'"
+    return f"SELECT rowid FROM {target} WHERE {target} MATCH ?"
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Derivados de Imágenes Generadas
+===============================
+
+Las imágenes de Together/FLUX se guardan como PNG a tamaño completo. Al
+guardarlas se encargan aquí, una sola vez y en un pool de hilos, sus variantes:
+
+- WebP (y AVIF si el Pillow instalado lo soporta) en tamaños thumb/medium/large.
+- Un JPEG de 1024px para las llamadas de visión (VisionAdapter ya no abre,
+  convierte y redimensiona el PNG en cada análisis).
+- Nombres con hash del contenido: <nombre>.<hash>.<variante>.<ext>, en la
+  carpeta derivatives/ junto al original, más un manifiesto
+  <nombre>.derivatives.json que se invalida si cambia el original.
+
+Las rutas eligen la variante con select_variant() según el Accept del cliente
+y el ancho pedido; si aún no hay derivados se sirve el original y se encargan.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIRNAME = 'derivatives'
+WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', '2'))
+WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', '80'))
+AVIF_QUALITY = int(os.environ.get('IMAGE_AVIF_QUALITY', '60'))
+VISION_MAX_DIMENSION = 1024  # mismo límite que usaba VisionAdapter
+VISION_JPEG_QUALITY = 90
+MANIFEST_VERSION = 2  # 2: la variante mayor se escribe al ancho del original
+
+# Ancho máximo por variante
+SIZES = {
+    'thumb': 320,
+    'medium': 768,
+    'large': 1536,
+}
+
+MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.avif': 'image/avif',
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_manifests: Dict[str, Tuple[Tuple[float, int], Dict]] = {}
+_lock = threading.Lock()
+
+
+def _avif_supported() -> bool:
+    if not PIL_AVAILABLE:
+        return False
+    Image.init()
+    return 'AVIF' in Image.SAVE
+
+
+def mime_type_for(path: Union[str, Path]) -> str:
+    return MIME_TYPES.get(Path(path).suffix.lower(), 'application/octet-stream')
+
+
+def _signature(path: Path) -> Tuple[float, int]:
+    stat = path.stat()
+    return (stat.st_mtime, stat.st_size)
+
+
+def _manifest_path(image_path: Path) -> Path:
+    return image_path.parent / DERIVATIVES_DIRNAME / f"{image_path.stem}.derivatives.json"
+
+
+def _flatten(img: 'Image.Image') -> 'Image.Image':
+    """RGBA/LA/P sobre fondo blanco para formatos sin alfa (JPEG)"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def _resized(img: 'Image.Image', max_dimension: int) -> 'Image.Image':
+    if max(img.size) <= max_dimension:
+        return img
+    ratio = max_dimension / max(img.size)
+    new_size = tuple(max(1, int(dim * ratio)) for dim in img.size)
+    return img.resize(new_size, Image.Resampling.LANCZOS)
+
+
+def generate_derivatives(image_path: Union[str, Path]) -> Optional[Dict]:
+    """Genera todas las variantes de una imagen (síncrono) y devuelve su manifiesto"""
+    if not PIL_AVAILABLE:
+        return None
+    image_path = Path(image_path)
+    try:
+        signature = _signature(image_path)
+        with open(image_path, 'rb') as f:
+            source_hash = hashlib.sha1(f.read()).hexdigest()[:12]
+
+        out_dir = image_path.parent / DERIVATIVES_DIRNAME
+        out_dir.mkdir(parents=True, exist_ok=True)
+        formats = [('webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 4})]
+        if _avif_supported():
+            formats.append(('avif', 'AVIF', {'quality': AVIF_QUALITY}))
+
+        variants = {}
+
+        def write(name: str, img: 'Image.Image', ext: str, pil_format: str, options: Dict):
+            filename = f"{image_path.stem}.{source_hash}.{name}.{ext}"
+            target = out_dir / filename
+            if not target.exists():
+                tmp = target.with_name(target.name + '.tmp')
+                img.save(tmp, format=pil_format, **options)
+                os.replace(tmp, target)
+            variants.setdefault(name, {})[ext] = {
+                'file': filename,
+                'width': img.size[0],
+                'height': img.size[1],
+                'bytes': target.stat().st_size,
+            }
+
+        with Image.open(image_path) as source:
+            source.load()
+            rgb = _flatten(source)
+            width = source.size[0]
+
+            written_sizes = set()
+            for name, max_width in SIZES.items():
+                # Nada de ampliar: la primera variante que no reduce queda al tamaño
+                # original (una 1024px tiene large de 1024) y las mayores se omiten
+                img = _resized(rgb, max_width)
+                if img.size in written_sizes:
+                    continue
+                written_sizes.add(img.size)
+                for ext, pil_format, options in formats:
+                    write(name, img, ext, pil_format, options)
+
+            write('vision', _resized(rgb, VISION_MAX_DIMENSION), 'jpg', 'JPEG',
+                  {'quality': VISION_JPEG_QUALITY, 'optimize': True})
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'source': image_path.name,
+            'source_hash': source_hash,
+            'source_signature': list(signature),
+            'source_width': width,
+            'variants': variants,
+        }
+        manifest_path = _manifest_path(image_path)
+        tmp = manifest_path.with_name(manifest_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, manifest_path)
+
+        with _lock:
+            _manifests[str(image_path)] = (signature, manifest)
+        logger.info(f"🖼️ Derivados de {image_path.name}: {', '.join(variants)}")
+        return manifest
+
+    except Exception as e:
+        logger.error(f"❌ Error generando derivados de {image_path}: {e}")
+        return None
+
+
+def schedule_derivatives(image_path: Union[str, Path]) -> Optional[Future]:
+    """Encarga los derivados al pool (una sola tarea en curso por imagen)"""
+    global _executor
+    if not PIL_AVAILABLE:
+        return None
+    key = str(Path(image_path))
+    with _lock:
+        future = _pending.get(key)
+        if future is not None and not future.done():
+            return future
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix='image-derivatives')
+        future = _executor.submit(generate_derivatives, key)
+        _pending[key] = future
+    future.add_done_callback(lambda _: _forget(key, future))
+    return future
+
+
+def _forget(key: str, future: Future):
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def load_derivatives(image_path: Union[str, Path]) -> Optional[Dict]:
+    """Manifiesto vigente de la imagen, o None si falta o el original cambió"""
+    image_path = Path(image_path)
+    try:
+        signature = _signature(image_path)
+    except OSError:
+        return None
+
+    key = str(image_path)
+    with _lock:
+        cached = _manifests.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    manifest_path = _manifest_path(image_path)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if tuple(manifest.get('source_signature') or ()) != signature:
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+
+    with _lock:
+        _manifests[key] = (signature, manifest)
+    return manifest
+
+
+def derivatives_or_schedule(image_path: Union[str, Path]) -> Optional[Dict]:
+    """Manifiesto si ya existe; si no, se encargan los derivados para la próxima vez"""
+    manifest = load_derivatives(image_path)
+    if manifest is None:
+        schedule_derivatives(image_path)
+    return manifest
+
+
+def vision_image_path(image_path: Union[str, Path]) -> Optional[Path]:
+    """JPEG de 1024px ya preparado para la API de visión, si existe"""
+    image_path = Path(image_path)
+    manifest = load_derivatives(image_path)
+    entry = ((manifest or {}).get('variants', {}).get('vision') or {}).get('jpg')
+    if not entry:
+        return None
+    path = image_path.parent / DERIVATIVES_DIRNAME / entry['file']
+    return path if path.exists() else None
+
+
+def _variant_width(variant: Dict) -> int:
+    return max((entry.get('width', 0) for entry in variant.values()), default=0)
+
+
+def select_variant(image_path: Union[str, Path], accept: str = '',
+                   width: Optional[int] = None) -> Tuple[Path, str]:
+    """
+    Variante a servir: el tamaño más pequeño cuyo ancho real cubre el pedido
+    (por defecto el de large, o el del original si es menor) en el mejor
+    formato que acepte el cliente (AVIF > WebP). Sin derivados, sin formato
+    aceptado o sin variante que cubra el ancho se devuelve el original.
+    """
+    image_path = Path(image_path)
+    manifest = derivatives_or_schedule(image_path)
+    if not manifest:
+        return image_path, mime_type_for(image_path)
+
+    accept = (accept or '').lower()
+    formats = [ext for ext in ('avif', 'webp') if f"image/{ext}" in accept]
+    if not formats:
+        return image_path, mime_type_for(image_path)
+
+    variants = manifest.get('variants', {})
+    if not width:
+        width = min(SIZES['large'], manifest.get('source_width') or SIZES['large'])
+    covering = [name for name in SIZES if name in variants and _variant_width(variants[name]) >= width]
+    if not covering:
+        return image_path, mime_type_for(image_path)
+    chosen = covering[0]
+
+    # Si la variante no reduce bytes respecto al original, se sirve el original
+    original_size = image_path.stat().st_size
+    for ext in formats:
+        entry = variants[chosen].get(ext)
+        if not entry or entry['bytes'] >= original_size:
+            continue
+        path = image_path.parent / DERIVATIVES_DIRNAME / entry['file']
+        if path.exists():
+            return path, MIME_TYPES[f".{ext}"]
+    return image_path, mime_type_for(image_path)
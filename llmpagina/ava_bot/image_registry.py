@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Registro de Imágenes
+====================
+
+Índice único de las imágenes del sistema (subidas, almacenadas por la memoria
+multimodal y generadas) para no sondear directorios en cada petición:
+
+- resolve(image_path): ruta relativa pedida -> ruta en una consulta, respetando
+  la prioridad de ubicaciones que usaba /api/chat/image (location / image_path).
+- latest(directory=..., user_id=...): la imagen más reciente sin glob ni stat.
+
+Se mantiene al día con ganchos de escritura (ImageAdapter,
+MultimodalMemoryAdapter, subidas de chat_routes); las consultas no recorren
+directorios. rebuild() los recorre de forma explícita: al crear o migrar la
+base y para directorios sin ganchos. Las rutas se guardan resueltas (sin '..')
+y cada imagen se indexa por su ruta relativa a la ubicación que la contiene.
+Vive en SQLite (IMAGE_REGISTRY_DB) para compartirlo entre el proceso Flask y
+los workers de AVA.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from sqlite_pool import db_connection
+
+logger = logging.getLogger(__name__)
+
+AVA_BOT_DIR = Path(__file__).parent.resolve()
+PROJECT_DIR = AVA_BOT_DIR.parent.parent
+REGISTRY_DB = os.environ.get('IMAGE_REGISTRY_DB', str(AVA_BOT_DIR / 'image_registry.db'))
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+SKIPPED_DIRNAMES = {'derivatives'}  # variantes de image_derivatives: no son imágenes propias
+
+# Ubicaciones conocidas, en orden de prioridad para resolve()
+LOCATIONS = {
+    'uploaded_images': AVA_BOT_DIR / 'uploaded images',
+    'stored_images': AVA_BOT_DIR / 'tools' / 'adapters' / 'stored_images',
+    'generated_images': PROJECT_DIR / 'generated_images',
+    'ava_generated': AVA_BOT_DIR / 'generated_images',
+}
+LOCATION_PRIORITY = {name: i for i, name in enumerate(LOCATIONS)}
+OTHER_PRIORITY = len(LOCATIONS)
+
+
+def normalize_relpath(image_path: str) -> Optional[str]:
+    """Ruta relativa en forma canónica ('a/b.png'); None si es absoluta o sale de la ubicación"""
+    parts = [part for part in PurePosixPath(image_path.replace('\\', '/')).parts if part != '.']
+    if not parts or parts[0].startswith('/') or '..' in parts:
+        return None
+    return '/'.join(parts)
+
+
+class ImageRegistry:
+    """Índice SQLite ruta relativa/directorio -> ruta, mtime y usuario"""
+
+    def __init__(self, db_path: str = REGISTRY_DB):
+        self.db_path = db_path
+
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS images (
+                    path TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    relpath TEXT,
+                    directory TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    user_id TEXT,
+                    source TEXT,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            ''')
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(images)')}
+            migrated = 'relpath' not in columns
+            if migrated:
+                # Versiones anteriores indexaban solo el nombre: las filas se rehacen al recorrer
+                conn.execute('DELETE FROM images')
+                conn.execute('ALTER TABLE images ADD COLUMN relpath TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_images_relpath ON images(relpath, priority)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_images_directory ON images(directory, mtime)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_images_user ON images(user_id, mtime)')
+            conn.execute('DROP INDEX IF EXISTS idx_images_filename')
+            empty = conn.execute('SELECT 1 FROM images LIMIT 1').fetchone() is None
+
+        if migrated or empty:
+            self.rebuild()
+
+    def _connect(self):
+        return db_connection(self.db_path)
+
+    @staticmethod
+    def _location_for(path: Path) -> Tuple[str, str]:
+        """(ubicación conocida que contiene la ruta, ruta relativa a ella); ('other', nombre) si ninguna"""
+        for name, location_dir in LOCATIONS.items():
+            try:
+                return name, path.relative_to(location_dir.resolve()).as_posix()
+            except ValueError:
+                continue
+        return 'other', path.name
+
+    def tracks(self, directory: Union[str, Path]) -> bool:
+        """El directorio está dentro de una ubicación que mantienen los ganchos de escritura"""
+        return self._location_for(Path(directory).resolve() / '_')[0] != 'other'
+
+    def _row(self, path: Path, stat: os.stat_result, user_id: Optional[str], source: Optional[str]) -> tuple:
+        location, relpath = self._location_for(path)
+        return (str(path), path.name, relpath, str(path.parent), location,
+                LOCATION_PRIORITY.get(location, OTHER_PRIORITY), user_id, source,
+                stat.st_mtime, stat.st_size)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def register(self, path: Union[str, Path], user_id: Optional[str] = None,
+                 source: Optional[str] = None):
+        """Gancho de escritura: llamar justo después de guardar la imagen"""
+        path = Path(path).resolve()
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            return
+        try:
+            stat = path.stat()
+        except OSError as e:
+            logger.warning(f"⚠️ Imagen no registrada ({path}): {e}")
+            return
+
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    INSERT INTO images (path, filename, relpath, directory, location, priority, user_id, source, mtime, size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        mtime = excluded.mtime,
+                        size = excluded.size,
+                        user_id = COALESCE(excluded.user_id, images.user_id),
+                        source = COALESCE(excluded.source, images.source)
+                ''', self._row(path, stat, user_id, source))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Error registrando imagen {path.name}: {e}")
+
+    def forget(self, path: Union[str, Path]):
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM images WHERE path = ?', (str(Path(path).resolve()),))
+        except sqlite3.Error:
+            pass
+
+    def rebuild(self, directories: Optional[Iterable[Union[str, Path]]] = None) -> int:
+        """Recorre los directorios (por defecto las ubicaciones conocidas): altas nuevas y bajas de borrados"""
+        if directories is None:
+            directories = LOCATIONS.values()
+        return sum(self._rebuild_directory(Path(directory).resolve()) for directory in directories)
+
+    def _rebuild_directory(self, directory: Path) -> int:
+        if not directory.is_dir():
+            return 0
+
+        start = time.time()
+        rows = []
+        for root, dirnames, filenames in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if name not in SKIPPED_DIRNAMES]
+            for filename in filenames:
+                path = Path(root) / filename
+                if path.suffix.lower() not in IMAGE_EXTENSIONS:
+                    continue
+                try:
+                    rows.append(self._row(path, path.stat(), None, 'scan'))
+                except OSError:
+                    continue
+
+        key = str(directory)
+        try:
+            with self._connect() as conn:
+                conn.executemany('''
+                    INSERT INTO images (path, filename, relpath, directory, location, priority, user_id, source, mtime, size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime, size = excluded.size
+                ''', rows)
+                present = {row[0] for row in rows}
+                stale = [(path,) for (path,) in conn.execute(
+                             'SELECT path FROM images WHERE directory = ? OR substr(directory, 1, ?) = ?',
+                             (key, len(key) + 1, key + os.sep))
+                         if path not in present]
+                conn.executemany('DELETE FROM images WHERE path = ?', stale)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Error recorriendo {directory}: {e}")
+            return 0
+
+        logger.info(f"🗂️ Registro de imágenes: {len(rows)} en {directory.name} ({time.time() - start:.2f}s)")
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def resolve(self, image_path: str) -> Optional[Path]:
+        """Ruta de la imagen por ruta relativa a su ubicación (la de mayor prioridad gana)"""
+        relpath = normalize_relpath(image_path)
+        if relpath is None:
+            return None
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, location FROM images WHERE relpath = ? AND location != 'other' "
+                "ORDER BY priority, mtime DESC", (relpath,)
+            ).fetchall()
+        for path, location in rows:
+            path = Path(path)
+            # Un enlace simbólico no puede sacar la petición de su ubicación
+            if not path.resolve().is_relative_to(LOCATIONS[location].resolve()):
+                continue
+            if path.is_file():
+                return path
+            # Borrada por fuera del registro
+            self.forget(path)
+        return None
+
+    def latest(self, directory: Optional[Union[str, Path]] = None,
+               user_id: Optional[str] = None) -> Optional[Dict]:
+        """Imagen más reciente de un directorio y/o usuario"""
+        clauses, params = [], []
+        if directory is not None:
+            clauses.append('directory = ?')
+            params.append(str(Path(directory).resolve()))
+        if user_id is not None:
+            clauses.append('user_id = ?')
+            params.append(str(user_id))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f'SELECT * FROM images {where} ORDER BY mtime DESC LIMIT 5', params).fetchall()
+        for row in rows:
+            if os.path.exists(row['path']):
+                return dict(row)
+            self.forget(row['path'])
+        return None
+
+
+_registry: Optional[ImageRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_image_registry() -> ImageRegistry:
+    """Registro compartido del proceso"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ImageRegistry()
+        return _registry
+
+
+def register_image(path: Union[str, Path], user_id: Optional[str] = None, source: Optional[str] = None):
+    """Atajo para los ganchos de escritura; nunca interrumpe el guardado"""
+    try:
+        get_image_registry().register(path, user_id=user_id, source=source)
+    except Exception as e:
+        logger.warning(f"⚠️ Registro de imágenes no disponible: {e}")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Protocolo IPC de AVA
+====================
+
+Protocolo NDJSON (un objeto JSON por línea) entre Flask y ava_bot.py --ipc.
+stdout del bot queda reservado para frames; logs y prints van a stderr.
+
+Petición:   {"id": "...", "type": "message", "message": "...", "user_email": "...", "history": [...]}
+            (user_email e history son opcionales: el estado de la sesión del usuario)
+Respuestas: {"id": "...", "type": "<tipo>", "data": {...}}
+
+Tipos de respuesta: ready, tool, token, reset, text, image, error, end.
+token/reset transmiten la respuesta final a medida que el LLM la genera;
+reset indica descartar los tokens recibidos hasta ese momento. Cada petición
+termina con exactamente un frame "end", de modo que varias peticiones pueden
+estar en curso sobre la misma conexión.
+"""
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+# Tipos de petición
+REQUEST_MESSAGE = "message"
+REQUEST_PING = "ping"
+
+# Tipos de frame de respuesta
+FRAME_READY = "ready"
+FRAME_TOOL = "tool"
+FRAME_TOKEN = "token"
+FRAME_RESET = "reset"
+FRAME_TEXT = "text"
+FRAME_IMAGE = "image"
+FRAME_ERROR = "error"
+FRAME_END = "end"
+
+FRAME_TYPES = {FRAME_READY, FRAME_TOOL, FRAME_TOKEN, FRAME_RESET, FRAME_TEXT, FRAME_IMAGE, FRAME_ERROR, FRAME_END}
+STREAM_FRAME_TYPES = {FRAME_TOOL, FRAME_TOKEN, FRAME_RESET}
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def encode_frame(request_id: Optional[str], frame_type: str, **data) -> str:
+    """Serializa un frame como una línea JSON (incluye el salto de línea)"""
+    return json.dumps({"id": request_id, "type": frame_type, "data": data}, ensure_ascii=False) + "\n"
+
+
+def encode_request(request_id: str, message: str, request_type: str = REQUEST_MESSAGE,
+                   user_email: Optional[str] = None, history: Optional[List[Dict[str, Any]]] = None) -> str:
+    request = {"id": request_id, "type": request_type, "message": message}
+    if user_email is not None:
+        request["user_email"] = user_email
+    if history is not None:
+        request["history"] = history
+    return json.dumps(request, ensure_ascii=False) + "\n"
+
+
+def decode_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parsea una línea del canal. Retorna None si no es un frame válido"""
+    line = line.strip()
+    if not line or not line.startswith("{"):
+        return None
+    try:
+        frame = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(frame, dict) or "type" not in frame:
+        return None
+    return frame
+
+
+def extract_generated_images(tool_results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Obtiene las imágenes generadas en un turno a partir de los resultados de herramientas.
+
+    Se leen del campo estructurado "image" ({path, filename}) que ImageAdapter
+    añade a su resultado MCP; el texto para el LLM no se interpreta.
+    """
+    images = []
+    seen = set()
+
+    for tool_result in tool_results or []:
+        result = tool_result.get('result')
+        if not isinstance(result, dict):
+            continue
+        # Respuesta JSON-RPC del cliente MCP: el resultado del adapter viaja en "result"
+        payload = result.get('result', result)
+        image = payload.get('image') if isinstance(payload, dict) else None
+        if not isinstance(image, dict) or not image.get('filename'):
+            continue
+
+        filename = str(image['filename'])
+        if filename not in seen:
+            seen.add(filename)
+            images.append({'filename': filename, 'path': str(image.get('path') or filename),
+                           'tool': tool_result.get('tool', '')})
+
+    return images
@@ -7,19 +7,31 @@ import sys
 import time
 import re
 import os
+from collections import deque
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT = 30.0     # initialize, tools/list
+TOOL_CALL_TIMEOUT = 300.0  # tools/call (el llamador suele aplicar su propio timeout por herramienta)
+
 class MCPClient:
     """Cliente MCP simplificado para trabajar con el servidor sin lazy loading"""
     
-    def __init__(self, server_command: List[str]):
+    def __init__(self, server_command: List[str], cwd: Optional[str] = None):
         self.server_command = server_command
+        self.cwd = cwd
         self.process = None
         self.request_id = 0
         self.initialized = False
+        
+        # ✅ MULTIPLEXADO: varias solicitudes en vuelo, cada respuesta se asocia por id
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._write_lock = asyncio.Lock()
+        self._reader_task = None
+        self._stderr_task = None
+        self._stderr_tail = deque(maxlen=50)
     
     async def start_server(self):
         """Inicia el servidor MCP con mejor error handling"""
@@ -34,18 +46,18 @@ class MCPClient:
                 stderr=asyncio.subprocess.PIPE,
                 limit=1024*1024,  # Buffer de 1MB
                 env=None,
-                cwd=None
+                cwd=self.cwd
             )
             
             logger.info("📡 Initializing MCP connection...")
             
-            # Esperar más tiempo para que el servidor se estabilice
-            await asyncio.sleep(3)
+            # Sin espera fija: la solicitud initialize queda en el pipe hasta que el servidor la lea
+            self._reader_task = asyncio.create_task(self._read_responses())
+            self._stderr_task = asyncio.create_task(self._drain_stderr())
             
             # Verificar que el proceso está corriendo
             if self.process.returncode is not None:
-                stderr_output = await self.process.stderr.read()
-                raise Exception(f"Server failed to start: {stderr_output.decode()}")
+                raise Exception(f"Server failed to start: {chr(10).join(self._stderr_tail)}")
             
             # Inicializar protocolo MCP con mejor manejo
             try:
@@ -63,117 +75,114 @@ class MCPClient:
                 
             except Exception as e:
                 logger.error(f"❌ Initialization failed: {e}")
-                # Leer stderr para más información
-                try:
-                    stderr_data = await asyncio.wait_for(
-                        self.process.stderr.read(1024), 
-                        timeout=2.0
-                    )
-                    if stderr_data:
-                        stderr_text = stderr_data.decode('utf-8', errors='ignore')
-                        logger.error(f"🔧 Server stderr: {stderr_text}")
-                except:
-                    pass
+                # Últimas líneas de stderr para más información
+                if self._stderr_tail:
+                    logger.error(f"🔧 Server stderr: {chr(10).join(list(self._stderr_tail)[-10:])}")
                 raise
             
         except Exception as e:
             logger.error(f"❌ Failed to start MCP server: {e}")
             if self.process:
-                self.process.terminate()
+                if self.process.returncode is None:
+                    self.process.terminate()
                 await self.process.wait()
                 self.process = None
+            self._cancel_io_tasks()
             raise
     
-    async def _send_request(self, method: str, params: Dict = None) -> Dict[str, Any]:
-        """Envía una solicitud al servidor MCP con mejor error handling"""
+    async def _send_request(self, method: str, params: Dict = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Envía una solicitud y espera SU respuesta (emparejada por id JSON-RPC)"""
         if not self.process or self.process.returncode is not None:
             raise Exception("MCP server not running")
         
+        if timeout is None:
+            timeout = TOOL_CALL_TIMEOUT if method == "tools/call" else REQUEST_TIMEOUT
+        
         self.request_id += 1
+        request_id = self.request_id
         
         request = {
             "jsonrpc": "2.0",
             "method": method,
-            "id": self.request_id
+            "id": request_id
         }
         
         if params is not None:
             request["params"] = params
         
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        
         try:
-            # Enviar al servidor
             request_json = json.dumps(request) + "\n"
             logger.debug(f"📤 Sending: {request_json.strip()}")
             
-            self.process.stdin.write(request_json.encode('utf-8'))
-            await self.process.stdin.drain()
+            # Varias corrutinas pueden escribir a la vez: una línea completa por solicitud
+            async with self._write_lock:
+                self.process.stdin.write(request_json.encode('utf-8'))
+                await self.process.stdin.drain()
             
-            # Leer respuesta con timeout más largo y mejor manejo
-            max_attempts = 3
-            for attempt in range(max_attempts):
-                try:
-                    response_line = await asyncio.wait_for(
-                        self.process.stdout.readline(), 
-                        timeout=10.0 + (attempt * 5)  # Timeout incrementalmente más largo
-                    )
-                    
-                    if not response_line:
-                        if attempt < max_attempts - 1:
-                            logger.warning(f"⚠️ Empty response, attempt {attempt + 1}/{max_attempts}")
-                            await asyncio.sleep(1)
-                            continue
-                        else:
-                            raise Exception("No response from server after multiple attempts")
-                    
-                    response_text = response_line.decode('utf-8').strip()
-                    logger.debug(f"📥 Received: {response_text}")
-                    
-                    if not response_text:
-                        if attempt < max_attempts - 1:
-                            logger.warning(f"⚠️ Empty response text, attempt {attempt + 1}/{max_attempts}")
-                            await asyncio.sleep(1)
-                            continue
-                        else:
-                            raise Exception("Empty response text after multiple attempts")
-                    
-                    # Parse JSON response
-                    try:
-                        return self._parse_mcp_response(response_text)
-                    except json.JSONDecodeError as e:
-                        if attempt < max_attempts - 1:
-                            logger.warning(f"⚠️ JSON parse error, attempt {attempt + 1}/{max_attempts}: {e}")
-                            await asyncio.sleep(1)
-                            continue
-                        else:
-                            logger.error(f"❌ JSON decode error for: {response_text}")
-                            raise Exception(f"Invalid JSON response after {max_attempts} attempts: {response_text}")
-                    
-                    break  # Éxito, salir del loop
-                    
-                except asyncio.TimeoutError:
-                    if attempt < max_attempts - 1:
-                        logger.warning(f"⚠️ Timeout, attempt {attempt + 1}/{max_attempts}")
-                        
-                        # Leer stderr para diagnóstico
-                        try:
-                            stderr_data = await asyncio.wait_for(
-                                self.process.stderr.read(1024), 
-                                timeout=2.0
-                            )
-                            if stderr_data:
-                                error_msg = stderr_data.decode('utf-8', errors='ignore')
-                                logger.warning(f"🔧 Server stderr during timeout: {error_msg}")
-                        except asyncio.TimeoutError:
-                            pass
-                        
-                        await asyncio.sleep(2)
-                        continue
-                    else:
-                        raise Exception(f"Timeout waiting for response after {max_attempts} attempts")
-                        
+            return await asyncio.wait_for(future, timeout=timeout)
+            
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Request '{method}' (ID: {request_id}) timed out after {timeout}s")
+            raise Exception(f"Timeout waiting for response to '{method}' after {timeout}s")
         except Exception as e:
             logger.error(f"❌ Request '{method}' failed: {e}")
             raise
+        finally:
+            # Una respuesta tardía a una solicitud abandonada se descarta en el lector
+            self._pending.pop(request_id, None)
+    
+    async def _read_responses(self):
+        """Lee stdout del servidor y resuelve la solicitud pendiente con el mismo id"""
+        try:
+            while True:
+                response_line = await self.process.stdout.readline()
+                if not response_line:
+                    break
+                
+                response_text = response_line.decode('utf-8', errors='replace').strip()
+                if not response_text:
+                    continue
+                
+                logger.debug(f"📥 Received: {response_text[:200]}")
+                
+                try:
+                    response = self._parse_mcp_response(response_text)
+                except json.JSONDecodeError:
+                    continue
+                
+                future = self._pending.get(response.get("id"))
+                if future is None:
+                    logger.warning(f"⚠️ Response without pending request (ID: {response.get('id')})")
+                    continue
+                if not future.done():
+                    future.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error reading MCP responses: {e}")
+        finally:
+            # Servidor cerrado: fallar todo lo que sigue esperando
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(Exception("MCP server closed the connection"))
+    
+    async def _drain_stderr(self):
+        """Consume stderr del servidor (logs) para que el pipe nunca se llene"""
+        try:
+            while True:
+                line = await self.process.stderr.readline()
+                if not line:
+                    break
+                text = line.decode('utf-8', errors='ignore').rstrip()
+                self._stderr_tail.append(text)
+                logger.debug(f"🔧 Server: {text}")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
     
     def _parse_mcp_response(self, response_text: str) -> Dict[str, Any]:
         """Parsea respuesta MCP manejando diferentes formatos"""
@@ -297,6 +306,13 @@ class MCPClient:
                 "id": self.request_id
             }
     
+    def _cancel_io_tasks(self):
+        for task in (self._reader_task, self._stderr_task):
+            if task and not task.done():
+                task.cancel()
+        self._reader_task = None
+        self._stderr_task = None
+    
     async def cleanup(self):
         """Cierra la conexión con el servidor de manera limpia"""
         logger.info("🧹 Cleaning up MCP client...")
@@ -318,6 +334,7 @@ class MCPClient:
             except Exception as e:
                 logger.warning(f"⚠️ Error during cleanup: {e}")
             finally:
+                self._cancel_io_tasks()
                 self.process = None
                 self.initialized = False
 
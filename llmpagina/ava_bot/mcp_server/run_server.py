@@ -9,7 +9,9 @@ import asyncio
 import json
 import os
 import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -33,6 +35,15 @@ for path in paths_to_add:
     if path not in sys.path:
         sys.path.insert(0, path)
 
+# Máximo de herramientas ejecutándose a la vez (cada adapter síncrono ocupa un hilo)
+MAX_CONCURRENT_TOOLS = int(os.environ.get('MCP_MAX_WORKERS', '8'))
+
+# Schemas estáticos: tools/list responde sin importar ningún adapter
+TOOL_MANIFEST_PATH = os.path.join(current_dir, 'tool_manifest.json')
+
+# Adapters que se cargan en background al arrancar (vacío = ninguno). Ej: "memory,search,file_manager"
+PREWARM_ADAPTERS = [name.strip() for name in os.environ.get('MCP_PREWARM', 'memory,file_manager').split(',') if name.strip()]
+
 # LOGGING MEJORADO - SOLO STDERR
 def safe_log(message: str, level: str = "INFO"):
     """Log seguro que SOLO va a stderr - NUNCA a stdout"""
@@ -61,6 +72,65 @@ class SilentAdapterLoader:
             # ✅ CAMBIAR A MULTIMODAL MEMORY ADAPTER REAL
             ("multimodal_memory", "tools.adapters.multimodal_memory_adapter", "MultimodalMemoryAdapter")
         ]
+        self.failed_adapters = {}
+        self._load_locks = {name: threading.Lock() for name, _, _ in self.adapter_definitions}
+    
+    @property
+    def adapter_names(self):
+        return [name for name, _, _ in self.adapter_definitions]
+    
+    def _load_one(self, name: str, module_path: str, class_name: str):
+        """Importa e instancia un adapter. Retorna None si falla (el motivo queda en failed_adapters)"""
+        try:
+            module = __import__(module_path, fromlist=[class_name])
+        except ImportError as ie:
+            safe_log(f"❌ No se pudo importar {module_path}: {ie}")
+            self.failed_adapters[name] = f"Import error: {ie}"
+            return None
+        
+        if not hasattr(module, class_name):
+            safe_log(f"❌ Clase {class_name} no encontrada")
+            self.failed_adapters[name] = f"Class {class_name} not found"
+            return None
+        
+        try:
+            adapter_instance = getattr(module, class_name)()
+        except Exception as e:
+            safe_log(f"❌ Error inicializando {name}: {e}")
+            self.failed_adapters[name] = f"Init error: {e}"
+            return None
+        
+        # FileManager usa método 'execute'
+        required_methods = ['execute'] if name == "file_manager" else ['process', 'execute']
+        if not any(hasattr(adapter_instance, method) for method in required_methods):
+            safe_log(f"❌ {name} no tiene métodos requeridos: {required_methods}")
+            self.failed_adapters[name] = f"Missing methods: {required_methods}"
+            return None
+        
+        self.loaded_adapters[name] = adapter_instance
+        self.failed_adapters.pop(name, None)
+        return adapter_instance
+    
+    def load_adapter(self, name: str):
+        """✅ CARGA BAJO DEMANDA: importa el adapter la primera vez que se usa (thread-safe)"""
+        if name in self.loaded_adapters:
+            return self.loaded_adapters[name]
+        
+        definition = next((d for d in self.adapter_definitions if d[0] == name), None)
+        if definition is None:
+            return None
+        
+        with self._load_locks[name]:
+            if name in self.loaded_adapters:
+                return self.loaded_adapters[name]
+            
+            started = datetime.now()
+            safe_log(f"📦 Cargando {name} bajo demanda...")
+            adapter = self._load_one(*definition)
+            if adapter is not None:
+                elapsed = (datetime.now() - started).total_seconds()
+                safe_log(f"✅ {name} cargado en {elapsed:.2f}s")
+            return adapter
         
     def load_all_adapters(self):
         """Cargar todos los adapters SIN PRINTS a stdout"""
@@ -80,55 +150,17 @@ class SilentAdapterLoader:
             null_stream = NullStream()
             
             for name, module_path, class_name in self.adapter_definitions:
+                safe_log(f"📦 Cargando {name}...")
+                
+                # Silenciar prints de los adapters durante import e init
+                sys.stdout = null_stream
                 try:
-                    safe_log(f"📦 Cargando {name}...")
-                    
-                    # Temporalmente silenciar stdout durante import
-                    sys.stdout = null_stream
-                    
-                    # Verificar que el módulo existe
-                    try:
-                        module = __import__(module_path, fromlist=[class_name])
-                    except ImportError as ie:
-                        safe_log(f"❌ No se pudo importar {module_path}: {ie}")
-                        continue
-                    finally:
-                        sys.stdout = original_stdout
-                    
-                    # Verificar que la clase existe
-                    if not hasattr(module, class_name):
-                        safe_log(f"❌ Clase {class_name} no encontrada")
-                        continue
-                    
-                    adapter_class = getattr(module, class_name)
-                    
-                    # Crear instancia - también silenciar prints durante init
-                    sys.stdout = null_stream
-                    try:
-                        adapter_instance = adapter_class()
-                    except Exception as e:
-                        safe_log(f"❌ Error inicializando {name}: {e}")
-                        continue
-                    finally:
-                        sys.stdout = original_stdout
-                    
-                    # Verificar métodos necesarios
-                    if name == "file_manager":
-                        # FileManager usa método 'execute'
-                        required_methods = ['execute']
-                    else:
-                        required_methods = ['process', 'execute']
-                    
-                    available_methods = [method for method in required_methods if hasattr(adapter_instance, method)]
-                    
-                    if available_methods:
-                        self.loaded_adapters[name] = adapter_instance
+                    if self._load_one(name, module_path, class_name) is not None:
                         safe_log(f"✅ {name} cargado correctamente")
-                    else:
-                        safe_log(f"❌ {name} no tiene métodos requeridos: {required_methods}")
-                        
                 except Exception as e:
                     safe_log(f"❌ Error cargando {name}: {e}")
+                finally:
+                    sys.stdout = original_stdout
             
         finally:
             # Restaurar streams originales
@@ -143,18 +175,59 @@ class CleanMCPServer:
     
     def __init__(self):
         self.adapter_loader = SilentAdapterLoader()
-        self.adapters = {}
+        self.adapters = self.adapter_loader.loaded_adapters  # Adapters ya cargados (crece bajo demanda)
+        self.manifest_tools = []
         self.initialized = False
+        self.executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_TOOLS, thread_name_prefix="mcp-tool")
+        self.json_out = sys.stdout  # Canal JSON-RPC; run_stdio desvía los prints a stderr
         
-    def initialize(self):
-        """Inicializar servidor SILENCIOSAMENTE"""
+    def initialize(self, eager: bool = False):
+        """Inicializar servidor SILENCIOSAMENTE (solo lee el manifest; sin manifest o con eager carga todo)"""
         safe_log("🔄 Inicializando servidor MCP...")
-        self.adapters = self.adapter_loader.load_all_adapters()
+        self.manifest_tools = self._load_manifest()
+        
+        if self.manifest_tools and not eager:
+            safe_log(f"✅ Servidor inicializado con {len(self.manifest_tools)} herramientas (carga bajo demanda)")
+        else:
+            self.adapter_loader.load_all_adapters()
+            safe_log(f"✅ Servidor inicializado con {len(self.adapters)} herramientas cargadas")
         self.initialized = True
-        safe_log(f"✅ Servidor inicializado con {len(self.adapters)} herramientas")
+    
+    def _load_manifest(self):
+        """Lee tool_manifest.json y conserva solo herramientas con adapter definido"""
+        try:
+            with open(TOOL_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            safe_log("⚠️ tool_manifest.json no encontrado, carga completa de adapters", "WARNING")
+            return []
+        except Exception as e:
+            safe_log(f"⚠️ Manifest inválido ({e}), carga completa de adapters", "WARNING")
+            return []
         
+        known = set(self.adapter_loader.adapter_names)
+        return [tool for tool in manifest.get("tools", []) if tool.get("name") in known]
+    
+    def known_tool_names(self):
+        if self.manifest_tools:
+            return [tool["name"] for tool in self.manifest_tools]
+        return list(self.adapters.keys())
+    
+    def prewarm(self, names=None):
+        """Carga adapters frecuentes en background para que su primera llamada no pague el import"""
+        loop = asyncio.get_running_loop()
+        for name in names if names is not None else PREWARM_ADAPTERS:
+            if name in self.known_tool_names():
+                loop.run_in_executor(self.executor, self.adapter_loader.load_adapter, name)
+    
     def get_available_tools(self):
-        """Obtener herramientas disponibles"""
+        """Obtener herramientas disponibles (del manifest si existe)"""
+        if self.manifest_tools:
+            return [tool for tool in self.manifest_tools if tool["name"] not in self.adapter_loader.failed_adapters]
+        return self.build_tools_from_adapters()
+    
+    def build_tools_from_adapters(self):
+        """Construye los schemas desde los adapters cargados (usado para regenerar el manifest)"""
         tools = []
         
         for name, adapter in self.adapters.items():
@@ -448,7 +521,7 @@ class CleanMCPServer:
                     }
                 }
                 
-                safe_log(f"✅ Initialize successful - {len(self.adapters)} adapters loaded")
+                safe_log(f"✅ Initialize successful - {len(self.known_tool_names())} tools, {len(self.adapters)} adapters loaded")
                 return self.create_json_rpc_response(request_id, result)
                 
             elif method == "tools/list":
@@ -468,44 +541,18 @@ class CleanMCPServer:
                 if not tool_name:
                     return self.create_error_response(request_id, -32602, "Tool name required")
                 
-                if tool_name not in self.adapters:
-                    available = list(self.adapters.keys())
+                if tool_name not in self.known_tool_names():
+                    available = self.known_tool_names()
                     return self.create_error_response(request_id, -32601, f"Tool '{tool_name}' not found. Available: {available}")
                 
                 try:
-                    safe_log(f"🔧 Executing {tool_name}")
+                    safe_log(f"🔧 Executing {tool_name} (ID: {request_id})")
                     
-                    adapter = self.adapters[tool_name]
-                    
-                    # Capturar cualquier print del adapter
-                    original_stdout = sys.stdout
-                    
-                    try:
-                        # Ejecutar método del adapter con stdout silenciado
-                        class CaptureStream:
-                            def __init__(self):
-                                self.content = []
-                            def write(self, text):
-                                self.content.append(text)
-                            def flush(self):
-                                pass
-                        
-                        capture = CaptureStream()
-                        sys.stdout = capture
-                        
-                        if hasattr(adapter, 'execute'):
-                            raw_result = adapter.execute(arguments)
-                        elif hasattr(adapter, 'process'):
-                            raw_result = adapter.process(arguments)
-                        else:
-                            return self.create_error_response(request_id, -32603, f"Adapter {tool_name} has no execute/process method")
-                    
-                    finally:
-                        sys.stdout = original_stdout
-                        # Los prints del adapter van a stderr si es necesario
-                        if capture.content:
-                            captured_output = ''.join(capture.content)
-                            safe_log(f"📄 Adapter output: {captured_output[:100]}...")
+                    # ✅ ADAPTER SÍNCRONO EN EL EXECUTOR: el loop sigue atendiendo otras solicitudes
+                    loop = asyncio.get_running_loop()
+                    raw_result = await loop.run_in_executor(
+                        self.executor, self._run_adapter, tool_name, arguments
+                    )
                     
                     # Formatear resultado
                     if isinstance(raw_result, dict):
@@ -524,7 +571,7 @@ class CleanMCPServer:
                             "content": [{"type": "text", "text": str(raw_result)}]
                         }
                     
-                    safe_log(f"✅ {tool_name} completed successfully")
+                    safe_log(f"✅ {tool_name} completed successfully (ID: {request_id})")
                     return self.create_json_rpc_response(request_id, formatted_result)
                     
                 except Exception as e:
@@ -546,6 +593,41 @@ class CleanMCPServer:
                 f"Internal error: {e}"
             )
     
+    def _run_adapter(self, tool_name: str, arguments: dict):
+        """Ejecuta el adapter en un hilo del executor (sin event loop propio, asyncio.run funciona)"""
+        adapter = self.adapter_loader.load_adapter(tool_name)
+        if adapter is None:
+            reason = self.adapter_loader.failed_adapters.get(tool_name, "unknown error")
+            raise RuntimeError(f"Adapter {tool_name} could not be loaded: {reason}")
+        
+        if hasattr(adapter, 'execute'):
+            return adapter.execute(arguments)
+        if hasattr(adapter, 'process'):
+            return adapter.process(arguments)
+        raise AttributeError(f"Adapter {tool_name} has no execute/process method")
+    
+    def _write_response(self, response: str):
+        """✅ STDOUT SOLO PARA JSON: una línea por respuesta, identificada por su id"""
+        self.json_out.write(response + "\n")
+        self.json_out.flush()
+    
+    @staticmethod
+    def _is_tool_call(line: str) -> bool:
+        try:
+            return json.loads(line).get("method") == "tools/call"
+        except (json.JSONDecodeError, AttributeError):
+            return False
+    
+    async def _dispatch(self, line: str):
+        """Procesa una solicitud y escribe su respuesta cuando esté lista"""
+        try:
+            response = await self.handle_request(line)
+        except Exception as e:
+            safe_log(f"❌ STDIO error: {e}")
+            response = self.create_error_response(None, -32603, f"Server error: {e}")
+        self._write_response(response)
+        safe_log(f"📤 JSON response sent")
+    
     async def run_stdio(self):
         """Ejecutar servidor en modo stdio - SOLO JSON a stdout"""
         safe_log("📡 Iniciando servidor MCP limpio...")
@@ -554,7 +636,16 @@ class CleanMCPServer:
         if not self.initialized:
             self.initialize()
         
-        safe_log(f"🎯 Servidor listo con {len(self.adapters)} herramientas")
+        safe_log(f"🎯 Servidor listo con {len(self.known_tool_names())} herramientas")
+        
+        # Cualquier print de los adapters (desde cualquier hilo) va a stderr, nunca al canal JSON
+        self.json_out = sys.stdout
+        sys.stdout = sys.stderr
+        
+        if self.manifest_tools:
+            self.prewarm()
+        
+        in_flight = set()
         
         try:
             while True:
@@ -572,26 +663,33 @@ class CleanMCPServer:
                     
                     safe_log(f"📨 Processing: {line[:50]}...")
                     
-                    # Procesar request y enviar SOLO JSON
-                    response = await self.handle_request(line)
-                    
-                    # ✅ STDOUT SOLO PARA JSON
-                    print(response, flush=True)
-                    safe_log(f"📤 JSON response sent")
+                    # tools/call se atiende concurrentemente; initialize/tools/list en orden
+                    if self._is_tool_call(line):
+                        task = asyncio.create_task(self._dispatch(line))
+                        in_flight.add(task)
+                        task.add_done_callback(in_flight.discard)
+                    else:
+                        await self._dispatch(line)
                     
                 except EOFError:
                     safe_log("📪 EOFError received")
                     break
                 except Exception as e:
                     safe_log(f"❌ STDIO error: {e}")
-                    error_response = self.create_error_response(None, -32603, f"Server error: {e}")
-                    print(error_response, flush=True)
+                    self._write_response(self.create_error_response(None, -32603, f"Server error: {e}"))
+            
+            # Terminar las herramientas en curso antes de salir
+            if in_flight:
+                safe_log(f"⏳ Esperando {len(in_flight)} herramientas en curso...")
+                await asyncio.gather(*in_flight, return_exceptions=True)
                     
         except KeyboardInterrupt:
             safe_log("🛑 Server interrupted")
         except Exception as e:
             safe_log(f"❌ Fatal error: {e}")
         finally:
+            sys.stdout = self.json_out
+            self.executor.shutdown(wait=False)
             safe_log("🏁 Server shutting down")
 
 # ✅ TEST CASES ACTUALIZADOS PARA INCLUIR PLAYWRIGHT
@@ -704,7 +802,7 @@ async def test_all_tools_comprehensive():
     safe_log("🧪 INICIANDO TEST COMPLETO DE HERRAMIENTAS...")
     
     server = CleanMCPServer()
-    server.initialize()
+    server.initialize(eager=True)
     
     if not server.initialized:
         safe_log("❌ ERROR: Servidor no se pudo inicializar")
@@ -871,6 +969,16 @@ async def main():
         # Modo servidor MCP - SOLO JSON por stdout
         server = CleanMCPServer()
         await server.run_stdio()
+    elif len(sys.argv) > 1 and sys.argv[1] == "manifest":
+        # Regenerar tool_manifest.json cargando todos los adapters
+        server = CleanMCPServer()
+        server.adapter_loader.load_all_adapters()
+        tools = server.build_tools_from_adapters()
+        manifest = {"_comment": "Generado con: python run_server.py manifest", "tools": tools}
+        with open(TOOL_MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        safe_log(f"✅ Manifest escrito con {len(tools)} herramientas: {TOOL_MANIFEST_PATH}")
     elif len(sys.argv) > 1 and sys.argv[1] == "test":
         # Modo test completo de herramientas
         success = await test_all_tools_comprehensive()
@@ -885,7 +993,7 @@ async def main():
         safe_log("🧪 Modo diagnóstico básico...")
         
         server = CleanMCPServer()
-        server.initialize()
+        server.initialize(eager=True)
         
         tools = server.get_available_tools()
         
@@ -8,7 +8,7 @@ import hashlib
 from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 import logging
-from sentence_transformers import SentenceTransformer
+from embedding_service import get_embedding_service
 
 try:
     from qdrant_client import QdrantClient
@@ -35,8 +35,8 @@ class QdrantMultimodalMemory:
             # Conectar a Qdrant (local o cloud)
             self.client = QdrantClient(host=host, port=port)
             
-            # Inicializar modelo de embeddings para texto
-            self.text_encoder = SentenceTransformer('all-MiniLM-L6-v2')
+            # Modelo de embeddings compartido con el resto de memorias del proceso
+            self.text_encoder = get_embedding_service('all-MiniLM-L6-v2')
             
             # Crear colecciones necesarias
             self._init_collections()
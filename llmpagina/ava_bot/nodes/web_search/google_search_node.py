@@ -4,6 +4,13 @@ import logging
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import requests
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tool_cache import get_tool_cache, make_key, ttl_for
 
 # Configuración básica
 load_dotenv()
@@ -56,6 +63,9 @@ class GoogleSearchNode:
         else:
             logger.warning("⚠️ GROQ_API_KEY not found - analysis disabled")
         
+        # Resultados repetidos no consumen cuota Tavily/Google
+        self.result_cache = get_tool_cache()
+        
         # Contadores para Google API
         self.search_count = 0
         self.last_reset = datetime.now()
@@ -77,10 +87,12 @@ class GoogleSearchNode:
             return []
         
         # Usar Tavily si está disponible
-        if self.use_tavily:
-            return self._search_with_tavily(query, num_results)
-        else:
-            return self._search_with_google(query, num_results)
+        run_search = self._search_with_tavily if self.use_tavily else self._search_with_google
+        return self.result_cache.get_or_compute(
+            make_key('google_search', 'search', search_query=query, max_results=num_results),
+            lambda: run_search(query, num_results),
+            ttl_for('google_search')
+        )
     
     def _search_with_tavily(self, query, num_results=5):
         """Búsqueda con Tavily"""
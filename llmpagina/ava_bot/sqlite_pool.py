@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Pool de Conexiones SQLite
+=========================
+
+Gestor único de conexiones para las bases SQLite del proyecto (users.db,
+memory.db, multimodal_memory.db...), en lugar de abrir y cerrar una conexión
+en cada operación:
+
+- Una conexión por hilo y por base, reutilizada entre llamadas. close()
+  la devuelve al pool (con rollback de lo no confirmado) en vez de cerrarla.
+- Al abrir: WAL, synchronous=NORMAL, busy_timeout, mmap_size y temp_store en
+  memoria. WAL deja leer mientras otro worker de gunicorn escribe y
+  busy_timeout espera al bloqueo en lugar de fallar con "database is locked".
+- Las sentencias preparadas se reutilizan: la cache de sentencias de sqlite3
+  (SQLITE_STATEMENT_CACHE) vive tanto como la conexión del pool.
+- Seguro ante fork (las conexiones heredadas del padre se ignoran) y ante
+  fugas: mientras está prestada el pool solo guarda una referencia débil, así
+  que una conexión que nadie cierra se libera como antes al perder su último
+  uso. Un préstamo anidado en el mismo hilo recibe una conexión temporal.
+- Las rutas se resuelven en un solo sitio: register_database()/database_path().
+
+Uso:
+    with db_connection(path) as conn:      # como sqlite3.connect(): commit/rollback
+        conn.execute(...)
+
+    conn = get_connection(path, row_factory=sqlite3.Row)   # estilo get_db_connection()
+    ...
+    conn.close()                                           # vuelve al pool
+"""
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Type, Union
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.absolute()
+
+BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+STATEMENT_CACHE = int(os.environ.get('SQLITE_STATEMENT_CACHE', '256'))
+SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+# Bases con nombre: única fuente de verdad para sus rutas
+_databases: Dict[str, str] = {
+    'users': os.environ.get('USERS_DB_PATH', str(PROJECT_ROOT / 'instance' / 'users.db')),
+}
+_databases_lock = threading.Lock()
+
+
+def resolve_path(path: Union[str, Path]) -> str:
+    path = str(path)
+    if path == ':memory:' or path.startswith('file:'):
+        return path
+    return str(Path(path).absolute())
+
+
+def register_database(name: str, path: Union[str, Path]) -> str:
+    """Registra (o actualiza) la ruta de una base con nombre"""
+    resolved = resolve_path(path)
+    with _databases_lock:
+        if _databases.get(name) != resolved:
+            _databases[name] = resolved
+            logger.info(f"🗃️ Base '{name}': {resolved}")
+    return resolved
+
+
+def database_path(name: str) -> Optional[str]:
+    with _databases_lock:
+        return _databases.get(name)
+
+
+def read_only_uri(path: Union[str, Path]) -> str:
+    """URI de solo lectura para get_connection() (consultas que nunca escriben)"""
+    return f"{Path(path).absolute().as_uri()}?mode=ro"
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexión cuyo close() la devuelve al pool del hilo"""
+    pool_key = None
+    owner_pid = None
+
+    def close(self):
+        if self.pool_key is not None and self.owner_pid == os.getpid():
+            _manager.release(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Cierre real (conexión rota o pool cerrándose)"""
+        super().close()
+
+
+class ConnectionManager:
+    """Conexiones por hilo y por (ruta, clase de conexión)"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._prepared_paths = set()
+        self._prepared_lock = threading.Lock()
+
+    def _slots(self) -> dict:
+        slots = getattr(self._local, 'slots', None)
+        if slots is None or getattr(self._local, 'pid', None) != os.getpid():
+            # Hilo nuevo o proceso hijo tras fork: no reutilizar conexiones del padre
+            slots = self._local.slots = {}
+            self._local.pid = os.getpid()
+        return slots
+
+    def _open(self, path: str, factory: Type[PooledConnection]) -> PooledConnection:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, factory=factory,
+                               cached_statements=STATEMENT_CACHE, check_same_thread=False,
+                               uri=path.startswith('file:'))
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if MMAP_SIZE:
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+
+        # journal_mode es persistente en el archivo: basta una vez por base y proceso
+        if path not in self._prepared_paths and path != ':memory:':
+            try:
+                mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+                if mode.lower() != 'wal':
+                    logger.warning(f"⚠️ {path} sigue en journal_mode={mode}")
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ No se pudo activar WAL en {path}: {e}")
+            with self._prepared_lock:
+                self._prepared_paths.add(path)
+        return conn
+
+    def connect(self, path: Union[str, Path], row_factory: Optional[Callable] = None,
+                factory: Type[PooledConnection] = PooledConnection) -> PooledConnection:
+        """Conexión del pool del hilo (o temporal si la del pool ya está prestada)"""
+        path = resolve_path(path)
+        key = (path, factory)
+        slots = self._slots()
+        entry = slots.get(key)
+
+        conn = None
+        if isinstance(entry, weakref.ref):
+            if entry() is not None:
+                # Préstamo anidado en el mismo hilo: conexión aparte, se cierra de verdad
+                conn = self._open(path, factory)
+                conn.row_factory = row_factory
+                return conn
+        elif entry is not None:
+            conn = entry
+
+        if conn is None:
+            conn = self._open(path, factory)
+            conn.pool_key = key
+            conn.owner_pid = os.getpid()
+
+        # Mientras está prestada solo se guarda una referencia débil
+        slots[key] = weakref.ref(conn)
+        conn.row_factory = row_factory
+        return conn
+
+    def release(self, conn: PooledConnection):
+        slots = self._slots()
+        entry = slots.get(conn.pool_key)
+        if not isinstance(entry, weakref.ref) or entry() is not conn:
+            return  # ya devuelta (close() repetido)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            slots[conn.pool_key] = conn
+        except sqlite3.Error as e:
+            logger.debug(f"Conexión descartada al devolverla al pool: {e}")
+            slots.pop(conn.pool_key, None)
+            conn.discard()
+
+    @contextmanager
+    def connection(self, path: Union[str, Path], row_factory: Optional[Callable] = None,
+                   factory: Type[PooledConnection] = PooledConnection) -> Iterator[PooledConnection]:
+        """Equivale a `with sqlite3.connect(path) as conn`, pero con la conexión del pool"""
+        conn = self.connect(path, row_factory=row_factory, factory=factory)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def close_thread_connections(self):
+        """Cierra las conexiones libres del hilo actual"""
+        slots = self._slots()
+        for key, entry in list(slots.items()):
+            if isinstance(entry, PooledConnection):
+                entry.discard()
+                del slots[key]
+
+
+_manager = ConnectionManager()
+
+
+def get_connection(path: Union[str, Path], row_factory: Optional[Callable] = None,
+                   factory: Type[PooledConnection] = PooledConnection) -> PooledConnection:
+    return _manager.connect(path, row_factory=row_factory, factory=factory)
+
+
+def db_connection(path: Union[str, Path], row_factory: Optional[Callable] = None,
+                  factory: Type[PooledConnection] = PooledConnection):
+    return _manager.connection(path, row_factory=row_factory, factory=factory)
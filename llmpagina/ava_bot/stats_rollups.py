@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Rollups de Estadísticas del Dashboard
+=====================================
+
+Tablas de agregados mantenidas por triggers (insert/update/delete), para que
+el dashboard lea unas pocas filas en lugar de recorrer memory_entries y
+login_attempts con COUNT/GROUP BY DATE(...) en cada visita:
+
+memory.db
+- memory_daily_stats(day, user_id, entry_type, entries)
+- memory_user_stats(user_id, entry_type, entries, first_at, last_at)
+
+users.db
+- login_daily_stats(day, attempts, successes)
+
+Los agregados reflejan las filas vivas: el recorte de mensajes antiguos de
+SQLiteMemoryManager también descuenta. La primera vez se crean y se pueblan
+(backfill) en la misma transacción que los triggers.
+
+- ensure_memory_rollups(conn) / ensure_login_rollups(conn)
+- backfill_memory_rollups(conn) / backfill_login_rollups(conn)
+
+Recalcular a mano:
+    python llmpagina/ava_bot/stats_rollups.py [--memory-db RUTA] [--users-db RUTA]
+"""
+import logging
+import sqlite3
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+MEMORY_ROLLUP_TABLES = ("memory_daily_stats", "memory_user_stats")
+LOGIN_ROLLUP_TABLES = ("login_daily_stats",)
+
+# Fecha agregable: '' para timestamps que DATE() no entiende
+MEMORY_DAY = "COALESCE(DATE({row}.timestamp), '')"
+LOGIN_DAY = "COALESCE(DATE({row}.attempted_at), '')"
+
+
+def _tables_exist(conn: sqlite3.Connection, tables) -> bool:
+    placeholders = ", ".join("?" for _ in tables)
+    count = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", tuple(tables)
+    ).fetchone()[0]
+    return count == len(tables)
+
+
+def memory_rollups_ready(conn: sqlite3.Connection) -> bool:
+    return _tables_exist(conn, MEMORY_ROLLUP_TABLES)
+
+
+def login_rollups_ready(conn: sqlite3.Connection) -> bool:
+    return _tables_exist(conn, LOGIN_ROLLUP_TABLES)
+
+
+def _in_write_transaction(conn: sqlite3.Connection, work: Callable[[], None]):
+    """BEGIN IMMEDIATE: ningún insert se cuela entre el backfill y los triggers"""
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        work()
+        if own_transaction:
+            conn.commit()
+    except Exception:
+        if own_transaction:
+            conn.rollback()
+        raise
+
+
+# ----------------------------------------------------------------------
+# memory.db
+# ----------------------------------------------------------------------
+def _memory_add_sql(row: str) -> str:
+    day = MEMORY_DAY.format(row=row)
+    return f"""
+        INSERT INTO memory_daily_stats (day, user_id, entry_type, entries)
+        VALUES ({day}, {row}.user_id, {row}.entry_type, 1)
+        ON CONFLICT(day, user_id, entry_type) DO UPDATE SET entries = entries + 1;
+        INSERT INTO memory_user_stats (user_id, entry_type, entries, first_at, last_at)
+        VALUES ({row}.user_id, {row}.entry_type, 1, {row}.timestamp, {row}.timestamp)
+        ON CONFLICT(user_id, entry_type) DO UPDATE SET
+            entries = entries + 1,
+            first_at = MIN(COALESCE(first_at, excluded.first_at), excluded.first_at),
+            last_at = MAX(COALESCE(last_at, excluded.last_at), excluded.last_at);
+    """
+
+
+def _memory_remove_sql(row: str) -> str:
+    # En un trigger AFTER la fila ya no está: MIN/MAX se recalculan sin ella
+    # (el planificador usa idx_user_timestamp: recorre las filas del usuario y filtra entry_type)
+    day = MEMORY_DAY.format(row=row)
+    match_day = f"day = {day} AND user_id = {row}.user_id AND entry_type = {row}.entry_type"
+    match_user = f"user_id = {row}.user_id AND entry_type = {row}.entry_type"
+    return f"""
+        UPDATE memory_daily_stats SET entries = entries - 1 WHERE {match_day};
+        DELETE FROM memory_daily_stats WHERE {match_day} AND entries <= 0;
+        UPDATE memory_user_stats SET
+            entries = entries - 1,
+            first_at = (SELECT MIN(timestamp) FROM memory_entries WHERE {match_user}),
+            last_at = (SELECT MAX(timestamp) FROM memory_entries WHERE {match_user})
+        WHERE {match_user};
+        DELETE FROM memory_user_stats WHERE {match_user} AND entries <= 0;
+    """
+
+
+def backfill_memory_rollups(conn: sqlite3.Connection):
+    """Recalcula los agregados de memory_entries desde cero"""
+    conn.execute("DELETE FROM memory_daily_stats")
+    conn.execute("DELETE FROM memory_user_stats")
+    conn.execute(f"""
+        INSERT INTO memory_daily_stats (day, user_id, entry_type, entries)
+        SELECT {MEMORY_DAY.format(row='memory_entries')}, user_id, entry_type, COUNT(*)
+        FROM memory_entries
+        GROUP BY 1, 2, 3
+    """)
+    conn.execute("""
+        INSERT INTO memory_user_stats (user_id, entry_type, entries, first_at, last_at)
+        SELECT user_id, entry_type, COUNT(*), MIN(timestamp), MAX(timestamp)
+        FROM memory_entries
+        GROUP BY user_id, entry_type
+    """)
+
+
+def ensure_memory_rollups(conn: sqlite3.Connection) -> bool:
+    """Crea tablas y triggers de agregados en memory.db si faltan (con backfill inicial)"""
+    existed = memory_rollups_ready(conn)
+
+    def create():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS memory_daily_stats (
+                day TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                entry_type TEXT NOT NULL,
+                entries INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, user_id, entry_type)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS memory_user_stats (
+                user_id TEXT NOT NULL,
+                entry_type TEXT NOT NULL,
+                entries INTEGER NOT NULL DEFAULT 0,
+                first_at TEXT,
+                last_at TEXT,
+                PRIMARY KEY (user_id, entry_type)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS memory_entries_rollup_ai AFTER INSERT ON memory_entries BEGIN
+                {_memory_add_sql('new')}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS memory_entries_rollup_ad AFTER DELETE ON memory_entries BEGIN
+                {_memory_remove_sql('old')}
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS memory_entries_rollup_au
+            AFTER UPDATE OF user_id, entry_type, timestamp ON memory_entries BEGIN
+                {_memory_remove_sql('old')}
+                {_memory_add_sql('new')}
+            END
+        """)
+        if not existed:
+            backfill_memory_rollups(conn)
+
+    if existed:
+        create()
+        return True
+
+    _in_write_transaction(conn, create)
+    logger.info("✅ Agregados de memory_entries creados y poblados")
+    return True
+
+
+# ----------------------------------------------------------------------
+# users.db
+# ----------------------------------------------------------------------
+def backfill_login_rollups(conn: sqlite3.Connection):
+    """Recalcula los intentos de login por día desde cero"""
+    conn.execute("DELETE FROM login_daily_stats")
+    conn.execute(f"""
+        INSERT INTO login_daily_stats (day, attempts, successes)
+        SELECT {LOGIN_DAY.format(row='login_attempts')}, COUNT(*), COALESCE(SUM(success), 0)
+        FROM login_attempts
+        GROUP BY 1
+    """)
+
+
+def ensure_login_rollups(conn: sqlite3.Connection) -> bool:
+    """Crea tabla y triggers de login_daily_stats en users.db si faltan (con backfill inicial)"""
+    existed = login_rollups_ready(conn)
+    new_day = LOGIN_DAY.format(row='new')
+    old_day = LOGIN_DAY.format(row='old')
+
+    def create():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS login_daily_stats (
+                day TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS login_attempts_rollup_ai AFTER INSERT ON login_attempts BEGIN
+                INSERT INTO login_daily_stats (day, attempts, successes)
+                VALUES ({new_day}, 1, COALESCE(new.success, 0))
+                ON CONFLICT(day) DO UPDATE SET
+                    attempts = attempts + 1,
+                    successes = successes + excluded.successes;
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS login_attempts_rollup_ad AFTER DELETE ON login_attempts BEGIN
+                UPDATE login_daily_stats SET
+                    attempts = attempts - 1,
+                    successes = successes - COALESCE(old.success, 0)
+                WHERE day = {old_day};
+                DELETE FROM login_daily_stats WHERE day = {old_day} AND attempts <= 0;
+            END
+        """)
+        if not existed:
+            backfill_login_rollups(conn)
+
+    if existed:
+        create()
+        return True
+
+    _in_write_transaction(conn, create)
+    logger.info("✅ Agregados de login_attempts creados y poblados")
+    return True
+
+
+def main():
+    import argparse
+    import os
+    from pathlib import Path
+
+    from sqlite_pool import database_path, db_connection
+
+    default_memory_db = os.getenv("MEMORY_DB_PATH") or str(Path(__file__).parent / "tools" / "adapters" / "memory.db")
+
+    parser = argparse.ArgumentParser(description='Recalcula los agregados de estadísticas del dashboard')
+    parser.add_argument('--memory-db', default=default_memory_db, help='Ruta de memory.db')
+    parser.add_argument('--users-db', default=database_path('users'), help='Ruta de users.db')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    jobs = (
+        (args.memory_db, ensure_memory_rollups, backfill_memory_rollups),
+        (args.users_db, ensure_login_rollups, backfill_login_rollups),
+    )
+    for db_path, ensure, backfill in jobs:
+        if not db_path or not os.path.exists(db_path):
+            print(f"⚠️ {db_path}: no existe, se omite")
+            continue
+        with db_connection(db_path) as conn:
+            ensure(conn)
+            _in_write_transaction(conn, lambda: backfill(conn))
+        print(f"✅ {db_path}: agregados recalculados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Cache de Resultados de Herramientas
+===================================
+
+Resultados de herramientas caras (render completo con Playwright, búsquedas
+Tavily/Google de pago) reutilizables entre llamadas y reinicios.
+
+- Clave normalizada: (tool, action, url, search_query, max_results).
+- TTL por herramienta (TOOL_TTLS, sobrescribible con TOOL_CACHE_TTL_<TOOL>).
+- Nivel en memoria: LRU acotado por número de entradas.
+- Nivel en disco: SQLite en TOOL_CACHE_DIR, sobrevive reinicios.
+- Stale-while-revalidate: pasado el TTL y dentro de la ventana de
+  obsolescencia se devuelve el valor viejo al instante y se refresca en
+  segundo plano (una sola recarga por clave).
+- Contadores hits / stale_hits / misses / refreshes / errors en stats().
+
+Los valores deben ser serializables a JSON (str, dict, list).
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Datos de ejecución en instance/ (como users.db), fuera del árbol de código
+CACHE_DIR = os.environ.get('TOOL_CACHE_DIR', os.path.join(PROJECT_DIR, 'instance', 'tool_cache'))
+MEMORY_MAX_ENTRIES = int(os.environ.get('TOOL_CACHE_MAX_ENTRIES', '512'))
+DISK_MAX_ENTRIES = int(os.environ.get('TOOL_CACHE_DISK_MAX_ENTRIES', '5000'))
+STALE_FACTOR = float(os.environ.get('TOOL_CACHE_STALE_FACTOR', '4'))  # ventana stale = TTL * factor
+
+# TTL en segundos por herramienta (o herramienta:acción)
+TOOL_TTLS: Dict[str, int] = {
+    'playwright:smart_extract': 30 * 60,   # precios y listados cambian durante el día
+    'playwright:auto_search': 30 * 60,
+    'playwright:analyze_site': 24 * 3600,
+    'search': 60 * 60,                     # Tavily (SearchAdapter)
+    'google_search': 6 * 3600,             # GoogleSearchNode (cuota diaria)
+}
+DEFAULT_TTL = 15 * 60
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize_text(value: Any) -> str:
+    return _WHITESPACE.sub(' ', str(value or '')).strip().lower()
+
+
+def _normalize_url(url: Any) -> str:
+    """Solo esquema y host no distinguen mayúsculas: ruta y query se conservan tal cual"""
+    url = str(url or '').strip()
+    if not url:
+        return ''
+    if '://' not in url:
+        url = f"https://{url}"  # PlaywrightAdapter completa así las URLs sin esquema
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path if parts.path != '/' else ''
+    # El fragmento no llega al servidor: no cambia el resultado
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+def make_key(tool: str, action: str = '', url: str = '', search_query: str = '',
+             max_results: Any = '') -> str:
+    """Clave estable: mayúsculas y espacios del texto, y el caso de esquema y host, no cambian el resultado"""
+    return '|'.join([
+        _normalize_text(tool),
+        _normalize_text(action),
+        _normalize_url(url),
+        _normalize_text(search_query),
+        str(max_results if max_results is not None else '')
+    ])
+
+
+def ttl_for(tool: str, action: str = '') -> int:
+    """TTL de la herramienta: variable de entorno > acción > herramienta > defecto"""
+    for name in (f"{tool}:{action}" if action else None, tool):
+        if not name:
+            continue
+        env_value = os.environ.get(f"TOOL_CACHE_TTL_{re.sub(r'[^A-Z0-9]', '_', name.upper())}")
+        if env_value:
+            return int(env_value)
+        if name in TOOL_TTLS:
+            return TOOL_TTLS[name]
+    return DEFAULT_TTL
+
+
+class ToolResultCache:
+    """Cache LRU en memoria + SQLite en disco con stale-while-revalidate"""
+
+    def __init__(self, directory: str = CACHE_DIR, max_entries: int = MEMORY_MAX_ENTRIES,
+                 disk_max_entries: int = DISK_MAX_ENTRIES, stale_factor: float = STALE_FACTOR):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.stale_factor = stale_factor
+
+        # clave -> (valor, fresco_hasta, obsoleto_hasta)
+        self._memory: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        self.counters = {'hits': 0, 'stale_hits': 0, 'disk_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+        self.db_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.db_path = os.path.join(directory, 'tool_results.db')
+            with self._connect() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS tool_results (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        fresh_until REAL NOT NULL,
+                        stale_until REAL NOT NULL,
+                        stored_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_tool_results_stale ON tool_results(stale_until)')
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Cache de herramientas solo en memoria: {e}")
+            self.db_path = None
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    # ------------------------------------------------------------------
+    # Niveles memoria / disco
+    # ------------------------------------------------------------------
+    def _remember(self, key: str, entry: Tuple[Any, float, float]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        if not self.db_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT value, fresh_until, stale_until FROM tool_results WHERE key = ? AND stale_until > ?',
+                    (key, time.time())
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Cache en disco no disponible: {e}")
+            return None
+        if row is None:
+            return None
+
+        entry = (json.loads(row[0]), row[1], row[2])
+        self.counters['disk_hits'] += 1
+        self._remember(key, entry)
+        return entry
+
+    def set(self, key: str, value: Any, ttl: int):
+        now = time.time()
+        entry = (value, now + ttl, now + ttl * (1 + self.stale_factor))
+        self._remember(key, entry)
+
+        if not self.db_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO tool_results (key, value, fresh_until, stale_until, stored_at) VALUES (?, ?, ?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), entry[1], entry[2], now)
+                )
+                # Acotar el disco: fuera lo vencido y, si sobra, lo más antiguo
+                conn.execute('DELETE FROM tool_results WHERE stale_until < ?', (now,))
+                conn.execute('''
+                    DELETE FROM tool_results WHERE key IN (
+                        SELECT key FROM tool_results ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.disk_max_entries,))
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.debug(f"Resultado no guardado en disco: {e}")
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute('DELETE FROM tool_results WHERE key = ?', (key,))
+            except sqlite3.Error:
+                pass
+
+    # ------------------------------------------------------------------
+    # API principal
+    # ------------------------------------------------------------------
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: int,
+                       cacheable: Callable[[Any], bool] = bool) -> Any:
+        """Valor cacheado si existe; si está obsoleto se refresca en segundo plano"""
+        entry = self._lookup(key)
+        now = time.time()
+
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self.counters['hits'] += 1
+                return value
+            if now < stale_until:
+                self.counters['stale_hits'] += 1
+                self._refresh_async(key, compute, ttl, cacheable)
+                return value
+
+        self.counters['misses'] += 1
+        value = compute()
+        if cacheable(value):
+            self.set(key, value, ttl)
+        return value
+
+    def _refresh_async(self, key: str, compute: Callable[[], Any], ttl: int, cacheable: Callable[[Any], bool]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = compute()
+                if cacheable(value):
+                    self.set(key, value, ttl)
+                    self.counters['refreshes'] += 1
+            except Exception as e:
+                self.counters['errors'] += 1
+                logger.warning(f"⚠️ Error refrescando cache ({key}): {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="tool-cache-refresh", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters['hits'] + self.counters['stale_hits'] + self.counters['misses']
+        return dict(
+            self.counters,
+            memory_entries=len(self._memory),
+            hit_rate=round((lookups - self.counters['misses']) / lookups, 3) if lookups else 0.0
+        )
+
+
+_cache: Optional[ToolResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Cache compartido del proceso"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ToolResultCache()
+        return _cache
@@ -5,6 +5,8 @@ from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from image_registry import get_image_registry
+
 class FileManagerAdapter:
     """Adapter MCP para manejo elegante de archivos locales - SOLO MÉTODO URL"""
     
@@ -401,29 +403,26 @@ class FileManagerAdapter:
             
             target_dir = self.allowed_dirs[directory]
             
-            # Buscar archivos de imagen
-            image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp']
-            image_files = []
-            
-            for ext in image_extensions:
-                image_files.extend(target_dir.glob(f"*{ext}"))
+            # Consulta al registro de imágenes (sin glob ni stat de cada archivo)
+            registry = get_image_registry()
+            if not registry.tracks(target_dir):
+                # Directorio sin ganchos de escritura: recorrerlo de forma explícita
+                registry.rebuild([target_dir])
+            latest = registry.latest(directory=target_dir)
             
-            if not image_files:
+            if not latest:
                 return {
                     "content": [{"type": "text", "text": f"❌ No se encontraron imágenes en {directory}"}]
                 }
             
-            # Ordenar por fecha de modificación
-            latest_image = max(image_files, key=lambda x: x.stat().st_mtime)
-            
-            stat = latest_image.stat()
+            latest_image = Path(latest['path'])
             
             result_text = f"""🖼️ **Última imagen encontrada:**
 
 📄 **Nombre:** {latest_image.name}
 📁 **Ubicación:** {directory}
-📊 **Tamaño:** {self._format_size(stat.st_size)}
-📅 **Modificado:** {datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}
+📊 **Tamaño:** {self._format_size(latest['size'])}
+📅 **Modificado:** {datetime.fromtimestamp(latest['mtime']).strftime('%Y-%m-%d %H:%M:%S')}
 🔗 **Tipo:** {mimetypes.guess_type(str(latest_image))[0]}
 
 ✅ **Lista para envío por email usando método URL**
@@ -9,6 +9,9 @@ from pathlib import Path
 import io
 from PIL import Image, ImageDraw, ImageFont
 
+from image_derivatives import schedule_derivatives
+from image_registry import register_image
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -46,13 +49,19 @@ class ImageAdapter:
             result = self._generate_with_together_flux(prompt, style)
             
             if result.get('success'):
+                filepath = os.path.abspath(result['filepath'])
                 return {
+                    # Campo estructurado para Flask/IPC (frame IMAGE): sin parsear el texto
+                    "image": {
+                        "path": filepath,
+                        "filename": os.path.basename(filepath)
+                    },
                     "content": [{
                         "type": "text",
                         "text": f"🎨 **¡Imagen generada exitosamente con IA!**\n\n"
                                f"📝 **Descripción:** {prompt}\n"
                                f"🎭 **Estilo:** {style}\n"
-                               f"📁 **Guardada en:** {result['filepath']}\n"
+                               f"📁 **Guardada en:** {filepath}\n"
                                f"🤖 **Modelo:** FLUX.1-schnell-Free\n"
                                f"⚡ **Generada en:** {result.get('generation_time', 'N/A')} segundos\n\n"
                                f"✨ **¡Tu imagen está lista para usar!**"
@@ -191,6 +200,10 @@ class ImageAdapter:
             with open(img_path, 'wb') as f:
                 f.write(image_data)
             
+            # ✅ REGISTRO DE IMÁGENES Y DERIVADOS (WebP, tamaños, JPEG para visión) EN SEGUNDO PLANO
+            register_image(img_path, source='image_adapter')
+            schedule_derivatives(img_path)
+            
             # ✅ GUARDAR METADATOS
             meta_data = {
                 "prompt": prompt,
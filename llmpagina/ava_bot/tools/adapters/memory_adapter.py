@@ -2,6 +2,8 @@ import os
 import sys
 import base64
 import hashlib
+import logging
+import threading
 from datetime import datetime
 from pathlib import Path
 import json
@@ -10,17 +12,39 @@ import sqlite3
 import time
 import platform
 
+try:
+    from fts_utils import MEMORY_ENTRIES_FTS, ensure_fts, fts_match_query
+    FTS_UTILS_AVAILABLE = True
+except ImportError:
+    FTS_UTILS_AVAILABLE = False
+
+from sqlite_pool import db_connection, register_database
+from stats_rollups import ensure_memory_rollups
+from write_behind import get_write_behind
+
+logger = logging.getLogger(__name__)
+
 # ✅ RUTAS SIMPLIFICADAS Y ROBUSTAS
 current_dir = Path(__file__).parent
 project_root = current_dir.parent.parent.parent.parent
 
+# Mensajes que se conservan por usuario; el recorte lo hace la compactación periódica
+MESSAGE_HISTORY_LIMIT = int(os.getenv("MEMORY_MESSAGE_HISTORY", "10"))
+COMPACTION_INTERVAL = int(os.getenv("MEMORY_COMPACTION_INTERVAL", "60"))
+
+# Usuarios con mensajes nuevos desde la última compactación, por base de datos
+_users_to_trim = {}
+_users_to_trim_lock = threading.Lock()
+
 class SQLiteMemoryManager:
     """Sistema de memoria SQLite mejorado - SIN DEPENDENCIA DE JSON"""
     
     def __init__(self):
         self.db_path = self._get_universal_db_path()
+        register_database('memory', self.db_path)
         self.images_dir = current_dir / "stored_images"
         self.images_dir.mkdir(exist_ok=True)
+        self.fts_enabled = False
         self.init_database()
         print(f"🗃️ SQLiteMemoryManager inicializado. DB: {self.db_path}")
         print(f"🖼️ Directorio de imágenes: {self.images_dir}")
@@ -56,7 +80,7 @@ class SQLiteMemoryManager:
     def init_database(self):
         """Inicializar la base de datos - SINTAXIS CORREGIDA"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 # Tabla principal multimodal
                 conn.execute('''
                     CREATE TABLE IF NOT EXISTS memory_entries (
@@ -105,39 +129,81 @@ class SQLiteMemoryManager:
                     ON file_attachments(file_hash)
                 ''')
                 
+                # Índice full-text (FTS5) sincronizado por triggers
+                if FTS_UTILS_AVAILABLE:
+                    self.fts_enabled = ensure_fts(conn, MEMORY_ENTRIES_FTS)
+                
+                # Agregados para el dashboard (mantenidos por triggers)
+                ensure_memory_rollups(conn)
+                
                 print("✅ Base de datos SQLite inicializada con índices optimizados")
                 
         except Exception as e:
             print(f"❌ Error inicializando base de datos: {e}")
     
     def add_message(self, user_id, message, response=None):
-        """Agregar mensaje de texto a SQLite - OPTIMIZADO"""
+        """Agregar mensaje de texto a SQLite - WRITE-BEHIND
+
+        Se encola y se escribe en el próximo lote (todas las sesiones en una
+        transacción); el recorte a MESSAGE_HISTORY_LIMIT lo hace la compactación.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute('''
-                    INSERT INTO memory_entries (user_id, entry_type, content, response)
-                    VALUES (?, 'message', ?, ?)
-                ''', (user_id, message, response))
-                
-                # ✅ SINTAXIS CORREGIDA: Usar LIMIT con subquery
-                conn.execute('''
-                    DELETE FROM memory_entries 
-                    WHERE user_id = ? AND entry_type = 'message' 
-                    AND id NOT IN (
-                        SELECT id FROM memory_entries 
-                        WHERE user_id = ? AND entry_type = 'message'
-                        ORDER BY timestamp DESC 
-                        LIMIT 10
-                    )
-                ''', (user_id, user_id))
-                
-                print(f"💬 Mensaje agregado a SQLite para {user_id}")
-                return True
+            writer = get_write_behind(self.db_path)
+            writer.add_compaction('trim_message_history', self._make_history_compaction(writer.db_path),
+                                  COMPACTION_INTERVAL)
+            
+            # Hora del turno, no la del lote (mismo formato que CURRENT_TIMESTAMP)
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+            queued = writer.submit('''
+                INSERT INTO memory_entries (user_id, entry_type, content, response, timestamp)
+                VALUES (?, 'message', ?, ?, ?)
+            ''', (user_id, message, response, timestamp))
+            
+            if queued:
+                # Después de encolar: si la compactación llega antes que el INSERT, el
+                # usuario sigue pendiente y se recorta en la siguiente
+                with _users_to_trim_lock:
+                    _users_to_trim.setdefault(writer.db_path, set()).add(user_id)
+                logger.debug(f"💬 Mensaje encolado para SQLite ({user_id})")
+            return queued
                 
         except Exception as e:
-            print(f"❌ Error agregando mensaje a SQLite: {e}")
+            logger.error(f"❌ Error agregando mensaje a SQLite: {e}")
             return False
     
+    def add_conversation(self, user_id, user_input, response):
+        """Turno completo del chat (lo usa LLMWithMCPTools)"""
+        return self.add_message(user_id, user_input, response)
+    
+    @staticmethod
+    def _make_history_compaction(db_path):
+        """Compactación de la base db_path: solo recorre a los usuarios con mensajes nuevos"""
+        def compact(conn):
+            with _users_to_trim_lock:
+                user_ids = _users_to_trim.pop(db_path, set())
+            removed = sum(SQLiteMemoryManager._compact_message_history(conn, user_id) for user_id in user_ids)
+            if removed:
+                logger.info(f"🧹 Historial compactado: {removed} mensajes antiguos de {len(user_ids)} usuarios")
+        return compact
+    
+    @staticmethod
+    def _compact_message_history(conn, user_id):
+        """Conserva los últimos MESSAGE_HISTORY_LIMIT mensajes del usuario (recorre idx_user_timestamp)"""
+        cursor = conn.execute('''
+            DELETE FROM memory_entries
+            WHERE id IN (
+                SELECT id FROM memory_entries
+                WHERE user_id = ? AND entry_type = 'message'
+                ORDER BY timestamp DESC, id DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (user_id, MESSAGE_HISTORY_LIMIT))
+        return max(cursor.rowcount, 0)
+    
+    def flush(self, timeout=None):
+        """Espera a que los mensajes encolados estén escritos (antes de leerlos, tests, cierre)"""
+        return get_write_behind(self.db_path).flush(timeout)
+    
     def add_image(self, user_id, image_path, description=""):
         """Agregar imagen a SQLite - ERROR CORREGIDO"""
         try:
@@ -163,7 +229,7 @@ class SQLiteMemoryManager:
                 image_hash = hashlib.md5(image_data).hexdigest()
             
             # Verificar si ya existe
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 existing = conn.execute('''
                     SELECT fa.stored_path FROM file_attachments fa
                     JOIN memory_entries me ON fa.memory_entry_id = me.id
@@ -192,7 +258,7 @@ class SQLiteMemoryManager:
                 print(f"📁 Imagen copiada a: {stored_image_path}")
             
             # Guardar en base de datos con transacción
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 # Insertar entrada principal
                 cursor = conn.execute('''
                     INSERT INTO memory_entries (user_id, entry_type, metadata)
@@ -247,23 +313,37 @@ class SQLiteMemoryManager:
             return False
     
     def search_messages(self, user_id, query, limit=5):
-        """Búsqueda en SQLite con indexación optimizada"""
+        """Búsqueda full-text (FTS5 + BM25); LIKE si FTS5 no está disponible"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                results = conn.execute('''
-                    SELECT content, response, timestamp FROM memory_entries
-                    WHERE user_id = ? AND entry_type = 'message' 
-                    AND (content LIKE ? OR response LIKE ?)
-                    ORDER BY timestamp DESC LIMIT ?
-                ''', (user_id, f'%{query}%', f'%{query}%', limit)).fetchall()
+            match_query = fts_match_query(query) if self.fts_enabled else ""
+            
+            with db_connection(self.db_path) as conn:
+                if match_query:
+                    results = conn.execute(f'''
+                        SELECT m.content, m.response, m.timestamp,
+                               snippet(memory_entries_fts, -1, '[', ']', '…', 12) AS snippet
+                        FROM memory_entries_fts
+                        JOIN memory_entries m ON m.id = memory_entries_fts.rowid
+                        WHERE memory_entries_fts MATCH '{{content response}} : (' || ? || ')'
+                        AND m.user_id = ? AND m.entry_type = 'message'
+                        ORDER BY bm25(memory_entries_fts) LIMIT ?
+                    ''', (match_query, user_id, limit)).fetchall()
+                else:
+                    results = conn.execute('''
+                        SELECT content, response, timestamp, NULL FROM memory_entries
+                        WHERE user_id = ? AND entry_type = 'message' 
+                        AND (content LIKE ? OR response LIKE ?)
+                        ORDER BY timestamp DESC LIMIT ?
+                    ''', (user_id, f'%{query}%', f'%{query}%', limit)).fetchall()
                 
                 # Convertir a formato compatible
                 formatted_results = []
-                for content, response, timestamp in results:
+                for content, response, timestamp, snippet in results:
                     formatted_results.append({
                         'message': content,
                         'response': response,
-                        'timestamp': timestamp
+                        'timestamp': timestamp,
+                        'snippet': snippet
                     })
                 
                 return formatted_results
@@ -275,7 +355,7 @@ class SQLiteMemoryManager:
     def search_images(self, user_id, query="", limit=5):
         """Buscar imágenes en SQLite - OPTIMIZADO"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 if query:
                     results = conn.execute('''
                         SELECT me.metadata, fa.* FROM memory_entries me
@@ -321,7 +401,7 @@ class SQLiteMemoryManager:
     def get_stats(self, user_id):
         """Obtener estadísticas del usuario desde SQLite - OPTIMIZADO"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 # Contar total de entradas
                 total_count = conn.execute('''
                     SELECT COUNT(*) FROM memory_entries WHERE user_id = ?
@@ -389,7 +469,7 @@ class SQLiteMemoryManager:
             
             print(f"🔄 Migrando {len(json_data)} usuarios del JSON a SQLite...")
             
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 for user_id, entries in json_data.items():
                     print(f"👤 Migrando usuario: {user_id} ({len(entries)} entradas)")
                     
@@ -11,17 +11,15 @@ import base64
 import logging
 import re
 
-# Imports for embeddings - CORREGIDO
+# Imports for embeddings - servicio compartido (un solo modelo por proceso)
 try:
-    import sentence_transformers
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-    print("✅ sentence-transformers importado correctamente")
+    from embedding_service import get_embedding_service, SENTENCE_TRANSFORMERS_AVAILABLE
+    if SENTENCE_TRANSFORMERS_AVAILABLE:
+        print("✅ sentence-transformers importado correctamente")
+    else:
+        print("❌ sentence-transformers no disponible")
 except ImportError as e:
-    print(f"❌ Error importando sentence-transformers: {e}")
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
-except Exception as e:
-    print(f"❌ Error inesperado con sentence-transformers: {e}")
+    print(f"❌ Error importando servicio de embeddings: {e}")
     SENTENCE_TRANSFORMERS_AVAILABLE = False
 
 try:
@@ -33,6 +31,12 @@ except ImportError as e:
     print(f"❌ Error importando chromadb: {e}")
     CHROMADB_AVAILABLE = False
 
+from embedding_store import EmbeddingStore
+from vector_index import LocalVectorIndex
+from fts_utils import TEXT_MEMORIES_FTS, ensure_fts, fts_match_query
+from image_registry import register_image
+from sqlite_pool import db_connection, register_database
+
 logger = logging.getLogger(__name__)
 
 class MultimodalMemoryAdapter:
@@ -59,12 +63,16 @@ class MultimodalMemoryAdapter:
         self._create_directories()
         
         # Inicializar base de datos
+        register_database('multimodal_memory', self.db_path)
         self._init_database()
         
         # Inicializar modelos de embeddings
         self.text_embedder = None
         self.vector_store = None
+        self.embedding_stores: Dict[str, EmbeddingStore] = {}
+        self.vector_index = None
         self._init_embeddings()
+        self._init_vector_index()
         
         logger.info(f"✅ MultimodalMemoryAdapter inicializado")
         logger.info(f"📁 Base path: {self.base_path}")
@@ -186,7 +194,7 @@ class MultimodalMemoryAdapter:
     
     def _init_database(self):
         """Inicializa la base de datos SQLite con esquema multimodal."""
-        with sqlite3.connect(self.db_path) as conn:
+        with db_connection(self.db_path) as conn:
             cursor = conn.cursor()
             
             # Tabla principal de conversaciones
@@ -264,17 +272,19 @@ class MultimodalMemoryAdapter:
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_memories_hash ON image_memories(image_hash)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_semantic_links_memory_ids ON semantic_links(memory_id_1, memory_id_2)")
             
+            # Índice full-text sobre text_memories (reemplaza LIKE '%palabra%')
+            self.fts_enabled = ensure_fts(conn, TEXT_MEMORIES_FTS)
+            
             conn.commit()
             logger.info("✅ Base de datos multimodal inicializada")
     
     def _init_embeddings(self):
         """Inicializa los modelos de embeddings y la base de datos vectorial."""
         try:
-            # Inicializar modelo de embeddings de texto
+            # Servicio de embeddings compartido (el modelo se carga en el primer encode)
             if SENTENCE_TRANSFORMERS_AVAILABLE:
-                model_name = "sentence-transformers/all-MiniLM-L6-v2"
-                self.text_embedder = SentenceTransformer(model_name)
-                logger.info(f"✅ Modelo de embeddings cargado: {model_name}")
+                self.text_embedder = get_embedding_service("sentence-transformers/all-MiniLM-L6-v2")
+                logger.info(f"✅ Servicio de embeddings listo: {self.text_embedder.model_name}")
             else:
                 logger.warning("⚠️ sentence-transformers no disponible. Usar embeddings básicos.")
             
@@ -306,6 +316,43 @@ class MultimodalMemoryAdapter:
             self.text_embedder = None
             self.vector_store = None
     
+    def _init_vector_index(self):
+        """Índice vectorial local junto a multimodal_memory.db (búsqueda semántica sin ChromaDB)."""
+        if not self.text_embedder:
+            return
+        
+        try:
+            index_path = os.path.join(os.path.dirname(self.db_path), "vector_index")
+            self.vector_index = LocalVectorIndex(index_path)
+            self._backfill_vector_index()
+            logger.info(f"✅ Índice vectorial local: {index_path}")
+        except Exception as e:
+            logger.error(f"❌ Error inicializando índice vectorial local: {e}")
+            self.vector_index = None
+    
+    def _backfill_vector_index(self):
+        """Indexa memorias existentes cuyo embedding ya está en cache (sin recalcular)."""
+        with db_connection(self.db_path) as conn:
+            rows = conn.execute("""
+                SELECT tm.id, c.user_id, tm.embedding_hash
+                FROM text_memories tm
+                JOIN conversations c ON tm.conversation_id = c.id
+                WHERE tm.embedding_hash IS NOT NULL
+            """).fetchall()
+        
+        added = 0
+        for text_memory_id, user_id, embedding_hash in rows:
+            key = f"t{text_memory_id}"
+            if self.vector_index.contains(user_id, key):
+                continue
+            embedding = self._load_embedding_from_cache(embedding_hash)
+            if embedding is not None:
+                self.vector_index.add(user_id, key, embedding)
+                added += 1
+        
+        if added:
+            logger.info(f"📦 {added} memorias existentes añadidas al índice vectorial")
+    
     def _calculate_text_hash(self, text: str) -> str:
         """Calcula hash MD5 del texto para cache de embeddings."""
         return hashlib.md5(text.encode('utf-8')).hexdigest()
@@ -320,31 +367,44 @@ class MultimodalMemoryAdapter:
             return ""
     
     def _generate_text_embedding(self, text: str) -> Optional[np.ndarray]:
-        """Genera embedding para texto."""
+        """Genera embedding para texto (float32 normalizado)."""
+        if not self.text_embedder:
+            return None
+            
+        try:
+            return self.text_embedder.encode(text)
+        except Exception as e:
+            logger.error(f"Error generando embedding de texto: {e}")
+            return None
+    
+    async def _agenerate_text_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Igual que _generate_text_embedding sin bloquear el event loop (se agrupa con otras peticiones)."""
         if not self.text_embedder:
             return None
             
         try:
-            embedding = self.text_embedder.encode(text)
-            return embedding
+            return await self.text_embedder.aencode(text)
         except Exception as e:
             logger.error(f"Error generando embedding de texto: {e}")
             return None
     
+    def _get_embedding_store(self, embedding_type: str = "text") -> EmbeddingStore:
+        """Store memory-mapped por tipo de embedding (se abre al primer uso)."""
+        if embedding_type not in self.embedding_stores:
+            self.embedding_stores[embedding_type] = EmbeddingStore(self.embeddings_path, name=embedding_type)
+        return self.embedding_stores[embedding_type]
+    
     def _save_embedding_to_cache(self, content_hash: str, embedding: np.ndarray, embedding_type: str = "text"):
-        """Guarda embedding en cache local."""
+        """Guarda embedding en el store memory-mapped."""
         try:
-            cache_file = os.path.join(self.embeddings_path, f"{embedding_type}_{content_hash}.npy")
-            np.save(cache_file, embedding)
+            self._get_embedding_store(embedding_type).put(content_hash, embedding)
         except Exception as e:
             logger.error(f"Error guardando embedding en cache: {e}")
     
     def _load_embedding_from_cache(self, content_hash: str, embedding_type: str = "text") -> Optional[np.ndarray]:
-        """Carga embedding desde cache local."""
+        """Carga embedding desde el store (vista sin copia sobre el mmap)."""
         try:
-            cache_file = os.path.join(self.embeddings_path, f"{embedding_type}_{content_hash}.npy")
-            if os.path.exists(cache_file):
-                return np.load(cache_file)
+            return self._get_embedding_store(embedding_type).get(content_hash)
         except Exception as e:
             logger.error(f"Error cargando embedding desde cache: {e}")
         return None
@@ -358,7 +418,16 @@ class MultimodalMemoryAdapter:
             ID de la conversación creada
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            # Generar embedding antes de abrir la transacción
+            content_hash = self._calculate_text_hash(content)
+            embedding = self._load_embedding_from_cache(content_hash)
+            
+            if embedding is None:
+                embedding = await self._agenerate_text_embedding(content)
+                if embedding is not None:
+                    self._save_embedding_to_cache(content_hash, embedding)
+            
+            with db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Crear conversación
@@ -369,15 +438,6 @@ class MultimodalMemoryAdapter:
                 
                 conversation_id = cursor.lastrowid
                 
-                # Generar embedding
-                content_hash = self._calculate_text_hash(content)
-                embedding = self._load_embedding_from_cache(content_hash)
-                
-                if embedding is None:
-                    embedding = self._generate_text_embedding(content)
-                    if embedding is not None:
-                        self._save_embedding_to_cache(content_hash, embedding)
-                
                 # Extraer keywords básicas (mejorar con NLP)
                 keywords = self._extract_keywords(content)
                 
@@ -390,6 +450,8 @@ class MultimodalMemoryAdapter:
                     VALUES (?, ?, ?, ?, ?)
                 """, (conversation_id, content, content_hash, json.dumps(keywords), importance_score))
                 
+                text_memory_id = cursor.lastrowid
+                
                 # Guardar en vector store si está disponible
                 if self.vector_store and embedding is not None:
                     try:
@@ -409,6 +471,13 @@ class MultimodalMemoryAdapter:
                 
                 conn.commit()
                 
+                # Índice vectorial local (incremental)
+                if self.vector_index and embedding is not None:
+                    try:
+                        self.vector_index.add(user_id, f"t{text_memory_id}", embedding)
+                    except Exception as e:
+                        logger.error(f"Error indexando memoria de texto: {e}")
+                
                 # Actualizar metadatos de usuario
                 await self._update_user_metadata(user_id)
                 
@@ -434,7 +503,7 @@ class MultimodalMemoryAdapter:
             # Obtener metadatos de imagen
             image_info = self._get_image_info(image_path)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Verificar si la imagen ya existe
@@ -454,7 +523,7 @@ class MultimodalMemoryAdapter:
                 conversation_id = cursor.lastrowid
                 
                 # Copiar imagen a almacenamiento local
-                stored_image_path = self._store_image_file(image_path, image_hash)
+                stored_image_path = self._store_image_file(image_path, image_hash, user_id=user_id)
                 
                 # Guardar memoria de imagen
                 cursor.execute("""
@@ -495,7 +564,7 @@ class MultimodalMemoryAdapter:
         try:
             if 'text' in modalities and self.vector_store:
                 # Buscar en memorias de texto
-                query_embedding = self._generate_text_embedding(query)
+                query_embedding = await self._agenerate_text_embedding(query)
                 
                 if query_embedding is not None:
                     text_results = self.text_collection.query(
@@ -514,9 +583,11 @@ class MultimodalMemoryAdapter:
                             'conversation_id': metadata['conversation_id']
                         })
             
-            # Buscar en memorias de texto usando SQLite si no hay vector store
+            # Sin ChromaDB: índice vectorial local, y LIKE en SQLite como último recurso
             if not self.vector_store and 'text' in modalities:
-                text_results = await self._search_text_basic(query, user_id, limit)
+                text_results = await self._search_text_local_index(query, user_id, limit)
+                if not text_results:
+                    text_results = await self._search_text_basic(query, user_id, limit)
                 results.extend(text_results)
             
             # Buscar en memorias de imagen (por descripción)
@@ -543,7 +614,7 @@ class MultimodalMemoryAdapter:
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -599,7 +670,7 @@ class MultimodalMemoryAdapter:
         Encuentra imágenes relacionadas con una consulta de texto.
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -652,7 +723,7 @@ class MultimodalMemoryAdapter:
                                  similarity_score: float, link_type: str = "semantic"):
         """Crea un enlace semántico entre dos memorias."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -712,8 +783,8 @@ class MultimodalMemoryAdapter:
             logger.error(f"Error obteniendo info de imagen: {e}")
             return {'file_size': 0, 'width': None, 'height': None}
     
-    def _store_image_file(self, source_path: str, image_hash: str) -> str:
-        """Copia la imagen al almacenamiento local."""
+    def _store_image_file(self, source_path: str, image_hash: str, user_id: Optional[str] = None) -> str:
+        """Copia la imagen al almacenamiento local y la da de alta en el registro de imágenes."""
         try:
             import shutil
             from pathlib import Path
@@ -730,16 +801,65 @@ class MultimodalMemoryAdapter:
                 shutil.copy2(source_path, stored_path)
                 logger.debug(f"📷 Imagen copiada: {stored_path}")
             
+            register_image(stored_path, user_id=user_id, source='multimodal_memory')
             return stored_path
             
         except Exception as e:
             logger.error(f"Error almacenando archivo de imagen: {e}")
             return source_path  # Fallback al path original
     
+    async def _search_text_local_index(self, query: str, user_id: Optional[str], limit: int) -> List[Dict]:
+        """Búsqueda semántica con el índice vectorial local (similitud coseno real)."""
+        if not self.vector_index:
+            return []
+        
+        query_embedding = await self._agenerate_text_embedding(query)
+        if query_embedding is None:
+            return []
+        
+        hits = self.vector_index.search(query_embedding, user_id=user_id, k=limit)
+        if not hits:
+            return []
+        
+        scores = {int(key[1:]): score for key, score in hits}
+        try:
+            with db_connection(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                placeholders = ','.join(['?'] * len(scores))
+                rows = conn.execute(f"""
+                    SELECT tm.*, c.timestamp, c.user_id
+                    FROM text_memories tm
+                    JOIN conversations c ON tm.conversation_id = c.id
+                    WHERE tm.id IN ({placeholders})
+                """, list(scores)).fetchall()
+        except Exception as e:
+            logger.error(f"❌ Error leyendo memorias del índice local: {e}")
+            return []
+        
+        results = [{
+            'type': 'text',
+            'content': row['content'],
+            'similarity': scores[row['id']],
+            'metadata': {
+                'user_id': row['user_id'],
+                'conversation_id': row['conversation_id'],
+                'timestamp': row['timestamp'],
+                'importance_score': row['importance_score']
+            },
+            'conversation_id': row['conversation_id']
+        } for row in rows]
+        
+        results.sort(key=lambda r: r['similarity'], reverse=True)
+        return results
+    
     async def _search_text_basic(self, query: str, user_id: Optional[str], limit: int) -> List[Dict]:
-        """Búsqueda básica de texto usando LIKE en SQLite."""
+        """Búsqueda de texto con FTS5 (BM25); LIKE en SQLite si FTS5 no está disponible."""
+        match_query = fts_match_query(query) if getattr(self, 'fts_enabled', False) else ""
+        if match_query:
+            return self._search_text_fts(match_query, user_id, limit)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -789,6 +909,52 @@ class MultimodalMemoryAdapter:
             logger.error(f"❌ Error en búsqueda básica de texto: {e}")
             return []
     
+    def _search_text_fts(self, match_query: str, user_id: Optional[str], limit: int) -> List[Dict]:
+        """Consulta FTS5 ordenada por BM25, con fragmento resaltado."""
+        try:
+            with db_connection(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                
+                sql = """
+                    SELECT tm.*, c.timestamp, c.user_id,
+                           bm25(text_memories_fts) AS rank,
+                           snippet(text_memories_fts, 0, '[', ']', '…', 12) AS snippet
+                    FROM text_memories_fts
+                    JOIN text_memories tm ON tm.id = text_memories_fts.rowid
+                    JOIN conversations c ON tm.conversation_id = c.id
+                    WHERE text_memories_fts MATCH ?
+                """
+                params: List[Any] = [match_query]
+                if user_id:
+                    sql += " AND c.user_id = ?"
+                    params.append(user_id)
+                sql += " ORDER BY rank LIMIT ?"
+                params.append(limit)
+                
+                rows = conn.execute(sql, params).fetchall()
+            
+            results = []
+            for row in rows:
+                score = -row['rank']  # BM25 de SQLite: más negativo = más relevante
+                results.append({
+                    'type': 'text',
+                    'content': row['content'],
+                    'similarity': score / (1.0 + score) if score > 0 else 0.0,
+                    'metadata': {
+                        'user_id': row['user_id'],
+                        'conversation_id': row['conversation_id'],
+                        'timestamp': row['timestamp'],
+                        'importance_score': row['importance_score'],
+                        'snippet': row['snippet']
+                    },
+                    'conversation_id': row['conversation_id']
+                })
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Error en búsqueda full-text: {e}")
+            return []
+    
     async def _search_images_by_description(self, query: str, user_id: Optional[str], limit: int) -> List[Dict]:
         """Busca imágenes por descripción."""
         images = await self.find_related_images(query, user_id, limit)
@@ -814,7 +980,7 @@ class MultimodalMemoryAdapter:
     async def _update_user_metadata(self, user_id: str):
         """Actualiza metadatos del usuario."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Contar conversaciones del usuario
@@ -835,7 +1001,7 @@ class MultimodalMemoryAdapter:
     async def get_user_stats(self, user_id: str) -> Dict:
         """Obtiene estadísticas del usuario."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -864,7 +1030,7 @@ class MultimodalMemoryAdapter:
         try:
             cutoff_date = datetime.now() - timedelta(days=days_to_keep)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with db_connection(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Obtener IDs de conversaciones a eliminar
@@ -878,6 +1044,16 @@ class MultimodalMemoryAdapter:
                     # Eliminar en orden correcto para respetar foreign keys
                     placeholders = ','.join(['?'] * len(old_conversation_ids))
                     
+                    # Quitar también del índice vectorial local
+                    if self.vector_index:
+                        cursor.execute(f"""
+                            SELECT tm.id, c.user_id FROM text_memories tm
+                            JOIN conversations c ON tm.conversation_id = c.id
+                            WHERE c.id IN ({placeholders})
+                        """, old_conversation_ids)
+                        for text_memory_id, user_id in cursor.fetchall():
+                            self.vector_index.remove(user_id, f"t{text_memory_id}")
+                    
                     cursor.execute(f"DELETE FROM text_memories WHERE conversation_id IN ({placeholders})", old_conversation_ids)
                     cursor.execute(f"DELETE FROM image_memories WHERE conversation_id IN ({placeholders})", old_conversation_ids)
                     cursor.execute(f"DELETE FROM conversations WHERE id IN ({placeholders})", old_conversation_ids)
@@ -1193,7 +1369,7 @@ class MultimodalMemoryAdapter:
                 try:
                     # Limpiar contenido antes del embedding
                     clean_content = self._clean_content_for_embedding(content)
-                    embeddings = self.text_embedder.encode(clean_content)
+                    embeddings = await self.text_embedder.aencode(clean_content)
                     
                     # Convertir a lista si es numpy array
                     if hasattr(embeddings, 'tolist'):
@@ -1528,7 +1704,7 @@ async def main():
         
         if db_exists:
             # Verificar tablas
-            with sqlite3.connect(adapter.db_path) as conn:
+            with db_connection(adapter.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
                 tables = [row[0] for row in cursor.fetchall()]
@@ -12,6 +12,7 @@ Adapter con generador automático de JavaScript que se adapta a cualquier sitio
 import asyncio
 import logging
 import json
+import os
 import re
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Union
@@ -30,6 +31,14 @@ except ImportError:
     PLAYWRIGHT_AVAILABLE = False
     logger.warning("⚠️ Playwright no instalado")
 
+from browser_pool import get_browser_pool
+from tool_cache import get_tool_cache, make_key, ttl_for
+
+# Acciones cuyo resultado se reutiliza (mismo sitio + misma búsqueda)
+CACHEABLE_ACTIONS = {'smart_extract', 'auto_search', 'analyze_site'}
+# Límite total de una acción en el pool (navegación + esperas + extracción), en segundos
+ACTION_TIMEOUT = float(os.environ.get('PLAYWRIGHT_ACTION_TIMEOUT', '90'))
+
 class JavaScriptGenerator:
     """Generador inteligente de JavaScript para cualquier sitio web"""
     
@@ -401,6 +410,8 @@ class PlaywrightAdapter:
         self.description = "Automatización web universal con JavaScript inteligente - adapta a cualquier sitio"
         self.available = PLAYWRIGHT_AVAILABLE
         self.js_generator = JavaScriptGenerator()  # ✅ INTEGRAR GENERADOR
+        self.browser_pool = get_browser_pool()  # Chromium compartido, se lanza en la primera acción
+        self.result_cache = get_tool_cache()
         
         # Configuración
         self.base_path = Path(__file__).parent.parent.parent.parent
@@ -474,8 +485,6 @@ class PlaywrightAdapter:
     
     async def smart_extract(self, params: Dict[str, Any]) -> str:
         """✅ NUEVA FUNCIÓN: Extracción inteligente automática"""
-        playwright = browser = context = page = None
-        
         try:
             url = params.get('url', '').strip()
             search_query = params.get('search_query', '').strip()
@@ -489,19 +498,15 @@ class PlaywrightAdapter:
             
             logger.info(f"🧠 Extracción inteligente: {url}")
             
-            # Crear sesión
-            playwright, browser, context, page = await self._create_browser_session()
-            
-            # Navegar
-            await page.goto(url, wait_until='domcontentloaded')
-            await page.wait_for_timeout(5000)  # 5 segundos en lugar de 3
+            # Página aislada del pool de navegadores
+            async with self.browser_pool.page() as page:
+                # Navegar
+                await page.goto(url, wait_until='domcontentloaded')
+                await page.wait_for_timeout(5000)  # 5 segundos en lugar de 3
             
-            # Generar y ejecutar JavaScript inteligente
-            smart_js = self.js_generator.generate_smart_javascript(url, search_query, max_results)
-            result = await page.evaluate(smart_js)
-            
-            # Cerrar sesión
-            await self._close_browser_session(playwright, browser, context, page)
+                # Generar y ejecutar JavaScript inteligente
+                smart_js = self.js_generator.generate_smart_javascript(url, search_query, max_results)
+                result = await page.evaluate(smart_js)
             
             # Formatear respuesta
             if isinstance(result, dict):
@@ -512,9 +517,6 @@ class PlaywrightAdapter:
         except Exception as e:
             logger.error(f"❌ Error en extracción inteligente: {e}")
             
-            if playwright or browser or context or page:
-                await self._close_browser_session(playwright, browser, context, page)
-            
             return f"❌ Error: {str(e)}"
     
     def _format_smart_result(self, result: Dict, url: str, search_query: str) -> str:
@@ -595,8 +597,6 @@ class PlaywrightAdapter:
     
     async def analyze_site(self, params: Dict[str, Any]) -> str:
         """✅ NUEVA FUNCIÓN: Análisis completo de sitio web"""
-        playwright = browser = context = page = None
-        
         try:
             url = params.get('url', '').strip()
             if not url:
@@ -610,55 +610,51 @@ class PlaywrightAdapter:
             # Detectar tipo de sitio sin navegar
             site_info = self.js_generator.detect_site_type(url)
             
-            # Crear sesión para análisis profundo
-            playwright, browser, context, page = await self._create_browser_session()
-            
-            # Navegar
-            await page.goto(url, wait_until='domcontentloaded')
-            await page.wait_for_timeout(2000)
-            
-            # Análisis de estructura
-            analysis = await page.evaluate('''
-                () => {
-                    return {
-                        titulo: document.title,
-                        meta_description: document.querySelector('meta[name="description"]')?.content || '',
-                        meta_keywords: document.querySelector('meta[name="keywords"]')?.content || '',
-                        idioma: document.documentElement.lang || 'No especificado',
-                        charset: document.characterSet || '',
+            # Página aislada del pool de navegadores para análisis profundo
+            async with self.browser_pool.page() as page:
+                # Navegar
+                await page.goto(url, wait_until='domcontentloaded')
+                await page.wait_for_timeout(2000)
+            
+                # Análisis de estructura
+                analysis = await page.evaluate('''
+                    () => {
+                        return {
+                            titulo: document.title,
+                            meta_description: document.querySelector('meta[name="description"]')?.content || '',
+                            meta_keywords: document.querySelector('meta[name="keywords"]')?.content || '',
+                            idioma: document.documentElement.lang || 'No especificado',
+                            charset: document.characterSet || '',
                         
-                        estructura: {
-                            total_elementos: document.querySelectorAll('*').length,
-                            divs: document.querySelectorAll('div').length,
-                            links: document.querySelectorAll('a[href]').length,
-                            imagenes: document.querySelectorAll('img').length,
-                            formularios: document.querySelectorAll('form').length,
-                            botones: document.querySelectorAll('button, input[type="submit"]').length,
-                            inputs: document.querySelectorAll('input, textarea, select').length,
-                            tablas: document.querySelectorAll('table').length,
-                            scripts: document.querySelectorAll('script').length
-                        },
+                            estructura: {
+                                total_elementos: document.querySelectorAll('*').length,
+                                divs: document.querySelectorAll('div').length,
+                                links: document.querySelectorAll('a[href]').length,
+                                imagenes: document.querySelectorAll('img').length,
+                                formularios: document.querySelectorAll('form').length,
+                                botones: document.querySelectorAll('button, input[type="submit"]').length,
+                                inputs: document.querySelectorAll('input, textarea, select').length,
+                                tablas: document.querySelectorAll('table').length,
+                                scripts: document.querySelectorAll('script').length
+                            },
                         
-                        tecnologias: {
-                            tiene_jquery: typeof window.jQuery !== 'undefined',
-                            tiene_react: document.querySelector('[data-reactroot]') !== null,
-                            tiene_vue: typeof window.Vue !== 'undefined',
-                            tiene_angular: typeof window.angular !== 'undefined'
-                        },
+                            tecnologias: {
+                                tiene_jquery: typeof window.jQuery !== 'undefined',
+                                tiene_react: document.querySelector('[data-reactroot]') !== null,
+                                tiene_vue: typeof window.Vue !== 'undefined',
+                                tiene_angular: typeof window.angular !== 'undefined'
+                            },
                         
-                        seo: {
-                            tiene_h1: document.querySelectorAll('h1').length,
-                            total_headings: document.querySelectorAll('h1,h2,h3,h4,h5,h6').length,
-                            enlaces_externos: Array.from(document.querySelectorAll('a[href]'))
-                                .filter(a => a.hostname !== window.location.hostname).length,
-                            imagenes_sin_alt: document.querySelectorAll('img:not([alt])').length
-                        }
-                    };
-                }
-            ''')
-            
-            # Cerrar sesión
-            await self._close_browser_session(playwright, browser, context, page)
+                            seo: {
+                                tiene_h1: document.querySelectorAll('h1').length,
+                                total_headings: document.querySelectorAll('h1,h2,h3,h4,h5,h6').length,
+                                enlaces_externos: Array.from(document.querySelectorAll('a[href]'))
+                                    .filter(a => a.hostname !== window.location.hostname).length,
+                                imagenes_sin_alt: document.querySelectorAll('img:not([alt])').length
+                            }
+                        };
+                    }
+                ''')
             
             return f"""
 🔍 **Análisis Completo de Sitio Web**
@@ -706,51 +702,10 @@ class PlaywrightAdapter:
         except Exception as e:
             logger.error(f"❌ Error analizando sitio: {e}")
             
-            if playwright or browser or context or page:
-                await self._close_browser_session(playwright, browser, context, page)
-            
             return f"❌ Error: {str(e)}"
     
-    async def _create_browser_session(self, headless: bool = True):
-        """Crear una nueva sesión de navegador"""
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch(
-            headless=headless,
-            args=[
-                '--no-sandbox', 
-                '--disable-dev-shm-usage',
-                '--disable-blink-features=AutomationControlled'
-            ]
-        )
-        
-        context = await browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        )
-        
-        page = await context.new_page()
-        page.set_default_timeout(20000)
-        
-        return playwright, browser, context, page
-    
-    async def _close_browser_session(self, playwright, browser, context, page):
-        """Cerrar sesión de navegador de forma segura"""
-        try:
-            if page:
-                await page.close()
-            if context:
-                await context.close()
-            if browser:
-                await browser.close()
-            if playwright:
-                await playwright.stop()
-        except Exception as e:
-            logger.warning(f"⚠️ Error cerrando sesión: {e}")
-    
     async def navigate(self, params: Dict[str, Any]) -> str:
         """Navegar a una URL específica"""
-        playwright = browser = context = page = None
-        
         try:
             url = params.get('url', '').strip()
             if not url:
@@ -763,24 +718,20 @@ class PlaywrightAdapter:
             
             logger.info(f"🌐 Navegando a: {url}")
             
-            # Crear sesión
-            playwright, browser, context, page = await self._create_browser_session()
-            
-            # Navegar
-            response = await page.goto(url, wait_until='domcontentloaded', timeout=timeout)
+            # Página aislada del pool de navegadores
+            async with self.browser_pool.page() as page:
+                # Navegar
+                response = await page.goto(url, wait_until='domcontentloaded', timeout=timeout)
             
-            if response and response.status >= 400:
-                return f"❌ Error HTTP {response.status} al cargar {url}"
+                if response and response.status >= 400:
+                    return f"❌ Error HTTP {response.status} al cargar {url}"
             
-            # Esperar carga adicional
-            await page.wait_for_timeout(2000)
+                # Esperar carga adicional
+                await page.wait_for_timeout(2000)
             
-            # Obtener información básica
-            title = await page.title() or "Sin título"
-            final_url = page.url
-            
-            # Cerrar sesión
-            await self._close_browser_session(playwright, browser, context, page)
+                # Obtener información básica
+                title = await page.title() or "Sin título"
+                final_url = page.url
             
             return f"""
 🌐 **Navegación Exitosa**
@@ -796,15 +747,10 @@ class PlaywrightAdapter:
         except Exception as e:
             logger.error(f"❌ Error navegando: {e}")
             
-            if playwright or browser or context or page:
-                await self._close_browser_session(playwright, browser, context, page)
-            
             return f"❌ Error navegando a {url}: {str(e)}"
     
     async def extract_text(self, params: Dict[str, Any]) -> str:
         """Extraer texto de página o elemento específico"""
-        playwright = browser = context = page = None
-        
         try:
             url = params.get('url')
             selector = params.get('selector')
@@ -817,36 +763,32 @@ class PlaywrightAdapter:
             
             logger.info(f"📄 Extrayendo texto de: {url}")
             
-            # Crear sesión
-            playwright, browser, context, page = await self._create_browser_session()
-            
-            # Navegar
-            await page.goto(url, wait_until='domcontentloaded')
-            await page.wait_for_timeout(2000)
-            
-            # Extraer texto
-            if selector:
-                # Texto de elemento específico
-                element = await page.query_selector(selector)
-                if not element:
-                    return f"❌ No se encontró elemento con selector: {selector}"
-                text = await element.inner_text()
-                source = f"elemento '{selector}'"
-            else:
-                # Texto de toda la página (limpio)
-                text = await page.evaluate('''
-                    () => {
-                        // Remover elementos no deseados
-                        const unwanted = document.querySelectorAll('script, style, nav, header, footer, .ad, .ads, .advertisement');
-                        unwanted.forEach(el => el.remove());
+            # Página aislada del pool de navegadores
+            async with self.browser_pool.page() as page:
+                # Navegar
+                await page.goto(url, wait_until='domcontentloaded')
+                await page.wait_for_timeout(2000)
+            
+                # Extraer texto
+                if selector:
+                    # Texto de elemento específico
+                    element = await page.query_selector(selector)
+                    if not element:
+                        return f"❌ No se encontró elemento con selector: {selector}"
+                    text = await element.inner_text()
+                    source = f"elemento '{selector}'"
+                else:
+                    # Texto de toda la página (limpio)
+                    text = await page.evaluate('''
+                        () => {
+                            // Remover elementos no deseados
+                            const unwanted = document.querySelectorAll('script, style, nav, header, footer, .ad, .ads, .advertisement');
+                            unwanted.forEach(el => el.remove());
                         
-                        return document.body ? document.body.innerText.trim() : '';
-                    }
-                ''')
-                source = "página completa"
-            
-            # Cerrar sesión
-            await self._close_browser_session(playwright, browser, context, page)
+                            return document.body ? document.body.innerText.trim() : '';
+                        }
+                    ''')
+                    source = "página completa"
             
             # Limitar longitud si es muy largo
             if len(text) > 3000:
@@ -864,15 +806,10 @@ class PlaywrightAdapter:
         except Exception as e:
             logger.error(f"❌ Error extrayendo texto: {e}")
             
-            if playwright or browser or context or page:
-                await self._close_browser_session(playwright, browser, context, page)
-            
             return f"❌ Error: {str(e)}"
     
     async def execute_js(self, params: Dict[str, Any]) -> str:
         """Ejecutar código JavaScript personalizado"""
-        playwright = browser = context = page = None
-        
         try:
             url = params.get('url')
             javascript = params.get('javascript')
@@ -887,18 +824,14 @@ class PlaywrightAdapter:
             
             logger.info(f"⚡ Ejecutando JS en: {url}")
             
-            # Crear sesión
-            playwright, browser, context, page = await self._create_browser_session()
-            
-            # Navegar
-            await page.goto(url, wait_until='domcontentloaded')
-            await page.wait_for_timeout(2000)
+            # Página aislada del pool de navegadores
+            async with self.browser_pool.page() as page:
+                # Navegar
+                await page.goto(url, wait_until='domcontentloaded')
+                await page.wait_for_timeout(2000)
             
-            # Ejecutar JavaScript
-            result = await page.evaluate(javascript)
-            
-            # Cerrar sesión
-            await self._close_browser_session(playwright, browser, context, page)
+                # Ejecutar JavaScript
+                result = await page.evaluate(javascript)
             
             return f"""
 ⚡ **JavaScript ejecutado exitosamente**
@@ -918,15 +851,10 @@ class PlaywrightAdapter:
         except Exception as e:
             logger.error(f"❌ Error ejecutando JS: {e}")
             
-            if playwright or browser or context or page:
-                await self._close_browser_session(playwright, browser, context, page)
-            
             return f"❌ Error ejecutando JavaScript: {str(e)}"
     
     async def take_screenshot(self, params: Dict[str, Any]) -> str:
         """Tomar captura de pantalla"""
-        playwright = browser = context = page = None
-        
         try:
             url = params.get('url')
             if not url:
@@ -946,20 +874,16 @@ class PlaywrightAdapter:
             
             logger.info(f"📸 Capturando: {url}")
             
-            # Crear sesión
-            playwright, browser, context, page = await self._create_browser_session()
+            # Página aislada del pool de navegadores
+            async with self.browser_pool.page() as page:
+                # Navegar
+                await page.goto(url, wait_until='domcontentloaded')
+                await page.wait_for_timeout(3000)
             
-            # Navegar
-            await page.goto(url, wait_until='domcontentloaded')
-            await page.wait_for_timeout(3000)
+                # Tomar captura
+                await page.screenshot(path=str(filepath), full_page=full_page)
             
-            # Tomar captura
-            await page.screenshot(path=str(filepath), full_page=full_page)
-            
-            title = await page.title() or "Sin título"
-            
-            # Cerrar sesión
-            await self._close_browser_session(playwright, browser, context, page)
+                title = await page.title() or "Sin título"
             
             if not filepath.exists():
                 return "❌ Error: No se pudo crear la captura"
@@ -982,9 +906,6 @@ class PlaywrightAdapter:
         except Exception as e:
             logger.error(f"❌ Error capturando: {e}")
             
-            if playwright or browser or context or page:
-                await self._close_browser_session(playwright, browser, context, page)
-            
             return f"❌ Error tomando captura: {str(e)}"
     
     def process(self, params: Dict[str, Any]) -> str:
@@ -1005,24 +926,18 @@ playwright install
             if not action:
                 return "❌ Error: Acción requerida"
             
-            # Ejecutar acción
-            try:
-                if action == 'smart_extract':
-                    return asyncio.run(self.smart_extract(params))
-                elif action == 'auto_search':
-                    return asyncio.run(self.auto_search(params))
-                elif action == 'analyze_site':
-                    return asyncio.run(self.analyze_site(params))
-                elif action == 'execute_js':
-                    return asyncio.run(self.execute_js(params))
-                elif action == 'navigate':
-                    return asyncio.run(self.navigate(params))
-                elif action == 'extract_text':
-                    return asyncio.run(self.extract_text(params))
-                elif action == 'take_screenshot':
-                    return asyncio.run(self.take_screenshot(params))
-                else:
-                    return f"""
+            handlers = {
+                'smart_extract': self.smart_extract,
+                'auto_search': self.auto_search,
+                'analyze_site': self.analyze_site,
+                'execute_js': self.execute_js,
+                'navigate': self.navigate,
+                'extract_text': self.extract_text,
+                'take_screenshot': self.take_screenshot
+            }
+            handler = handlers.get(action)
+            if handler is None:
+                return f"""
 ❌ **Acción no válida:** {action}
 
 **🧠 Acciones Inteligentes:**
@@ -1053,37 +968,18 @@ playwright install
 • Noticias (artículos, fechas)
 • ¡Y cualquier sitio web!
 """
-            except RuntimeError as re:
-                if "asyncio.run() cannot be called from a running event loop" in str(re):
-                    # Manejar event loop
-                    import concurrent.futures
-                    
-                    def run_in_thread():
-                        new_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(new_loop)
-                        try:
-                            if action == 'smart_extract':
-                                return new_loop.run_until_complete(self.smart_extract(params))
-                            elif action == 'auto_search':
-                                return new_loop.run_until_complete(self.auto_search(params))
-                            elif action == 'analyze_site':
-                                return new_loop.run_until_complete(self.analyze_site(params))
-                            elif action == 'execute_js':
-                                return new_loop.run_until_complete(self.execute_js(params))
-                            elif action == 'navigate':
-                                return new_loop.run_until_complete(self.navigate(params))
-                            elif action == 'extract_text':
-                                return new_loop.run_until_complete(self.extract_text(params))
-                            elif action == 'take_screenshot':
-                                return new_loop.run_until_complete(self.take_screenshot(params))
-                        finally:
-                            new_loop.close()
-                    
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        future = executor.submit(run_in_thread)
-                        return future.result()
-                else:
-                    raise re
+            
+            # La corutina corre en el loop del pool de navegadores (válido desde cualquier hilo)
+            run_action = lambda: self.browser_pool.run(lambda: handler(dict(params)), timeout=ACTION_TIMEOUT)
+            
+            if action not in CACHEABLE_ACTIONS:
+                return run_action()
+            
+            key = make_key(self.name, action, params.get('url', ''), params.get('search_query', ''), params.get('max_results', 8))
+            return self.result_cache.get_or_compute(
+                key, run_action, ttl_for(self.name, action),
+                cacheable=lambda result: isinstance(result, str) and not result.lstrip().startswith('❌')
+            )
             
         except Exception as e:
             logger.error(f"❌ Error en process: {e}")
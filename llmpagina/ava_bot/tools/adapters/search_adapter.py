@@ -7,12 +7,15 @@ import requests
 import json
 from datetime import datetime
 
+from tool_cache import get_tool_cache, make_key, ttl_for
+
 class SearchAdapter:
     """Adaptador para búsquedas web usando Tavily API"""
     
     def __init__(self):
         self.api_key = None
         self.base_url = "https://api.tavily.com/search"
+        self.result_cache = get_tool_cache()
         self._load_api_key()
     
     @property
@@ -88,7 +91,12 @@ class SearchAdapter:
             # ✅ EJECUTAR BÚSQUEDA REAL Y DEVOLVER RESULTADOS
             if self.api_key:
                 print("🌐 Ejecutando búsqueda REAL con Tavily...")
-                results = self._search_tavily_real(query, num_results)
+                results = self.result_cache.get_or_compute(
+                    make_key('search', 'tavily', search_query=query, max_results=num_results),
+                    lambda: self._search_tavily_real(query, num_results),
+                    ttl_for('search'),
+                    cacheable=lambda found: bool(found) and not self._is_simulation(found)
+                )
             else:
                 print("🔄 Ejecutando búsqueda SIMULADA...")
                 results = self._search_simulation(query, num_results)
@@ -187,6 +195,11 @@ class SearchAdapter:
             print(f"❌ Error búsqueda Tavily: {e}")
             return self._search_simulation(query, num_results)
     
+    @staticmethod
+    def _is_simulation(results):
+        """True si Tavily falló y se devolvieron resultados simulados (no se cachean)"""
+        return any(item.get('is_simulation') or '(Simulación)' in item.get('title', '') for item in results)
+    
     def _search_simulation(self, query, num_results):
         """Simulación de búsqueda con resultados detallados para Bitcoin"""
         print(f"🔄 Modo simulación para: {query}")
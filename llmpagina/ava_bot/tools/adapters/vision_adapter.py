@@ -17,6 +17,8 @@ from PIL import Image
 from datetime import datetime
 from io import BytesIO
 
+from image_derivatives import vision_image_path
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -86,6 +88,13 @@ class VisionAdapter:
                 logger.error(f"❌ Archivo no existe: {image_path}")
                 return None
             
+            # JPEG de 1024px generado al guardar la imagen: sin abrir ni redimensionar
+            prepared = vision_image_path(image_path)
+            if prepared is not None:
+                image_bytes = prepared.read_bytes()
+                logger.info(f"📷 Usando derivado para visión: {prepared.name} ({len(image_bytes) // 1024}KB)")
+                return base64.b64encode(image_bytes).decode('utf-8')
+            
             logger.info(f"📷 Procesando imagen: {image_path.name} ({image_path.stat().st_size // 1024}KB)")
             
             # Abrir y optimizar imagen
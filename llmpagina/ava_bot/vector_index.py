@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Índice Vectorial Local
+======================
+
+Búsqueda semántica en proceso, sin ChromaDB ni Qdrant.
+
+- Una partición por usuario, persistida como EmbeddingStore (mmap) en
+  <directorio>/user_<id>.f32 + log de índice. Inserciones y borrados son incrementales.
+- Usuarios pequeños: fuerza bruta (producto matriz-vector con NumPy).
+- Usuarios grandes (>= IVF_MIN_VECTORS): IVF. k-means sobre los vectores,
+  listas invertidas por centroide y búsqueda en los nprobe centroides más cercanos.
+  El IVF se construye en memoria al primer uso y se rehace cuando la partición
+  creció un 50% desde el último entrenamiento.
+- Varios procesos comparten el directorio: cada partición incorpora lo que
+  otros escribieron en su store (y lo lleva a su IVF) antes de usarse, y la
+  búsqueda sin usuario recorre las particiones que hay en disco.
+
+Los vectores deben venir normalizados (EmbeddingService): score = similitud coseno.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from embedding_store import EmbeddingStore, DEFAULT_DIMENSION
+
+logger = logging.getLogger(__name__)
+
+IVF_MIN_VECTORS = int(os.environ.get('VECTOR_INDEX_IVF_MIN', '5000'))
+IVF_NPROBE = int(os.environ.get('VECTOR_INDEX_NPROBE', '8'))
+IVF_TRAIN_SAMPLE = 20000
+IVF_KMEANS_ITERATIONS = 10
+PARTITION_MAX_ROWS = 10_000_000  # Sin eviction: el índice no debe olvidar memorias
+
+
+class _IVF:
+    """Listas invertidas sobre centroides k-means"""
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids
+        self.lists: List[Set[str]] = [set() for _ in range(len(centroids))]
+        self.assignment: Dict[str, int] = {}
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int) -> "_IVF":
+        rng = np.random.default_rng(0)
+        sample = vectors
+        if len(vectors) > IVF_TRAIN_SAMPLE:
+            sample = vectors[rng.choice(len(vectors), IVF_TRAIN_SAMPLE, replace=False)]
+        sample = np.ascontiguousarray(sample, dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[c] = centroid / norm if norm else centroid
+        return cls(centroids)
+
+    def add(self, key: str, vector: np.ndarray):
+        self.remove(key)
+        c = int(np.argmax(self.centroids @ vector))
+        self.lists[c].add(key)
+        self.assignment[key] = c
+
+    def add_many(self, keys: List[str], vectors: np.ndarray):
+        labels = np.argmax(vectors @ self.centroids.T, axis=1)
+        for key, c in zip(keys, labels):
+            self.lists[int(c)].add(key)
+            self.assignment[key] = int(c)
+
+    def remove(self, key: str):
+        c = self.assignment.pop(key, None)
+        if c is not None:
+            self.lists[c].discard(key)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> List[str]:
+        scores = self.centroids @ query
+        nprobe = min(nprobe, len(self.centroids))
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        keys: List[str] = []
+        for c in probe:
+            keys.extend(self.lists[int(c)])
+        return keys
+
+
+class _Partition:
+    """Vectores de un usuario"""
+
+    def __init__(self, directory: str, name: str, dim: int):
+        self.store = EmbeddingStore(directory, name=name, dim=dim, max_rows=PARTITION_MAX_ROWS)
+        self.ivf: Optional[_IVF] = None
+        self.ivf_trained_size = 0
+        self.generation = self.store.generation
+        self.lock = threading.RLock()
+
+    def _sync(self):
+        """Lleva al IVF los vectores añadidos o borrados por otros procesos"""
+        self.store.refresh()
+        if self.store.generation == self.generation:
+            return
+        self.generation = self.store.generation
+        if self.ivf is None:
+            return
+        keys, vectors = self.store.snapshot()
+        live = set(keys)
+        for key in [key for key in self.ivf.assignment if key not in live]:
+            self.ivf.remove(key)
+        missing = [i for i, key in enumerate(keys) if key not in self.ivf.assignment]
+        if missing:
+            self.ivf.add_many([keys[i] for i in missing], np.asarray(vectors)[missing])
+
+    def _maybe_train(self):
+        size = len(self.store)
+        if size < IVF_MIN_VECTORS:
+            self.ivf = None
+            return
+        if self.ivf is not None and size < self.ivf_trained_size * 1.5:
+            return
+
+        keys, vectors = self.store.snapshot()
+        nlist = max(16, int(np.sqrt(size)))
+        self.ivf = _IVF.train(np.asarray(vectors), nlist)
+        self.ivf.add_many(keys, np.asarray(vectors))
+        self.ivf_trained_size = size
+        logger.info(f"🧭 IVF entrenado: {size} vectores, {nlist} listas ({self.store.name})")
+
+    def add(self, key: str, vector: np.ndarray):
+        with self.lock:
+            self.store.put(key, vector)
+            self._sync()
+            if self.ivf is not None:
+                self.ivf.add(key, self.store.get(key))
+
+    def remove(self, key: str) -> bool:
+        with self.lock:
+            self._sync()
+            if self.ivf is not None:
+                self.ivf.remove(key)
+            return self.store.delete(key)
+
+    def search(self, query: np.ndarray, k: int, nprobe: int) -> List[Tuple[str, float]]:
+        with self.lock:
+            self._sync()
+            self._maybe_train()
+            if self.ivf is None:
+                return self.store.search(query, k)
+            candidates = self.ivf.candidates(query, nprobe)
+            return self.store.search(query, k, candidates=candidates)
+
+    def contains(self, key: str) -> bool:
+        with self.lock:
+            self._sync()
+            return key in self.store
+
+    def size(self) -> int:
+        with self.lock:
+            self._sync()
+            return len(self.store)
+
+
+class LocalVectorIndex:
+    """Índice vectorial por usuario con persistencia en disco"""
+
+    def __init__(self, directory: str, dim: int = DEFAULT_DIMENSION, nprobe: int = IVF_NPROBE):
+        self.directory = directory
+        self.dim = dim
+        self.nprobe = nprobe
+        self._partitions: Dict[str, _Partition] = {}  # nombre de partición -> partición
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _partition_name(user_id: str) -> str:
+        """Nombre de archivo seguro y estable para el usuario"""
+        safe = re.sub(r'[^a-zA-Z0-9_.-]', '_', user_id or 'unknown_user')[:48]
+        digest = hashlib.md5((user_id or '').encode('utf-8')).hexdigest()[:8]
+        return f"user_{safe}_{digest}"
+
+    def _open_partition(self, name: str) -> _Partition:
+        with self._lock:
+            partition = self._partitions.get(name)
+            if partition is None:
+                partition = _Partition(self.directory, name, self.dim)
+                self._partitions[name] = partition
+            return partition
+
+    def _partition(self, user_id: str) -> _Partition:
+        return self._open_partition(self._partition_name(user_id))
+
+    def _known_user_partitions(self) -> List[_Partition]:
+        """Particiones de todos los usuarios: las de disco (de cualquier proceso) y las abiertas"""
+        try:
+            names = {f[:-len('.f32')] for f in os.listdir(self.directory)
+                     if f.startswith('user_') and f.endswith('.f32')}
+        except OSError:
+            names = set()
+        with self._lock:
+            names.update(self._partitions)
+        return [self._open_partition(name) for name in sorted(names)]
+
+    def add(self, user_id: str, key: str, vector: np.ndarray):
+        self._partition(user_id).add(key, np.asarray(vector, dtype=np.float32).reshape(-1))
+
+    def remove(self, user_id: str, key: str) -> bool:
+        return self._partition(user_id).remove(key)
+
+    def contains(self, user_id: str, key: str) -> bool:
+        return self._partition(user_id).contains(key)
+
+    def size(self, user_id: str) -> int:
+        return self._partition(user_id).size()
+
+    def search(self, query: np.ndarray, user_id: Optional[str] = None, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-k (clave, similitud). Sin user_id busca en todas las particiones"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        partitions = [self._partition(user_id)] if user_id else self._known_user_partitions()
+
+        results: List[Tuple[str, float]] = []
+        for partition in partitions:
+            results.extend(partition.search(query, k, self.nprobe))
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def flush(self):
+        with self._lock:
+            partitions = list(self._partitions.values())
+        for partition in partitions:
+            partition.store.flush()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Estadísticas por partición abierta (clave = nombre de partición)"""
+        with self._lock:
+            partitions = dict(self._partitions)
+        return {
+            name: dict(partition.store.stats(), ivf=partition.ivf is not None)
+            for name, partition in partitions.items()
+        }
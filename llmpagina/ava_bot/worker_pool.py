@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Pool de Workers AVA
+===================
+
+Mantiene N instancias de AVA precalentadas (servidor MCP, ChromaDB y
+SentenceTransformer ya cargados). Flask enruta cada mensaje a un worker libre.
+
+Modos:
+- thread:  LLMWithMCPTools dentro del proceso Flask, un event loop por hilo.
+- process: ava_bot.py --ipc como subproceso, hablando el protocolo NDJSON
+           de ipc_protocol.py (frames con id, sin scraping de stdout).
+
+Ambos modos devuelven el mismo resultado: {'text', 'images', 'tool_events', 'worker_id'}.
+Con on_event(tipo, datos) se reciben además en vivo los eventos tool/token/reset.
+
+Los workers no guardan estado de usuario entre turnos: el pool conserva el
+historial de cada sesión (session_key) y lo envía, junto con el email del
+usuario, en cada petición. Así cualquier worker libre puede atender cualquier
+turno sin mezclar conversaciones ni memorias de usuarios distintos.
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Asegurar imports relativos al directorio de AVA (mcp_client, tools, prompts)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from ipc_protocol import (
+    encode_request, decode_line, new_request_id, extract_generated_images,
+    FRAME_READY, FRAME_TEXT, FRAME_IMAGE, FRAME_TOOL, FRAME_ERROR, FRAME_END,
+    STREAM_FRAME_TYPES
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_WARMUP_TIMEOUT = 90.0
+DEFAULT_ACQUIRE_TIMEOUT = 30.0
+SESSION_HISTORY_MESSAGES = int(os.getenv('AVA_SESSION_HISTORY_MESSAGES', '20'))  # mensajes por sesión
+MAX_SESSIONS = int(os.getenv('AVA_MAX_SESSIONS', '1000'))  # sesiones con historial en memoria (LRU)
+AVA_SCRIPT_PATH = os.path.join(current_dir, "ava_bot.py")
+
+
+class AvaWorker:
+    """Worker con event loop propio y una instancia LLMWithMCPTools precalentada"""
+
+    def __init__(self, worker_id: int, groq_api_key: str, mcp_server_path: str):
+        self.worker_id = worker_id
+        self.groq_api_key = groq_api_key
+        self.mcp_server_path = mcp_server_path
+        self.llm = None
+        self.ready = False
+        self.busy = False
+        self.requests_served = 0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run_loop,
+            name=f"ava-worker-{worker_id}",
+            daemon=True
+        )
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _warm_up(self) -> bool:
+        from ava_bot import LLMWithMCPTools
+        
+        self.llm = LLMWithMCPTools(self.groq_api_key, self.mcp_server_path)
+        return bool(await self.llm.initialize())
+
+    def start(self, timeout: float = DEFAULT_WARMUP_TIMEOUT) -> bool:
+        """Arranca el hilo y carga LLM + MCP + memoria (bloqueante)"""
+        self.thread.start()
+        self.started_at = time.time()
+
+        future = asyncio.run_coroutine_threadsafe(self._warm_up(), self.loop)
+        try:
+            self.ready = future.result(timeout=timeout)
+        except Exception as e:
+            future.cancel()
+            self.last_error = str(e) or type(e).__name__
+            self.ready = False
+
+        if self.ready:
+            logger.info(f"✅ Worker {self.worker_id} listo en {time.time() - self.started_at:.1f}s")
+        else:
+            logger.error(f"❌ Worker {self.worker_id} no pudo inicializarse: {self.last_error}")
+        return self.ready
+
+    def is_healthy(self) -> bool:
+        """El hilo sigue vivo y el servidor MCP no ha terminado"""
+        if not (self.ready and self.thread.is_alive() and self.llm):
+            return False
+        process = getattr(self.llm.mcp_client, 'process', None)
+        return process is not None and process.returncode is None
+
+    def ask(self, message: str, timeout: Optional[float] = None, on_event=None,
+            user_email: Optional[str] = None, history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Procesa un mensaje en el loop del worker y devuelve texto + herramientas usadas"""
+        if not self.ready or not self.llm:
+            raise RuntimeError(f"Worker {self.worker_id} no está listo")
+
+        self.busy = True
+        tool_events = []
+
+        def handle_event(event_type, data):
+            if event_type == FRAME_TOOL:
+                tool_events.append(data)
+            if on_event:
+                on_event(event_type, data)
+
+        future = asyncio.run_coroutine_threadsafe(
+            self.llm.process_user_input(message, on_event=handle_event, user_email=user_email, history=history),
+            self.loop
+        )
+        try:
+            text = future.result(timeout=timeout)
+            self.requests_served += 1
+            return {
+                'text': str(text) if text is not None else "",
+                'images': extract_generated_images(self.llm.last_tool_results),
+                'tool_events': tool_events,
+                'worker_id': self.worker_id
+            }
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.last_error = f"Timeout ({timeout}s)"
+            raise
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.busy = False
+
+    def stop(self, timeout: float = 10.0):
+        """Libera MCP y detiene el event loop"""
+        if self.llm and self.loop.is_running():
+            future = asyncio.run_coroutine_threadsafe(self.llm.cleanup(), self.loop)
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ Error limpiando worker {self.worker_id}: {e}")
+
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        self.ready = False
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'ready': self.ready,
+            'healthy': self.is_healthy(),
+            'busy': self.busy,
+            'requests_served': self.requests_served,
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0,
+            'last_error': self.last_error
+        }
+
+
+class _PendingRequest:
+    """Frames recibidos para una petición en curso"""
+
+    def __init__(self, on_event=None):
+        self.frames: List[Dict[str, Any]] = []
+        self.done = threading.Event()
+        self.on_event = on_event
+
+
+class AvaProcessWorker:
+    """Worker que ejecuta ava_bot.py --ipc y multiplexa peticiones por id sobre su stdin/stdout"""
+
+    def __init__(self, worker_id: int, script_path: str = AVA_SCRIPT_PATH,
+                 python_executable: Optional[str] = None):
+        self.worker_id = worker_id
+        self.script_path = script_path
+        self.python_executable = python_executable or sys.executable
+        self.process: Optional[subprocess.Popen] = None
+        self.ready = False
+        self.busy = False
+        self.requests_served = 0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+        self._pending: Dict[str, _PendingRequest] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._ready_event = threading.Event()
+
+    def start(self, timeout: float = DEFAULT_WARMUP_TIMEOUT) -> bool:
+        env = os.environ.copy()
+        env['PYTHONIOENCODING'] = 'utf-8'
+        env['PYTHONUNBUFFERED'] = '1'
+
+        self.started_at = time.time()
+        try:
+            self.process = subprocess.Popen(
+                [self.python_executable, self.script_path, "--ipc"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                bufsize=1,
+                cwd=os.path.dirname(self.script_path),
+                env=env
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+
+        threading.Thread(target=self._read_frames, name=f"ava-ipc-{self.worker_id}", daemon=True).start()
+        threading.Thread(target=self._drain_stderr, name=f"ava-ipc-err-{self.worker_id}", daemon=True).start()
+
+        self.ready = self._ready_event.wait(timeout) and self.process.poll() is None
+        if self.ready:
+            logger.info(f"✅ Worker IPC {self.worker_id} listo (PID {self.process.pid}) en {time.time() - self.started_at:.1f}s")
+        else:
+            self.last_error = self.last_error or f"ava_bot.py no envió 'ready' en {timeout}s"
+            logger.error(f"❌ Worker IPC {self.worker_id}: {self.last_error}")
+        return self.ready
+
+    def _read_frames(self):
+        """Despacha cada frame a la petición con su mismo id (bloquea en readline, sin polling)"""
+        for line in self.process.stdout:
+            frame = decode_line(line)
+            if frame is None:
+                continue
+
+            if frame['type'] == FRAME_READY:
+                self._ready_event.set()
+                continue
+
+            with self._pending_lock:
+                pending = self._pending.get(frame.get('id'))
+            if pending is None:
+                continue
+
+            pending.frames.append(frame)
+            if pending.on_event and frame['type'] in STREAM_FRAME_TYPES:
+                try:
+                    pending.on_event(frame['type'], frame.get('data', {}))
+                except Exception as e:
+                    logger.debug(f"Error en receptor de eventos: {e}")
+            if frame['type'] == FRAME_END:
+                pending.done.set()
+
+        # EOF: el proceso terminó, liberar a todos los que esperan
+        self.ready = False
+        self._ready_event.set()
+        with self._pending_lock:
+            for pending in self._pending.values():
+                pending.frames.append({'type': FRAME_ERROR, 'data': {'message': 'ava_bot.py terminó'}})
+                pending.done.set()
+
+    def _drain_stderr(self):
+        for line in self.process.stderr:
+            logger.debug(f"ava_bot[{self.worker_id}]: {line.rstrip()}")
+
+    def is_healthy(self) -> bool:
+        return self.ready and self.process is not None and self.process.poll() is None
+
+    def ask(self, message: str, timeout: Optional[float] = None, on_event=None,
+            user_email: Optional[str] = None, history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        if not self.is_healthy():
+            raise RuntimeError(f"Worker IPC {self.worker_id} no está listo")
+
+        request_id = new_request_id()
+        pending = _PendingRequest(on_event)
+        with self._pending_lock:
+            self._pending[request_id] = pending
+
+        self.busy = True
+        try:
+            with self._write_lock:
+                self.process.stdin.write(encode_request(request_id, message, user_email=user_email, history=history))
+                self.process.stdin.flush()
+
+            if not pending.done.wait(timeout):
+                self.last_error = f"Timeout ({timeout}s)"
+                raise concurrent.futures.TimeoutError()
+        finally:
+            self.busy = False
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+        result = {'text': "", 'images': [], 'tool_events': [], 'worker_id': self.worker_id}
+        errors = []
+        for frame in pending.frames:
+            data = frame.get('data', {})
+            if frame['type'] == FRAME_TEXT:
+                result['text'] += data.get('text', '')
+            elif frame['type'] == FRAME_IMAGE:
+                result['images'].append(data)
+            elif frame['type'] == FRAME_TOOL:
+                result['tool_events'].append(data)
+            elif frame['type'] == FRAME_ERROR:
+                errors.append(data.get('message', 'Error desconocido'))
+
+        if errors and not result['text']:
+            self.last_error = errors[0]
+            raise RuntimeError(errors[0])
+
+        self.requests_served += 1
+        return result
+
+    def stop(self, timeout: float = 10.0):
+        self.ready = False
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=timeout)
+            except Exception:
+                self.process.kill()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'pid': self.process.pid if self.process else None,
+            'ready': self.ready,
+            'healthy': self.is_healthy(),
+            'busy': self.busy,
+            'requests_served': self.requests_served,
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0,
+            'last_error': self.last_error
+        }
+
+
+class AvaWorkerPool:
+    """Pool de workers AVA: cada petición toma un worker libre y lo devuelve al terminar"""
+
+    def __init__(self, groq_api_key: str, mcp_server_path: str, size: Optional[int] = None,
+                 warmup_timeout: float = DEFAULT_WARMUP_TIMEOUT, mode: str = "thread",
+                 python_executable: Optional[str] = None):
+        self.groq_api_key = groq_api_key
+        self.mcp_server_path = mcp_server_path
+        self.mode = mode
+        self.python_executable = python_executable
+        self.size = size or int(os.getenv('AVA_POOL_SIZE', DEFAULT_POOL_SIZE))
+        self.warmup_timeout = warmup_timeout
+
+        self._workers: Dict[int, Any] = {}
+        self._idle: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.started = False
+
+        self._histories: "OrderedDict[str, List[Dict]]" = OrderedDict()  # session_key -> historial
+        self._histories_lock = threading.Lock()
+
+    def _session_history(self, session_key: Optional[str]) -> Optional[List[Dict]]:
+        """Copia del historial de la sesión (None sin sesión: el worker usa su propio estado)"""
+        if session_key is None:
+            return None
+        with self._histories_lock:
+            history = self._histories.get(session_key)
+            if history is None:
+                return []
+            self._histories.move_to_end(session_key)
+            return list(history)
+
+    def _record_turn(self, session_key: Optional[str], message: str, response: str):
+        if session_key is None:
+            return
+        now = datetime.now().isoformat()
+        with self._histories_lock:
+            history = self._histories.setdefault(session_key, [])
+            history.append({'role': 'user', 'content': message, 'timestamp': now})
+            history.append({'role': 'assistant', 'content': response, 'timestamp': now})
+            del history[:-SESSION_HISTORY_MESSAGES]
+            self._histories.move_to_end(session_key)
+            while len(self._histories) > MAX_SESSIONS:
+                self._histories.popitem(last=False)
+
+    def clear_session(self, session_key: str):
+        """Olvida el historial de una sesión (p. ej. al cerrar sesión)"""
+        with self._histories_lock:
+            self._histories.pop(session_key, None)
+
+    def _spawn_worker(self):
+        with self._lock:
+            if self._closed:
+                return None
+        if self.mode == "process":
+            worker = AvaProcessWorker(next(self._ids), python_executable=self.python_executable)
+        else:
+            worker = AvaWorker(next(self._ids), self.groq_api_key, self.mcp_server_path)
+        if not worker.start(timeout=self.warmup_timeout):
+            worker.stop()
+            return None
+
+        with self._lock:
+            # shutdown() pudo llegar durante el arranque: no dejar workers huérfanos
+            closed = self._closed
+            if not closed:
+                self._workers[worker.worker_id] = worker
+        if closed:
+            worker.stop()
+            return None
+        self._idle.put(worker)
+        return worker
+
+    def start(self) -> int:
+        """Precalienta todos los workers en paralelo. Retorna cuántos quedaron listos"""
+        logger.info(f"🚀 Precalentando pool AVA con {self.size} workers...")
+        with self._lock:
+            self._closed = False
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.size) as executor:
+            results = list(executor.map(lambda _: self._spawn_worker(), range(self.size)))
+
+        ready = sum(1 for worker in results if worker)
+        self.started = ready > 0
+        logger.info(f"📊 Pool AVA: {ready}/{self.size} workers listos")
+        return ready
+
+    def _retire(self, worker):
+        """Saca un worker dañado del pool y arranca un reemplazo en background"""
+        with self._lock:
+            self._workers.pop(worker.worker_id, None)
+
+        def replace():
+            worker.stop()
+            with self._lock:
+                if self._closed:
+                    return
+            self._spawn_worker()
+
+        threading.Thread(target=replace, name=f"ava-worker-replace-{worker.worker_id}", daemon=True).start()
+
+    def submit(self, message: str, timeout: Optional[float] = None,
+               acquire_timeout: float = DEFAULT_ACQUIRE_TIMEOUT, on_event=None,
+               session_key: Optional[str] = None, user_email: Optional[str] = None) -> Dict[str, Any]:
+        """Envía un mensaje al primer worker libre y espera la respuesta.
+
+        on_event(tipo, datos) recibe los eventos intermedios (tool, token, reset)
+        desde el hilo del worker mientras la respuesta se genera.
+        Con session_key el turno usa el historial y el email de esa sesión, no
+        el estado que haya dejado en el worker el turno anterior.
+        """
+        if not self.started:
+            raise RuntimeError("Pool AVA no iniciado")
+
+        try:
+            worker = self._idle.get(timeout=acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Todos los workers AVA ocupados ({acquire_timeout}s)")
+
+        # Un timeout deja el turno abandonado ocupando el worker (y su MCP): se reemplaza
+        reusable = False
+        try:
+            result = worker.ask(message, timeout=timeout, on_event=on_event, user_email=user_email,
+                                history=self._session_history(session_key))
+            reusable = True
+            self._record_turn(session_key, message, result.get('text', ''))
+            return result
+        except concurrent.futures.TimeoutError:
+            raise TimeoutError(f"AVA no respondió en {timeout}s")
+        except Exception:
+            reusable = True
+            raise
+        finally:
+            if reusable and worker.is_healthy():
+                self._idle.put(worker)
+            else:
+                logger.warning(f"♻️ Reemplazando worker {worker.worker_id}: {worker.last_error}")
+                self._retire(worker)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = [worker.info() for worker in self._workers.values()]
+        return {
+            'mode': self.mode,
+            'size': self.size,
+            'alive': sum(1 for w in workers if w['healthy']),
+            'idle': self._idle.qsize(),
+            'workers': workers
+        }
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for worker in workers:
+            worker.stop()
+        self.started = False
+        logger.info("🧹 Pool AVA detenido")
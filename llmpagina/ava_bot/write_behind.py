@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Escritura Diferida (write-behind) para SQLite
+=============================================
+
+Las escrituras por turno (registro de conversaciones) se encolan y un hilo
+las agrupa en una sola transacción cada WRITE_BEHIND_FLUSH_MS, para todas
+las sesiones del proceso. El turno solo paga un put() en la cola: nunca
+espera a la conexión, al bloqueo de escritura ni al commit.
+
+- Una cola por base (get_write_behind(path)), compartida por todas las
+  instancias que escriben en ella.
+- Tareas de compactación periódicas (add_compaction) en el mismo hilo: por
+  ejemplo el recorte de historial que antes se hacía en cada INSERT.
+- flush() espera a que lo encolado hasta ese momento esté escrito; al salir
+  del proceso (atexit) se vacían las colas y se compacta una última vez.
+- Si la cola se llena (WRITE_BEHIND_MAX_PENDING) la escritura se hace en el
+  acto: contrapresión en lugar de perder datos.
+
+Lo encolado tarda hasta un intervalo en ser visible para las lecturas.
+"""
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from sqlite_pool import db_connection, resolve_path
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_MS = int(os.environ.get('WRITE_BEHIND_FLUSH_MS', '200'))
+MAX_BATCH = int(os.environ.get('WRITE_BEHIND_MAX_BATCH', '500'))
+MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '10000'))
+
+Write = Tuple[str, Sequence]
+Compaction = Callable[[sqlite3.Connection], None]
+
+
+class WriteBehindQueue:
+    """Cola de escrituras SQLite aplicadas por lotes en un hilo propio"""
+
+    def __init__(self, db_path: Union[str, Path], flush_interval_ms: int = FLUSH_INTERVAL_MS,
+                 max_batch: int = MAX_BATCH, max_pending: int = MAX_PENDING):
+        self.db_path = resolve_path(db_path)
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max(1, max_batch)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._compactions: Dict[str, List] = {}  # nombre -> [función, intervalo, última ejecución]
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self.owner_pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{Path(self.db_path).stem}",
+                                        daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+    def submit(self, sql: str, params: Sequence = ()) -> bool:
+        """Encola una escritura; False si no se pudo aplicar"""
+        if self._closed.is_set():
+            return self._write_now([(sql, params)])
+        try:
+            self._queue.put_nowait((sql, tuple(params)))
+            return True
+        except queue.Full:
+            logger.warning(f"⚠️ Cola write-behind llena ({self.db_path}): escritura síncrona")
+            return self._write_now([(sql, params)])
+
+    def add_compaction(self, name: str, func: Compaction, interval_seconds: float):
+        """Tarea periódica que recibe una conexión dentro de su propia transacción"""
+        with self._lock:
+            if name not in self._compactions:
+                self._compactions[name] = [func, interval_seconds, time.monotonic()]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que lo encolado hasta ahora esté escrito"""
+        if self._closed.is_set() or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 10):
+        """Vacía la cola, compacta una última vez y detiene el hilo"""
+        if self._closed.is_set():
+            return
+        self.flush(timeout)
+        self._closed.set()
+        self._thread.join(timeout)
+
+        # Lo que llegó entre el flush y el cierre
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            else:
+                leftovers.append(item)
+        if leftovers:
+            self._write_batch(leftovers)
+        self._run_compactions(force=True)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # ------------------------------------------------------------------
+    # Hilo de escritura
+    # ------------------------------------------------------------------
+    def _run(self):
+        while not self._closed.is_set():
+            batch, markers = self._collect()
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.set()
+            self._run_compactions()
+
+    def _collect(self) -> Tuple[List[Write], List[threading.Event]]:
+        """Primer elemento (o nada en un intervalo) y todo lo que llegue hasta completar el intervalo"""
+        batch, markers = [], []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, markers
+
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, threading.Event):
+                # flush(): se escribe ya lo acumulado
+                markers.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch, markers
+
+    def _write_batch(self, batch: List[Write]):
+        if self._write_now(batch):
+            return
+        # Un error en el lote: reintentar de uno en uno para no perder el resto
+        failed = sum(1 for write in batch if not self._write_now([write]))
+        if failed:
+            logger.error(f"❌ Write-behind: {failed} de {len(batch)} escrituras descartadas en {self.db_path}")
+
+    def _write_now(self, batch: List[Write]) -> bool:
+        try:
+            with db_connection(self.db_path) as conn:
+                # Escrituras consecutivas con la misma sentencia van juntas en executemany
+                start = 0
+                while start < len(batch):
+                    sql = batch[start][0]
+                    end = start
+                    while end < len(batch) and batch[end][0] == sql:
+                        end += 1
+                    conn.executemany(sql, [params for _, params in batch[start:end]])
+                    start = end
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Error escribiendo lote de {len(batch)} en {self.db_path}: {e}")
+            return False
+
+    def _run_compactions(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            due = [(name, entry) for name, entry in self._compactions.items()
+                   if force or now - entry[2] >= entry[1]]
+        for name, entry in due:
+            entry[2] = now
+            try:
+                with db_connection(self.db_path) as conn:
+                    entry[0](conn)
+            except Exception as e:
+                logger.warning(f"⚠️ Compactación '{name}' falló en {self.db_path}: {e}")
+
+
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_behind(db_path: Union[str, Path]) -> WriteBehindQueue:
+    """Cola compartida del proceso para la base indicada"""
+    key = resolve_path(db_path)
+    with _queues_lock:
+        writer = _queues.get(key)
+        # Tras un fork el hilo de escritura no existe en el hijo: cola nueva
+        if writer is None or writer.owner_pid != os.getpid():
+            writer = _queues[key] = WriteBehindQueue(key)
+        return writer
+
+
+@atexit.register
+def close_all():
+    """Vacía todas las colas al terminar el proceso"""
+    with _queues_lock:
+        writers = [writer for writer in _queues.values() if writer.owner_pid == os.getpid()]
+    for writer in writers:
+        try:
+            writer.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Error cerrando cola write-behind {writer.db_path}: {e}")
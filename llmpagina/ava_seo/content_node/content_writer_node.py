@@ -375,8 +375,8 @@ def generate_article_with_groq(prompt, model=GROQ_MODEL):
         }
 
 # ==== FUNCIÓN PRINCIPAL DEL NODO ====
-def run_content_writer_node(output_dir=OUTPUT_DIR, topics_file=None):
-    """Función principal del nodo que ejecuta todo el proceso"""
+def run_content_writer_node(output_dir=OUTPUT_DIR, topics_file=None, input_dir=INPUT_DIR):
+    """Función principal del nodo que ejecuta todo el proceso (rutas por argumento)"""
     start_time = datetime.now()
     logger.info(f"Iniciando content_writer_node: {start_time}")
     
@@ -398,7 +398,7 @@ def run_content_writer_node(output_dir=OUTPUT_DIR, topics_file=None):
     
     try:
         # PASO 1: Cargar temas extraídos
-        topics_data = load_latest_topics(specific_file=topics_file)
+        topics_data = load_latest_topics(input_dir=input_dir, specific_file=topics_file)
         
         if not topics_data or 'topics' not in topics_data:
             logger.error("No se pudieron cargar los temas o el formato no es válido")
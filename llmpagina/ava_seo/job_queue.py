@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+job_queue.py - Cola de trabajos SEO dentro del proceso
+
+Ejecuta seo_workflow.run_workflow en un pool acotado de hilos en lugar de
+lanzar un intérprete Python nuevo por ejecución:
+
+- Sin arranque de proceso ni reimportación de groq/httpx/bs4 en cada trabajo;
+  los módulos de los nodos se cargan una vez y se reutilizan.
+- Cada trabajo tiene estado (queued, running, succeeded, failed, cancelled),
+  progreso por nodo del DAG y un resultado estructurado en lugar de stdout.
+- La cancelación es cooperativa: deja de programar nodos y los que estaban en
+  marcha terminan con checkpoint, así que el run_id se puede reanudar.
+- Solo un trabajo activo a la vez: pedir otro devuelve el que ya corre.
+
+Variables de entorno:
+    SEO_JOB_WORKERS: trabajos simultáneos (por defecto 1)
+    SEO_JOB_HISTORY: trabajos terminados que se conservan (por defecto 20)
+"""
+
+import logging
+import os
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("seo_job_queue")
+
+JOB_WORKERS = int(os.getenv("SEO_JOB_WORKERS", "1"))
+JOB_HISTORY = int(os.getenv("SEO_JOB_HISTORY", "20"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+def _load_workflow():
+    """Importa seo_workflow al ejecutar el primer trabajo (configura logging al importarse)"""
+    try:
+        import seo_workflow
+    except ImportError:
+        from llmpagina.ava_seo import seo_workflow
+    return seo_workflow
+
+
+class SeoJob:
+    """Un trabajo del flujo SEO con su estado, progreso y resultado"""
+
+    def __init__(self, run_id: Optional[str] = None, resume: bool = False,
+                 articles: Optional[int] = None,
+                 on_done: Optional[Callable[["SeoJob"], None]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.run_id = run_id
+        self.resume = resume
+        self.articles = articles
+        self.on_done = on_done
+
+        self.status = QUEUED
+        self.progress: Dict[str, Any] = {"total_nodes": 0, "completed": 0, "running": [], "failed": 0, "last_event": None}
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que termine; False si se agotó el tiempo"""
+        return self._done.wait(timeout)
+
+    def _on_progress(self, event: str, node_name: str, state: Dict):
+        self.progress = dict(state, last_event=f"{event}:{node_name}")
+        logger.info(f"📋 Trabajo {self.id}: {event} {node_name} "
+                    f"({state['completed']}/{state['total_nodes']})")
+
+    def to_dict(self) -> Dict[str, Any]:
+        def iso(value):
+            return value.isoformat() if value else None
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "run_id": self.run_id,
+            "resume": self.resume,
+            "articles": self.articles,
+            "progress": self.progress,
+            "created_at": iso(self.created_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+            "duration": (self.finished_at - self.started_at).total_seconds()
+                        if self.started_at and self.finished_at else None,
+            "cancel_requested": self.cancel_event.is_set(),
+            "result": self.result,
+            "error": self.error
+        }
+
+
+def summarize_result(result: Dict) -> Dict[str, Any]:
+    """Resumen serializable del resultado del grafo (artículos e imágenes por rama)"""
+    articles = []
+    for name, output in result.items():
+        if not name.startswith("results_formatter_node") or not isinstance(output, dict):
+            continue
+        if output.get("skipped"):
+            continue  # rama sin temas
+        display = output.get("display_result") or {}
+        article = display.get("article") or {}
+        articles.append({
+            "node": name,
+            "title": article.get("title"),
+            "article_file": (output.get("content_result") or {}).get("json_file"),
+            "image": (display.get("image") or {}).get("web_path")
+        })
+
+    return {
+        "run_id": result.get("run_id"),
+        "execution_time": result.get("execution_time"),
+        "articles": articles,
+        "failed_nodes": result.get("failed_nodes", {}),
+        "resumed_nodes": result.get("resumed_nodes", []),
+        "cancelled": result.get("cancelled", False)
+    }
+
+
+class SeoJobRunner:
+    """Pool acotado que ejecuta trabajos SEO en el proceso actual"""
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="seo-job")
+        self._jobs: "OrderedDict[str, SeoJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, run_id: Optional[str] = None, resume: bool = False,
+               articles: Optional[int] = None,
+               on_done: Optional[Callable[[SeoJob], None]] = None) -> SeoJob:
+        """Encola un trabajo; si ya hay uno activo se devuelve ese"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active:
+                    logger.info(f"⏳ Trabajo SEO {job.id} ya en curso ({job.status}), no se duplica")
+                    return job
+
+            job = SeoJob(run_id=run_id, resume=resume, articles=articles, on_done=on_done)
+            self._jobs[job.id] = job
+            self._trim_history()
+
+        logger.info(f"📥 Trabajo SEO {job.id} encolado")
+        self._executor.submit(self._run, job)
+        return job
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: SeoJob):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        logger.info(f"🚀 Trabajo SEO {job.id} iniciado")
+
+        try:
+            workflow = _load_workflow()
+            result = workflow.run_workflow(run_id=job.run_id, resume=job.resume, articles=job.articles,
+                                           progress=job._on_progress, cancel_event=job.cancel_event)
+            if not result:
+                job.error = "El flujo de trabajo no devolvió resultados"
+                self._finish(job, FAILED)
+                return
+
+            job.result = summarize_result(result)
+            job.run_id = job.result["run_id"]
+            if job.result["cancelled"]:
+                status = CANCELLED
+            elif job.result["failed_nodes"]:
+                job.error = f"Nodos sin completar: {', '.join(job.result['failed_nodes'])}"
+                status = FAILED
+            else:
+                status = SUCCEEDED
+            self._finish(job, status)
+        except Exception as e:
+            logger.error(f"💥 Trabajo SEO {job.id} falló: {e}")
+            logger.error(traceback.format_exc())
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job: SeoJob, status: str):
+        job.status = status
+        job.finished_at = datetime.now()
+        logger.info(f"🏁 Trabajo SEO {job.id} terminado: {status}")
+        if job.on_done:
+            try:
+                job.on_done(job)
+            except Exception as e:
+                logger.error(f"❌ Error en on_done del trabajo {job.id}: {e}")
+        job._done.set()
+
+    def get(self, job_id: str) -> Optional[SeoJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[SeoJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def active_job(self) -> Optional[SeoJob]:
+        with self._lock:
+            return next((job for job in self._jobs.values() if job.active), None)
+
+    def cancel(self, job_id: str) -> Optional[SeoJob]:
+        """Pide la cancelación; el trabajo termina al acabar los nodos en marcha"""
+        job = self.get(job_id)
+        if job is not None and job.active:
+            job.cancel_event.set()
+            logger.info(f"🛑 Cancelación solicitada para el trabajo SEO {job.id}")
+        return job
+
+    def shutdown(self, wait: bool = False):
+        for job in self.list_jobs():
+            if job.active:
+                job.cancel_event.set()
+        self._executor.shutdown(wait=wait)
+
+
+_runner: Optional[SeoJobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> SeoJobRunner:
+    """Cola compartida del proceso"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = SeoJobRunner()
+        return _runner
@@ -13,14 +13,26 @@ Este script modifica el comportamiento del seo_node para:
 """
 
 import os
+import sys
+import asyncio
+import atexit
+import hashlib
 import logging
+import multiprocessing
+import random
 import re
+import sqlite3
+import threading
+import zlib
 from collections import Counter
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+from urllib.parse import urlparse
 import json
 import time
-import requests
+import httpx
 from bs4 import BeautifulSoup
 
 # Configurar logging
@@ -40,6 +52,28 @@ SEARCH_TOPICS = ["artifical intelligence", " ai software development", "ai agent
 MAX_RESULTS_PER_TOPIC = 10  # Ejemplo, ajustar según configuración real
 all_results = []
 
+# Etapa concurrente de búsqueda y extracción
+SEARCH_CONCURRENCY = int(os.getenv("SEO_SEARCH_CONCURRENCY", "4"))    # búsquedas Tavily simultáneas
+FETCH_CONCURRENCY = int(os.getenv("SEO_FETCH_CONCURRENCY", "8"))      # descargas simultáneas en total
+HOST_CONCURRENCY = int(os.getenv("SEO_HOST_CONCURRENCY", "2"))        # descargas simultáneas por host
+HOST_MIN_INTERVAL = float(os.getenv("SEO_HOST_MIN_INTERVAL", "0.5"))  # segundos entre peticiones al mismo host
+RETRY_BASE_DELAY = 1.0   # backoff exponencial con jitter: 1s, 2s, 4s... (+/- 50%)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+PARSE_WORKERS = int(os.getenv("SEO_PARSE_WORKERS", str(min(4, os.cpu_count() or 2))))  # procesos de parseo HTML
+# fork dentro del proceso Flask (multihilo) puede heredar locks tomados por otros hilos
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Cache HTTP persistente (revalidación ETag / Last-Modified) y cache de contenido parseado
+HTTP_CACHE_PATH = os.getenv(
+    "SEO_HTTP_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "output", "http_cache.db")
+)
+HTTP_CACHE_MAX_AGE_DAYS = 30
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
 # Importar Tavily API
 try:
     from tavily import TavilyClient
@@ -270,17 +304,36 @@ def search_with_fallback(topic, max_results):
         'results': [{'title': f'Resultado {i} para {topic}', 'content': f'Contenido simulado para {topic}'} for i in range(max_results)]
     }
 
+def _run_sync(coro):
+    """asyncio.run() para llamadores síncronos sin bucle en marcha.
+    
+    Desde código async hay que usar las variantes *_async con await: bloquear
+    aquí el bucle del llamador detendría todo lo demás que corre en él.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("Llamada síncrona con un bucle asyncio en marcha: usa la variante *_async con await")
+
 def extract_full_content_for_topics(topics):
-    """Extrae el contenido completo para los temas proporcionados"""
+    """Extrae el contenido completo para los temas proporcionados (descargas en paralelo)"""
+    return _run_sync(extract_full_content_for_topics_async(topics))
+
+async def extract_full_content_for_topics_async(topics):
+    """Versión async de extract_full_content_for_topics"""
+    urls = [
+        topic['original_result']['url']
+        for topic in topics
+        if 'original_result' in topic and 'url' in topic['original_result']
+    ]
+    articles = await extract_articles_async(urls, BROWSER_HEADERS, max_retries=3, timeout=10) if urls else {}
+    
     for topic in topics:
-        # Si hay una URL en el resultado original, intentar extraer el contenido
+        # Si hay una URL en el resultado original, usar el contenido extraído
         if 'original_result' in topic and 'url' in topic['original_result']:
-            url = topic['original_result']['url']
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            full_content = extract_full_article_patched(url, headers, max_retries=3, timeout=10)
-            topic['full_content'] = full_content
+            topic['full_content'] = articles[topic['original_result']['url']]
         else:
             # Si no hay URL, crear un contenido de ejemplo
             topic['full_content'] = {
@@ -299,6 +352,277 @@ def extract_full_article(url, headers, max_retries, timeout):
 
 def extract_full_article_patched(url, headers, max_retries, timeout):
     """Versión modificada de extract_full_article que limita el tamaño del contenido"""
+    return _run_sync(extract_full_article_async(url, headers, max_retries, timeout))
+
+async def extract_full_article_async(url, headers, max_retries, timeout):
+    """Versión async de extract_full_article"""
+    articles = await extract_articles_async([url], headers, max_retries, timeout, use_process_pool=False)
+    return articles[url]
+
+def parse_article_html(html: bytes, url: str) -> Dict[str, Any]:
+    """
+    Extrae título, texto (máximo 1500 palabras) e imagen principal del HTML.
+    
+    Función de módulo para poder ejecutarse en el pool de procesos.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Eliminar elementos que no nos interesan
+    for tag in soup(['script', 'style', 'iframe', 'nav', 'footer', 'aside']):
+        tag.decompose()
+    
+    # Extraer título
+    title = soup.title.text.strip() if soup.title else ""
+    
+    # Estrategia 1: Buscar el contenido principal
+    main_content = None
+    for selector in ['article', 'main', '.content', '.post-content', '.entry-content', '#content']:
+        if not main_content:
+            main_content = soup.select_one(selector)
+    
+    # Si encontramos contenido principal, extraer texto
+    if main_content:
+        paragraphs = main_content.find_all('p')
+        text = "\n\n".join([p.get_text().strip() for p in paragraphs if len(p.get_text().strip()) > 50])
+    else:
+        # Estrategia 2: Obtener todos los párrafos largos
+        paragraphs = soup.find_all('p')
+        text = "\n\n".join([p.get_text().strip() for p in paragraphs if len(p.get_text().strip()) > 100])
+    
+    # Si aún no tenemos texto suficiente, usar todo el texto del body
+    if len(text) < 500 and soup.body:
+        text = soup.body.get_text().strip()
+        # Limpiar espacios múltiples
+        text = re.sub(r'\s+', ' ', text)
+        # Dividir en párrafos por puntos
+        text = re.sub(r'\.', '.\n\n', text)
+    
+    # NUEVO: Limitar el tamaño del contenido (máximo 1500 palabras)
+    words = text.split()
+    if len(words) > 1500:
+        text = ' '.join(words[:1500]) + "... [Contenido truncado]"
+    
+    # Extraer imágenes principales (máximo 1 para reducir tamaño)
+    images = []
+    for img in soup.find_all('img', src=True)[:1]:  # Reducido a 1 imagen
+        src = img['src']
+        # Convertir URLs relativas a absolutas
+        if src.startswith('/'):
+            base_url = '/'.join(url.split('/')[:3])  # http(s)://domain.com
+            src = base_url + src
+        images.append(src)
+    
+    # Verificar si tenemos suficiente contenido
+    if len(text) > 300:
+        return {
+            'success': True,
+            'title': title,
+            'content': text,
+            'images': images,
+            'url': url
+        }
+    return {
+        'success': False,
+        'content': text if text else "No se pudo extraer contenido suficiente",
+        'error': "Contenido insuficiente"
+    }
+
+class ArticleHttpCache:
+    """
+    Cache SQLite de respuestas HTTP (cuerpo comprimido con zlib) y de artículos parseados.
+    
+    - http_responses: url -> ETag, Last-Modified, hash del cuerpo y cuerpo comprimido
+    - parsed_articles: (url, hash) -> resultado de parse_article_html
+    Un 304 o un cuerpo con el mismo hash evitan repetir el parseo.
+    
+    Los métodos son bloqueantes: desde el bucle se llaman con asyncio.to_thread,
+    por eso la conexión admite otros hilos y cada operación toma el lock.
+    """
+    
+    def __init__(self, path: str = HTTP_CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at TEXT NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS parsed_articles (
+                url TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                parsed_at TEXT NOT NULL,
+                PRIMARY KEY (url, content_hash)
+            )
+        ''')
+        # Artículos viejos ya no reaparecen en las búsquedas
+        cutoff = f"-{HTTP_CACHE_MAX_AGE_DAYS} days"
+        self.conn.execute("DELETE FROM http_responses WHERE fetched_at < datetime('now', ?)", (cutoff,))
+        self.conn.execute("DELETE FROM parsed_articles WHERE parsed_at < datetime('now', ?)", (cutoff,))
+        self.conn.commit()
+        self.hits = {'not_modified': 0, 'same_content': 0, 'parsed': 0}
+    
+    @staticmethod
+    def content_hash(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
+    
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since de la última respuesta guardada"""
+        with self._lock:
+            row = self.conn.execute("SELECT etag, last_modified FROM http_responses WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers['If-None-Match'] = row[0]
+        if row and row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+    
+    def cached_response(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT content_hash, body FROM http_responses WHERE url = ?", (url,)).fetchone()
+        if not row:
+            return None
+        return {'content_hash': row[0], 'body': zlib.decompress(row[1])}
+    
+    def cached_hash(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT content_hash FROM http_responses WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+    
+    def store_response(self, url: str, response: httpx.Response, content_hash: str):
+        body = zlib.compress(response.content, 6)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO http_responses (url, etag, last_modified, content_hash, body, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, datetime('now'))",
+                (url, response.headers.get('etag'), response.headers.get('last-modified'), content_hash, body)
+            )
+            self.conn.commit()
+    
+    def touch(self, url: str):
+        """Un 304 confirma que la copia sigue vigente"""
+        with self._lock:
+            self.conn.execute("UPDATE http_responses SET fetched_at = datetime('now') WHERE url = ?", (url,))
+            self.conn.commit()
+    
+    def parsed(self, url: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result FROM parsed_articles WHERE url = ? AND content_hash = ?", (url, content_hash)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def store_parsed(self, url: str, content_hash: str, result: Dict[str, Any]):
+        with self._lock:
+            self.conn.execute("DELETE FROM parsed_articles WHERE url = ?", (url,))
+            self.conn.execute(
+                "INSERT INTO parsed_articles (url, content_hash, result, parsed_at) VALUES (?, ?, ?, datetime('now'))",
+                (url, content_hash, json.dumps(result, ensure_ascii=False))
+            )
+            self.conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class HostRateLimiter:
+    """Limita descargas simultáneas e intervalo mínimo entre peticiones por host"""
+    
+    def __init__(self, max_concurrent: int = HOST_CONCURRENCY, min_interval: float = HOST_MIN_INTERVAL):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+    
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphores[host]
+    
+    async def __call__(self, host: str, request):
+        async with self._semaphore(host):
+            # Reservar el siguiente hueco del host antes de esperar
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            return await request()
+
+def _backoff_delay(attempt: int) -> float:
+    """Backoff exponencial con jitter para no sincronizar reintentos entre hosts"""
+    return RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos del módulo para parsear HTML (se crea una vez y se reutiliza entre ejecuciones)"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # Los procesos hijos importan este módulo por nombre: su carpeta debe estar en sys.path
+            module_dir = os.path.dirname(os.path.abspath(__file__))
+            if module_dir not in sys.path:
+                sys.path.append(module_dir)
+            try:
+                _parse_pool = ProcessPoolExecutor(max_workers=max(1, PARSE_WORKERS),
+                                                  mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Pool de procesos no disponible, se parseará en hilos: {e}")
+                return None
+        return _parse_pool
+
+def _discard_parse_pool(pool: ProcessPoolExecutor):
+    """Descarta un pool roto; el siguiente uso crea otro"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def _shutdown_parse_pool():
+    with _parse_pool_lock:
+        pool = _parse_pool
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def _parse_async(html: bytes, url: str, parse_pool: Optional[ProcessPoolExecutor]) -> Dict[str, Any]:
+    if parse_pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(parse_pool, parse_article_html, html, url)
+        except BrokenProcessPool:
+            logger.warning("Pool de procesos no disponible, parseando en hilo")
+            _discard_parse_pool(parse_pool)
+    return await asyncio.to_thread(parse_article_html, html, url)
+
+async def _parse_with_cache(cache: Optional[ArticleHttpCache], url: str, body: bytes, content_hash: str,
+                            parse_pool: Optional[ProcessPoolExecutor]) -> Dict[str, Any]:
+    """Reutiliza el parseo si el contenido (hash) no cambió"""
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.parsed, url, content_hash)
+        if cached is not None:
+            cache.hits['parsed'] += 1
+            return cached
+    
+    result = await _parse_async(body, url, parse_pool)
+    if cache is not None and result['success']:
+        await asyncio.to_thread(cache.store_parsed, url, content_hash, result)
+    return result
+
+async def fetch_article_async(client: httpx.AsyncClient, limiter: HostRateLimiter, url: str,
+                              max_retries: int, parse_pool: Optional[ProcessPoolExecutor] = None,
+                              cache: Optional[ArticleHttpCache] = None) -> Dict[str, Any]:
+    """Descarga (GET condicional si hay copia en cache) y parsea un artículo con reintentos"""
     logger.info(f"Extrayendo contenido completo de: {url}")
     
     if not url or url == "https://example.com/1" or url == "https://example.com/2":
@@ -309,107 +633,99 @@ def extract_full_article_patched(url, headers, max_retries, timeout):
             'error': "URL de ejemplo"
         }
     
+    host = urlparse(url).netloc
+    result = {'success': False, 'error': "Máximo de intentos alcanzado"}
+    
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            response.raise_for_status()
+            request_headers = await asyncio.to_thread(cache.conditional_headers, url) if cache is not None else {}
+            response = await limiter(host, lambda: client.get(url, headers=request_headers))
             
-            # Parseamos el HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Eliminar elementos que no nos interesan
-            for tag in soup(['script', 'style', 'iframe', 'nav', 'footer', 'aside']):
-                tag.decompose()
-            
-            # Extraer título
-            title = soup.title.text.strip() if soup.title else ""
-            
-            # Estrategia 1: Buscar el contenido principal
-            main_content = None
-            for selector in ['article', 'main', '.content', '.post-content', '.entry-content', '#content']:
-                if not main_content:
-                    main_content = soup.select_one(selector)
-            
-            # Si encontramos contenido principal, extraer texto
-            if main_content:
-                paragraphs = main_content.find_all('p')
-                text = "\n\n".join([p.get_text().strip() for p in paragraphs if len(p.get_text().strip()) > 50])
-            else:
-                # Estrategia 2: Obtener todos los párrafos largos
-                paragraphs = soup.find_all('p')
-                text = "\n\n".join([p.get_text().strip() for p in paragraphs if len(p.get_text().strip()) > 100])
+            if response.status_code == 304 and cache is not None:
+                stored = await asyncio.to_thread(cache.cached_response, url)
+                if stored is not None:
+                    # Sin cambios en el servidor: ni descarga ni parseo (si ya estaba parseado)
+                    cache.hits['not_modified'] += 1
+                    await asyncio.to_thread(cache.touch, url)
+                    result = await _parse_with_cache(cache, url, stored['body'], stored['content_hash'], parse_pool)
+                    return result
             
-            # Si aún no tenemos texto suficiente, usar todo el texto del body
-            if len(text) < 500 and soup.body:
-                text = soup.body.get_text().strip()
-                # Limpiar espacios múltiples
-                text = re.sub(r'\s+', ' ', text)
-                # Dividir en párrafos por puntos
-                text = re.sub(r'\.', '.\n\n', text)
-            
-            # NUEVO: Limitar el tamaño del contenido (máximo 1500 palabras)
-            words = text.split()
-            if len(words) > 1500:
-                text = ' '.join(words[:1500]) + "... [Contenido truncado]"
-                logger.info(f"Contenido truncado a 1500 palabras de {len(words)} originales")
+            if response.status_code >= 400 and response.status_code not in RETRYABLE_STATUS:
+                # 4xx definitivo: reintentar no cambia el resultado
+                return {'success': False, 'error': f"HTTP {response.status_code}"}
+            response.raise_for_status()
             
-            # Extraer imágenes principales (máximo 1 para reducir tamaño)
-            images = []
-            for img in soup.find_all('img', src=True)[:1]:  # Reducido a 1 imagen
-                src = img['src']
-                # Convertir URLs relativas a absolutas
-                if src.startswith('/'):
-                    base_url = '/'.join(url.split('/')[:3])  # http(s)://domain.com
-                    src = base_url + src
-                images.append(src)
+            content_hash = ArticleHttpCache.content_hash(response.content)
+            if cache is not None:
+                if await asyncio.to_thread(cache.cached_hash, url) == content_hash:
+                    cache.hits['same_content'] += 1
+                await asyncio.to_thread(cache.store_response, url, response, content_hash)
             
-            # Verificar si tenemos suficiente contenido
-            if len(text) > 300:
-                return {
-                    'success': True,
-                    'title': title,
-                    'content': text,
-                    'images': images,
-                    'url': url
-                }
-            else:
-                logger.warning(f"Contenido extraído demasiado corto ({len(text)} caracteres) de {url}")
-                if attempt < max_retries - 1:
-                    logger.info(f"Reintentando extracción ({attempt+2}/{max_retries})...")
-                    time.sleep(2)  # Esperar antes de reintentar
-                else:
-                    return {
-                        'success': False,
-                        'content': text if text else "No se pudo extraer contenido suficiente",
-                        'error': "Contenido insuficiente"
-                    }
+            result = await _parse_with_cache(cache, url, response.content, content_hash, parse_pool)
+            if result['success']:
+                return result
+            logger.warning(f"Contenido extraído demasiado corto ({len(result.get('content', ''))} caracteres) de {url}")
         
-        except requests.Timeout:
+        except httpx.TimeoutException:
             logger.warning(f"Timeout al extraer contenido de {url}")
-            if attempt < max_retries - 1:
-                logger.info(f"Reintentando extracción ({attempt+2}/{max_retries})...")
-                time.sleep(2)
-            else:
-                return {
-                    'success': False,
-                    'error': "Timeout al extraer contenido"
-                }
+            result = {'success': False, 'error': "Timeout al extraer contenido"}
         
         except Exception as e:
             logger.error(f"Error extrayendo contenido de {url}: {str(e)}")
-            if attempt < max_retries - 1:
-                logger.info(f"Reintentando extracción ({attempt+2}/{max_retries})...")
-                time.sleep(2)
-            else:
-                return {
-                    'success': False,
-                    'error': str(e)
-                }
+            result = {'success': False, 'error': str(e)}
+        
+        if attempt < max_retries - 1:
+            logger.info(f"Reintentando extracción ({attempt+2}/{max_retries})...")
+            await asyncio.sleep(_backoff_delay(attempt))
     
-    return {
-        'success': False,
-        'error': "Máximo de intentos alcanzado"
-    }
+    return result
+
+async def extract_articles_async(urls: List[str], headers: Dict[str, str], max_retries: int = 3,
+                                 timeout: float = 10, use_process_pool: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Extrae varios artículos en paralelo.
+    
+    Una sesión HTTP con keep-alive compartida, límite por host y parseo de
+    HTML en el pool de procesos del módulo (BeautifulSoup es CPU y no suelta
+    el GIL), con procesos forkserver/spawn que se reutilizan entre llamadas.
+    
+    Returns:
+        Diccionario url -> resultado de extracción
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    limits = httpx.Limits(max_connections=FETCH_CONCURRENCY, max_keepalive_connections=FETCH_CONCURRENCY)
+    limiter = HostRateLimiter()
+    
+    parse_pool = _get_parse_pool() if use_process_pool and len(unique_urls) > 1 else None
+    
+    cache = None
+    try:
+        cache = await asyncio.to_thread(ArticleHttpCache)
+    except sqlite3.Error as e:
+        logger.warning(f"Cache HTTP no disponible, descargando todo: {e}")
+    
+    try:
+        async with httpx.AsyncClient(headers=headers, timeout=timeout, limits=limits, follow_redirects=True) as client:
+            results = await asyncio.gather(*(
+                fetch_article_async(client, limiter, url, max_retries, parse_pool, cache) for url in unique_urls
+            ))
+    finally:
+        if cache is not None:
+            logger.info(f"Cache HTTP: {cache.hits['not_modified']} sin cambios (304), "
+                        f"{cache.hits['same_content']} mismo contenido, {cache.hits['parsed']} parseos reutilizados")
+            await asyncio.to_thread(cache.close)
+    
+    return dict(zip(unique_urls, results))
+
+async def search_topics_async(topics: List[str], max_results: int) -> List[Dict[str, Any]]:
+    """Ejecuta search_with_fallback para todos los temas con concurrencia acotada (orden preservado)"""
+    semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+    
+    async def search_one(topic):
+        async with semaphore:
+            return await asyncio.to_thread(search_with_fallback, topic, max_results)
+    
+    return await asyncio.gather(*(search_one(topic) for topic in topics))
 
 # 3. Función principal que necesita el flujo de trabajo
 def run_news_trigger_node(output_dir="ava_seo/output/seo_json"):
@@ -419,6 +735,10 @@ def run_news_trigger_node(output_dir="ava_seo/output/seo_json"):
 # Implementación de la función patched
 def run_news_trigger_node_patched(output_dir="ava_seo/output/seo_json"):
     """Versión modificada de run_news_trigger_node que crea una subcarpeta con timestamp"""
+    return _run_sync(run_news_trigger_node_async(output_dir))
+
+async def run_news_trigger_node_async(output_dir="ava_seo/output/seo_json"):
+    """Punto de entrada para llamadores async (búsquedas y descargas sin bloquear su bucle)"""
     start_time = datetime.now()
     logger.info(f"Iniciando news_trigger_node: {start_time}")
     
@@ -437,12 +757,11 @@ def run_news_trigger_node_patched(output_dir="ava_seo/output/seo_json"):
     
     # PASO 1: Búsqueda y filtrado de noticias
     logger.info("PASO 1: Búsqueda y filtrado de noticias relevantes")
-    for topic in SEARCH_TOPICS:
-        logger.info(f"Buscando tema: {topic}")
-        
-        # Realizar búsqueda
-        search_results = search_with_fallback(topic, MAX_RESULTS_PER_TOPIC)
-        
+    
+    # Realizar búsquedas en paralelo (resultados en el orden de SEARCH_TOPICS)
+    searches = await search_topics_async(SEARCH_TOPICS, MAX_RESULTS_PER_TOPIC)
+    
+    for topic, search_results in zip(SEARCH_TOPICS, searches):
         if search_results['success']:
             # Filtrar resultados
             filtered = filter_results(search_results, topic)
@@ -463,7 +782,7 @@ def run_news_trigger_node_patched(output_dir="ava_seo/output/seo_json"):
     
     # PASO 2: Extracción de contenido completo
     logger.info("\nPASO 2: Extracción de contenido completo de artículos seleccionados")
-    enriched_topics = extract_full_content_for_topics(topics)
+    enriched_topics = await extract_full_content_for_topics_async(topics)
     
     # Mostrar resumen de extracción
     success_count = sum(1 for t in enriched_topics if t.get('full_content', {}).get('success', False))
@@ -13,7 +13,6 @@ import sys
 import time
 import logging
 import schedule
-import subprocess
 from datetime import datetime, timedelta
 import traceback
 
@@ -28,38 +27,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger("scheduler")
 
-# Ruta al script de flujo de trabajo
+# Directorio del flujo de trabajo (job_queue/seo_workflow se importan desde aquí)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-WORKFLOW_SCRIPT = os.path.join(BASE_DIR, "seo_workflow.py")
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from job_queue import get_job_runner
+
+# Tiempo máximo de espera por ejecución (segundos)
+WORKFLOW_TIMEOUT = int(os.getenv("SEO_WORKFLOW_TIMEOUT", "1800"))
 
 def run_workflow():
-    """Ejecuta el script de flujo de trabajo"""
+    """Ejecuta el flujo de trabajo en la cola del proceso y espera el resultado"""
     logger.info("Ejecutando flujo de trabajo programado...")
     
     try:
-        # Ejecutar el script como un proceso separado
-        result = subprocess.run(
-            [sys.executable, WORKFLOW_SCRIPT],
-            capture_output=True,
-            text=True,
-            check=False
-        )
+        runner = get_job_runner()
+        job = runner.submit()
         
-        # Registrar la salida
-        logger.info(f"Código de salida: {result.returncode}")
+        if not job.wait(timeout=WORKFLOW_TIMEOUT):
+            logger.error(f"Timeout del trabajo {job.id} tras {WORKFLOW_TIMEOUT}s, se solicita cancelación")
+            runner.cancel(job.id)
+            return False
         
-        if result.stdout:
-            logger.info(f"Salida estándar: {result.stdout}")
-            
-        if result.stderr:
-            logger.warning(f"Error estándar: {result.stderr}")
+        logger.info(f"Trabajo {job.id}: {job.status}")
+        if job.result:
+            for article in job.result.get("articles", []):
+                logger.info(f"Artículo generado: {article.get('title')} (imagen: {article.get('image')})")
             
-        if result.returncode == 0:
+        if job.status == "succeeded":
             logger.info("Flujo de trabajo completado correctamente")
         else:
-            logger.error(f"El flujo de trabajo falló con código {result.returncode}")
+            logger.error(f"El flujo de trabajo falló: {job.error}")
             
-        return result.returncode == 0
+        return job.status == "succeeded"
     except Exception as e:
         logger.error(f"Error ejecutando flujo de trabajo: {e}")
         logger.error(traceback.format_exc())
@@ -26,6 +26,14 @@ import re
 from PIL import Image, ImageDraw
 import hashlib
 import io
+import sys
+
+# Derivados (WebP, tamaños, JPEG para visión) compartidos con ava_bot
+AVA_BOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ava_bot")
+if AVA_BOT_DIR not in sys.path:
+    sys.path.insert(0, AVA_BOT_DIR)
+
+from image_derivatives import schedule_derivatives
 
 # Intentar importar la biblioteca Together
 try:
@@ -591,6 +599,9 @@ def save_image(image_result, article_info, output_dir=OUTPUT_DIR):
         
         logger.info(f"Imagen guardada en: {image_path}")
         
+        # Variantes WebP/tamaños en segundo plano, una sola vez
+        schedule_derivatives(image_path)
+        
         # Guardar metadatos
         metadata = {
             "image_filename": image_filename,
@@ -620,8 +631,11 @@ def save_image(image_result, article_info, output_dir=OUTPUT_DIR):
         return None
 
 # ==== FUNCIÓN PRINCIPAL DEL NODO ====
-def run_image_generator_node(output_dir=OUTPUT_DIR, article_file=None):
-    """Función principal del nodo que ejecuta todo el proceso"""
+def run_image_generator_node(output_dir=OUTPUT_DIR, article_file=None, input_dir=INPUT_DIR, image_prompt=None):
+    """
+    Función principal del nodo que ejecuta todo el proceso (rutas por argumento).
+    Con image_prompt (preparado antes, p. ej. a partir de los temas) se omite el paso 2.
+    """
     start_time = datetime.now()
     logger.info(f"Iniciando image_generator_node: {start_time}")
     
@@ -634,7 +648,7 @@ def run_image_generator_node(output_dir=OUTPUT_DIR, article_file=None):
     
     try:
         # PASO 1: Cargar el artículo más reciente
-        article_info = load_latest_article(specific_file=article_file)
+        article_info = load_latest_article(input_dir=input_dir, specific_file=article_file)
         
         if not article_info:
             logger.error("No se pudo cargar el artículo")
@@ -642,8 +656,9 @@ def run_image_generator_node(output_dir=OUTPUT_DIR, article_file=None):
             
         logger.info(f"Artículo cargado: {article_info['file_name']}")
         
-        # PASO 2: Crear prompt para la imagen
-        image_prompt = create_image_prompt(article_info["article_data"])
+        # PASO 2: Crear prompt para la imagen (si no vino ya preparado)
+        if not image_prompt:
+            image_prompt = create_image_prompt(article_info["article_data"])
         
         if not image_prompt:
             logger.error("No se pudo generar el prompt para la imagen")
@@ -7,9 +7,16 @@ seo_workflow.py - Flujo de trabajo unificado para el sistema SEO implementado co
 Este script implementa un flujo de trabajo como grafo dirigido donde:
 1. seo_node.py: Extrae noticias sobre IA de fuentes web usando Tavily
 2. content_writer_node: Genera artículos basados en las noticias
-3. image_generator_node: Crea imágenes para acompañar los artículos
+3. image_prompt_node: Prepara el prompt de la imagen a partir de los temas,
+   en paralelo con la redacción del artículo
+4. image_generator_node: Crea imágenes para acompañar los artículos
 
-El flujo de trabajo es secuencial, donde cada nodo pasa su salida al siguiente.
+El grafo se ejecuta como DAG: cada nodo corre en cuanto terminan todos sus
+predecesores, de modo que las ramas independientes (un artículo por rama cuando
+SEO_ARTICLES_PER_RUN > 1) avanzan en paralelo. La salida de cada nodo se guarda
+como checkpoint en output/checkpoints/<run_id>/ y un reintento con el mismo
+run_id (--resume) continúa desde los nodos que faltaron. De las ejecuciones
+completas solo se conservan las SEO_CHECKPOINTS_KEEP más recientes.
 Los resultados finales (imagen y artículo) se preparan para mostrar en login.html.
 """
 
@@ -23,7 +30,9 @@ import traceback
 from pathlib import Path
 import importlib.util
 import shutil
-from typing import Dict, List, Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Any, Optional
 
 # Configurar logging
 logging.basicConfig(
@@ -43,6 +52,12 @@ SEO_JSON_DIR = os.path.join(OUTPUT_DIR,"seo_json")
 ARTICULOS_DIR = os.path.join(OUTPUT_DIR,"articulos")
 STATIC_DIR = os.path.join(OUTPUT_DIR,"static")
 RESULTS_DIR = os.path.join(BASE_DIR,"results")  # Carpeta para resultados procesados
+CHECKPOINTS_DIR = os.path.join(OUTPUT_DIR,"checkpoints")  # Salida de cada nodo por ejecución
+
+# Ejecución del DAG
+DAG_MAX_WORKERS = int(os.getenv("SEO_DAG_WORKERS", "4"))  # nodos ejecutándose a la vez
+ARTICLES_PER_RUN = int(os.getenv("SEO_ARTICLES_PER_RUN", "1"))  # ramas de artículo por ejecución
+CHECKPOINTS_KEEP_COMPLETED = int(os.getenv("SEO_CHECKPOINTS_KEEP", "3"))  # ejecuciones completas que se conservan
 
 
 
@@ -57,6 +72,7 @@ class LangGraphNode:
     
     def __init__(self, name: str):
         self.name = name
+        self.run_id: Optional[str] = None  # lo asigna LangGraph.run antes de ejecutar
         self.input_data = None
         self.output_data = None
         
@@ -70,13 +86,87 @@ class LangGraphNode:
         """Implementación específica del nodo"""
         raise NotImplementedError("Cada nodo debe implementar su lógica de ejecución")
 
+class CheckpointStore:
+    """Guarda la salida de cada nodo en disco para poder reanudar una ejecución"""
+    
+    COMPLETE_MARKER = "_complete.json"
+    
+    def __init__(self, run_id: str, base_dir: str = CHECKPOINTS_DIR):
+        self.run_id = run_id
+        self.directory = os.path.join(base_dir, run_id)
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def _path(self, node_name: str) -> str:
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in node_name)
+        return os.path.join(self.directory, f"{safe_name}.json")
+    
+    def load(self, node_name: str) -> Optional[Dict]:
+        path = self._path(node_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)["output"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Checkpoint ilegible para '{node_name}', se re-ejecuta: {e}")
+            return None
+    
+    def save(self, node_name: str, output: Any) -> None:
+        # Escritura atómica: un checkpoint a medias no debe parecer válido
+        path = self._path(node_name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"node": node_name, "saved_at": datetime.now().isoformat(), "output": output},
+                      f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+    
+    def mark_complete(self) -> None:
+        with open(os.path.join(self.directory, self.COMPLETE_MARKER), 'w', encoding='utf-8') as f:
+            json.dump({"completed_at": datetime.now().isoformat()}, f)
+    
+    @classmethod
+    def prune_completed(cls, keep: int = CHECKPOINTS_KEEP_COMPLETED, base_dir: str = CHECKPOINTS_DIR) -> int:
+        """Borra los checkpoints de ejecuciones terminadas salvo las `keep` más recientes"""
+        if not os.path.isdir(base_dir):
+            return 0
+        completed = []
+        for run_id in os.listdir(base_dir):
+            marker = os.path.join(base_dir, run_id, cls.COMPLETE_MARKER)
+            if os.path.exists(marker):
+                completed.append((os.path.getmtime(marker), run_id))
+        completed.sort(reverse=True)
+        
+        removed = 0
+        for _, run_id in completed[max(0, keep):]:
+            try:
+                shutil.rmtree(os.path.join(base_dir, run_id))
+                removed += 1
+            except OSError as e:
+                logger.warning(f"No se pudo borrar el checkpoint {run_id}: {e}")
+        if removed:
+            logger.info(f"Checkpoints de {removed} ejecuciones completas eliminados")
+        return removed
+    
+    @classmethod
+    def latest_incomplete_run(cls, base_dir: str = CHECKPOINTS_DIR) -> Optional[str]:
+        """run_id más reciente que no terminó (para --resume sin argumento)"""
+        if not os.path.isdir(base_dir):
+            return None
+        runs = sorted(os.listdir(base_dir), reverse=True)
+        for run_id in runs:
+            run_dir = os.path.join(base_dir, run_id)
+            if os.path.isdir(run_dir) and not os.path.exists(os.path.join(run_dir, cls.COMPLETE_MARKER)):
+                return run_id
+        return None
+
 class LangGraph:
-    """Clase que representa el grafo de flujo de trabajo"""
+    """Grafo de flujo de trabajo ejecutado como DAG con checkpoints"""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = DAG_MAX_WORKERS):
         self.nodes = {}
         self.edges = {}
         self.results = {}
+        self.max_workers = max_workers
     
     def add_node(self, node: LangGraphNode) -> None:
         """Añade un nodo al grafo"""
@@ -92,49 +182,163 @@ class LangGraph:
         else:
             logger.error(f"No se puede añadir conexión: nodo no encontrado")
     
-    def run(self, start_node: str) -> Dict:
-        """Ejecuta el grafo comenzando por el nodo especificado"""
+    def predecessors(self, node_name: str) -> List[str]:
+        return [name for name, targets in self.edges.items() if node_name in targets]
+    
+    def _reachable(self, start_node: str) -> List[str]:
+        """Nodos alcanzables desde start_node (incluido)"""
+        seen = [start_node]
+        for name in seen:
+            for target in self.edges[name]:
+                if target not in seen:
+                    seen.append(target)
+        return seen
+    
+    def _node_input(self, node_name: str, outputs: Dict[str, Any]) -> Optional[Dict]:
+        """Un predecesor: su salida tal cual. Varios: sus salidas combinadas en un solo dict"""
+        parents = [p for p in self.predecessors(node_name) if p in outputs]
+        if not parents:
+            return None
+        if len(parents) == 1:
+            return outputs[parents[0]]
+        merged = {}
+        for parent in parents:
+            if isinstance(outputs[parent], dict):
+                merged.update(outputs[parent])
+        return merged
+    
+    def _execute_node(self, node_name: str, input_data: Optional[Dict]) -> Dict:
+        logger.info(f"Ejecutando nodo: {node_name}")
+        node_start = time.time()
+        output = self.nodes[node_name].process(input_data)
+        logger.info(f"Nodo '{node_name}' completado en {time.time() - node_start:.2f} segundos")
+        return output
+    
+    def run(self, start_node: str, run_id: Optional[str] = None,
+            progress: Optional[Callable[[str, str, Dict], None]] = None,
+            cancel_event: Optional[threading.Event] = None) -> Dict:
+        """
+        Ejecuta el grafo desde start_node.
+        
+        Los nodos listos (todos sus predecesores terminados) se ejecutan en paralelo.
+        Si falla un nodo solo se omiten sus descendientes; las demás ramas siguen.
+        Con un run_id existente, los nodos con checkpoint no se vuelven a ejecutar.
+        
+        progress(evento, nodo, estado) se llama en cada cambio (started, completed,
+        resumed, failed, skipped). Si cancel_event se activa no se programan más
+        nodos: los que están en marcha terminan y quedan con checkpoint.
+        """
         if start_node not in self.nodes:
             logger.error(f"Nodo inicial '{start_node}' no encontrado en el grafo")
             return {}
         
-        logger.info(f"Iniciando ejecución del grafo desde el nodo '{start_node}'")
-        current_node = start_node
-        input_data = None
+        run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        checkpoints = CheckpointStore(run_id)
+        for node in self.nodes.values():
+            node.run_id = run_id
+        logger.info(f"Iniciando ejecución del grafo desde el nodo '{start_node}' (run_id={run_id})")
         
         # Registrar tiempo de inicio
         start_time = time.time()
         
-        while current_node:
-            logger.info(f"Ejecutando nodo: {current_node}")
-            
+        reachable = self._reachable(start_node)
+        pending = list(reachable)
+        outputs: Dict[str, Any] = {}
+        failed: Dict[str, str] = {}
+        resumed: List[str] = []
+        cancelled = False
+        running: Dict[Any, str] = {}
+        
+        def notify(event: str, node_name: str):
+            if progress is None:
+                return
             try:
-                # Ejecutar el nodo actual
-                node_instance = self.nodes[current_node]
-                output = node_instance.process(input_data)
+                progress(event, node_name, {
+                    "total_nodes": len(reachable),
+                    "completed": len(outputs),
+                    "running": [n for n in running.values()],
+                    "failed": len(failed)
+                })
+            except Exception as e:
+                logger.debug(f"Callback de progreso falló: {e}")
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="seo-dag") as pool:
+            while pending or running:
+                if cancel_event is not None and cancel_event.is_set() and pending:
+                    logger.warning(f"Ejecución {run_id} cancelada: {len(pending)} nodos sin programar")
+                    for node_name in pending:
+                        failed[node_name] = "cancelado"
+                    pending = []
+                    cancelled = True
                 
-                # Guardar el resultado
-                self.results[current_node] = output
+                # Programar todo lo que ya tiene sus dependencias resueltas
+                progressed = False
+                for node_name in list(pending):
+                    parents = [p for p in self.predecessors(node_name) if p in reachable]
+                    if any(p in failed for p in parents):
+                        pending.remove(node_name)
+                        progressed = True
+                        failed[node_name] = "omitido: falló un nodo previo"
+                        logger.warning(f"Nodo '{node_name}' omitido por fallo en un nodo previo")
+                        notify("skipped", node_name)
+                        continue
+                    if not all(p in outputs for p in parents):
+                        continue
+                    
+                    pending.remove(node_name)
+                    progressed = True
+                    checkpoint = checkpoints.load(node_name)
+                    if checkpoint is not None:
+                        logger.info(f"Nodo '{node_name}' reanudado desde checkpoint")
+                        outputs[node_name] = checkpoint
+                        resumed.append(node_name)
+                        notify("resumed", node_name)
+                        continue
+                    
+                    future = pool.submit(self._execute_node, node_name, self._node_input(node_name, outputs))
+                    running[future] = node_name
+                    notify("started", node_name)
                 
-                # Preparar para el siguiente nodo
-                next_nodes = self.edges[current_node]
-                if next_nodes:
-                    current_node = next_nodes[0]  # Tomar el primer nodo conectado
-                    input_data = output  # La salida de este nodo es la entrada del siguiente
-                else:
-                    # No hay más nodos conectados, terminar
-                    current_node = None
-            except Exception as e:
-                logger.error(f"Error ejecutando nodo '{current_node}': {str(e)}")
-                logger.error(traceback.format_exc())
-                break
+                if not running:
+                    if progressed or not pending:
+                        # Los checkpoints pudieron desbloquear más nodos (o se canceló lo pendiente)
+                        continue
+                    logger.error(f"Nodos con dependencias imposibles (¿ciclo?): {', '.join(pending)}")
+                    for node_name in pending:
+                        failed[node_name] = "dependencias sin resolver"
+                    break
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node_name = running.pop(future)
+                    try:
+                        outputs[node_name] = future.result()
+                        checkpoints.save(node_name, outputs[node_name])
+                        notify("completed", node_name)
+                    except Exception as e:
+                        logger.error(f"Error ejecutando nodo '{node_name}': {str(e)}")
+                        logger.error(traceback.format_exc())
+                        failed[node_name] = str(e)
+                        notify("failed", node_name)
+        
+        self.results.update(outputs)
         
         # Calcular tiempo total
         execution_time = time.time() - start_time
         logger.info(f"Ejecución del grafo completada en {execution_time:.2f} segundos")
         
+        if failed:
+            logger.warning(f"Nodos sin completar: {', '.join(failed)}. Reintentar con --resume {run_id}")
+        else:
+            checkpoints.mark_complete()
+            CheckpointStore.prune_completed()
+        
         # Añadir tiempo de ejecución a los resultados
         self.results["execution_time"] = execution_time
+        self.results["run_id"] = run_id
+        self.results["failed_nodes"] = failed
+        self.results["resumed_nodes"] = resumed
+        self.results["cancelled"] = cancelled
         
         return self.results
 
@@ -173,11 +377,48 @@ def import_module_from_file(file_path, module_name):
         logger.error(traceback.format_exc())
         return None
 
+_node_modules: Dict[str, Any] = {}
+_node_modules_lock = threading.Lock()
+
+def load_node_module(file_path, module_name):
+    """
+    Importa el módulo de un nodo una sola vez por proceso.
+    
+    Las ramas del DAG y los trabajos de la cola comparten el módulo, así que no
+    se tocan sus globales: las rutas se pasan como argumentos en cada llamada.
+    """
+    with _node_modules_lock:
+        module = _node_modules.get(module_name)
+        if module is None:
+            module = import_module_from_file(file_path, module_name)
+            if module is None:
+                return None
+            _node_modules[module_name] = module
+        return module
+
+def shard_topics(topics: List[Dict], shard: int, shards: int) -> List[Dict]:
+    """
+    Temas de la rama shard: temas[shard::n] con n = min(shards, len(temas)).
+    
+    Si seo_node devuelve menos temas que ramas, las ramas sobrantes quedan vacías
+    (se omiten) en lugar de fallar, y los temas se reparten entre las demás.
+    """
+    active = min(shards, len(topics))
+    if shard >= active:
+        return []
+    return topics[shard::active]
+
+def max_topics_per_run() -> Optional[int]:
+    """Temas que devuelve como máximo seo_node (MAX_TOPICS_TO_RETURN)"""
+    seo_module = load_node_module(os.path.join(BASE_DIR, "nodes", "seo_nodes", "seo_node.py"), "seo_node")
+    return getattr(seo_module, "MAX_TOPICS_TO_RETURN", None) if seo_module else None
+
 class SeoNode(LangGraphNode):
     """Nodo para la extracción de noticias y temas relevantes usando Tavily"""
     
-    def __init__(self):
+    def __init__(self, seo_json_dir: str = SEO_JSON_DIR):
         super().__init__("seo_node.py")
+        self.seo_json_dir = seo_json_dir
     
     def _execute(self) -> Dict:
         """Ejecuta el nodo de búsqueda de noticias"""
@@ -193,7 +434,7 @@ class SeoNode(LangGraphNode):
                 raise FileNotFoundError(f"El archivo seo_node.py no existe en {seo_node_py}")
             
             # Importar y ejecutar el nodo de búsqueda
-            seo_module = import_module_from_file(seo_node_py, "seo_node")
+            seo_module = load_node_module(seo_node_py, "seo_node")
             
             if not seo_module:
                 logger.error("No se pudo importar el módulo seo_node")
@@ -202,11 +443,11 @@ class SeoNode(LangGraphNode):
             # Verificar si el módulo tiene la función run_news_trigger_node
             if hasattr(seo_module, "run_news_trigger_node"):
                 # Ejecutar el nodo y obtener los resultados
-                topics = seo_module.run_news_trigger_node(SEO_JSON_DIR)
+                topics = seo_module.run_news_trigger_node(self.seo_json_dir)
                 
                 # Guardar los resultados en un formato adecuado para el siguiente nodo
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                topics_file = os.path.join(SEO_JSON_DIR, f"topics_full_{timestamp}.json")
+                topics_file = os.path.join(self.seo_json_dir, f"topics_full_{timestamp}.json")
                 
                 with open(topics_file, 'w', encoding='utf-8') as f:
                     json.dump({
@@ -232,8 +473,25 @@ class SeoNode(LangGraphNode):
 class ContentWriterNode(LangGraphNode):
     """Nodo para la generación de contenido basado en los temas"""
     
-    def __init__(self):
-        super().__init__("content_writer_node")
+    def __init__(self, shard: int = 0, shards: int = 1,
+                 seo_json_dir: str = SEO_JSON_DIR, articulos_dir: str = ARTICULOS_DIR):
+        # Con varias ramas cada nodo escribe un artículo con su parte de los temas
+        super().__init__("content_writer_node" if shards == 1 else f"content_writer_node_{shard + 1}")
+        self.shard = shard
+        self.shards = shards
+        self.seo_json_dir = seo_json_dir
+        self.articulos_dir = articulos_dir
+    
+    def _shard_topics_file(self, topics_file: str) -> str:
+        """Archivo con los temas de esta rama (ver shard_topics)"""
+        topics = shard_topics(self.input_data["topics"], self.shard, self.shards)
+        
+        # Prefijo shard_ para que la búsqueda de 'topics_full_*' más reciente no lo tome
+        shard_file = os.path.join(self.seo_json_dir, f"shard{self.shard + 1}_{os.path.basename(topics_file)}")
+        with open(shard_file, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": datetime.now().isoformat(), "topics": topics}, f, ensure_ascii=False, indent=2)
+        logger.info(f"Rama {self.shard + 1}/{self.shards}: {len(topics)} temas en {shard_file}")
+        return shard_file
     
     def _execute(self) -> Dict:
         """Ejecuta el nodo de generación de contenido"""
@@ -243,61 +501,48 @@ class ContentWriterNode(LangGraphNode):
             logger.error("No se recibieron temas válidos del nodo SEO")
             raise ValueError("Datos de entrada inválidos para el nodo de contenido")
         
+        if self.shards > 1 and not shard_topics(self.input_data["topics"], self.shard, self.shards):
+            logger.info(f"Rama {self.shard + 1}/{self.shards} sin temas: se omite")
+            return {"seo_result": self.input_data, "content_result": None, "skipped": "sin temas"}
+        
         try:
             # Importar y ejecutar el nodo de contenido
             content_node_path = os.path.join(BASE_DIR, "content_node", "content_writer_node.py")
-            content_module = import_module_from_file(content_node_path, "content_writer_node")
+            content_module = load_node_module(content_node_path, "content_writer_node")
             
             if not content_module:
                 logger.error("No se pudo importar el módulo content_writer_node")
                 raise ImportError("No se pudo importar el módulo content_writer_node")
             
-            # Modificar la variable INPUT_DIR en el módulo para que apunte a la ruta correcta
-            if hasattr(content_module, "INPUT_DIR"):
-                # Guardar el valor original para restaurarlo después
-                original_input_dir = content_module.INPUT_DIR
-                # Establecer la ruta correcta (directamente al directorio seo_json)
-                content_module.INPUT_DIR = SEO_JSON_DIR
-                logger.info(f"Ajustada ruta de entrada en content_writer_node: {content_module.INPUT_DIR}")
-                
-                # Establecer la ruta de salida correcta (directamente al directorio articulos)
-                if hasattr(content_module, "OUTPUT_DIR"):
-                    original_output_dir = content_module.OUTPUT_DIR
-                    content_module.OUTPUT_DIR = ARTICULOS_DIR
-                    logger.info(f"Ajustada ruta de salida en content_writer_node: {content_module.OUTPUT_DIR}")
-                
             # Verificar si el módulo tiene la función run_content_writer_node
             if hasattr(content_module, "run_content_writer_node"):
                 # Pasar explícitamente el archivo de temas generado por el nodo anterior
                 topics_file = self.input_data.get("topics_file")
+                if self.shards > 1 and topics_file:
+                    topics_file = self._shard_topics_file(topics_file)
                 
                 # Verificar que el archivo existe
                 if topics_file and os.path.exists(topics_file):
                     logger.info(f"Usando archivo de temas: {topics_file}")
                     
                     # Ejecutar el nodo con los temas del nodo anterior, pasando el archivo específico y la ruta de salida
-                    result = content_module.run_content_writer_node(output_dir=ARTICULOS_DIR, topics_file=topics_file)
+                    result = content_module.run_content_writer_node(output_dir=self.articulos_dir, topics_file=topics_file,
+                                                                    input_dir=self.seo_json_dir)
                 else:
                     logger.warning(f"Archivo de temas no encontrado: {topics_file}")
-                    # Buscar el archivo más reciente en el directorio SEO_JSON_DIR
-                    json_files = [f for f in os.listdir(SEO_JSON_DIR) if f.startswith('topics_full_') and f.endswith('.json')]
+                    # Buscar el archivo más reciente en el directorio de temas
+                    json_files = [f for f in os.listdir(self.seo_json_dir) if f.startswith('topics_full_') and f.endswith('.json')]
                     if json_files:
                         latest_file = sorted(json_files, reverse=True)[0]
-                        latest_file_path = os.path.join(SEO_JSON_DIR, latest_file)
+                        latest_file_path = os.path.join(self.seo_json_dir, latest_file)
                         logger.info(f"Usando el archivo de temas más reciente: {latest_file_path}")
-                        result = content_module.run_content_writer_node(output_dir=ARTICULOS_DIR, topics_file=latest_file_path)
+                        result = content_module.run_content_writer_node(output_dir=self.articulos_dir, topics_file=latest_file_path,
+                                                                        input_dir=self.seo_json_dir)
                     else:
                         logger.error("No se encontraron archivos de temas en el directorio de salida")
                         # Intentar ejecutar sin archivo específico pero con la ruta de salida correcta
-                        result = content_module.run_content_writer_node(output_dir=ARTICULOS_DIR)
-                
-                # Restaurar el valor original de INPUT_DIR si lo modificamos
-                if hasattr(content_module, "INPUT_DIR") and 'original_input_dir' in locals():
-                    content_module.INPUT_DIR = original_input_dir
-                
-                # Restaurar el valor original de OUTPUT_DIR si lo modificamos
-                if hasattr(content_module, "OUTPUT_DIR") and 'original_output_dir' in locals():
-                    content_module.OUTPUT_DIR = original_output_dir
+                        result = content_module.run_content_writer_node(output_dir=self.articulos_dir,
+                                                                        input_dir=self.seo_json_dir)
                 
                 if not result:
                     logger.error("El nodo de contenido no produjo resultados")
@@ -306,7 +551,7 @@ class ContentWriterNode(LangGraphNode):
                 # Cargar el artículo generado para pasarlo al siguiente nodo
                 json_file = result.get("json_file")
                 if json_file:
-                    article_path = os.path.join(ARTICULOS_DIR, json_file)
+                    article_path = os.path.join(self.articulos_dir, json_file)
                     try:
                         with open(article_path, 'r', encoding='utf-8') as f:
                             article_data = json.load(f)
@@ -345,16 +590,62 @@ class ContentWriterNode(LangGraphNode):
             logger.error(traceback.format_exc())
             raise
 
+class ImagePromptNode(LangGraphNode):
+    """Prompt de la imagen a partir de los temas de la rama (no espera al artículo)"""
+    
+    def __init__(self, shard: int = 0, shards: int = 1):
+        super().__init__("image_prompt_node" if shards == 1 else f"image_prompt_node_{shard + 1}")
+        self.shard = shard
+        self.shards = shards
+    
+    def _execute(self) -> Dict:
+        """Genera el prompt con los mismos temas que recibe el escritor de la rama"""
+        logger.info("Ejecutando nodo de prompt de imagen (image_prompt_node)...")
+        
+        topics = shard_topics((self.input_data or {}).get("topics") or [], self.shard, self.shards)
+        if not topics:
+            logger.info(f"Rama {self.shard + 1}/{self.shards} sin temas: sin prompt de imagen")
+            return {"image_prompt": None}
+        
+        try:
+            image_node_path = os.path.join(BASE_DIR, "seo_image/image_generator_node.py")
+            image_module = load_node_module(image_node_path, "image_generator_node")
+            if not image_module:
+                raise ImportError("No se pudo importar el módulo image_generator_node")
+            
+            # Título, palabras clave y contenido de las noticias en el formato de un artículo
+            article_data = {
+                "title": topics[0].get("title", ""),
+                "keywords": list(dict.fromkeys(kw for topic in topics for kw in topic.get("keywords", []))),
+                "content": "\n\n".join(
+                    (topic.get("full_content") or {}).get("content") or topic.get("title", "") for topic in topics
+                )
+            }
+            image_prompt = image_module.create_image_prompt(article_data)
+            logger.info("Nodo de prompt de imagen completado")
+            return {"image_prompt": image_prompt}
+        except Exception as e:
+            # Sin prompt previo el nodo de imágenes lo genera con el artículo, como antes
+            logger.warning(f"No se pudo preparar el prompt de imagen desde los temas: {e}")
+            return {"image_prompt": None}
+
 class ImageGeneratorNode(LangGraphNode):
     """Nodo para la generación de imágenes basadas en el artículo"""
     
-    def __init__(self):
-        super().__init__("image_generator_node")
+    def __init__(self, name: str = "image_generator_node",
+                 articulos_dir: str = ARTICULOS_DIR, static_dir: str = STATIC_DIR):
+        super().__init__(name)
+        self.articulos_dir = articulos_dir
+        self.static_dir = static_dir
     
     def _execute(self) -> Dict:
         """Ejecuta el nodo de generación de imágenes"""
         logger.info("Ejecutando nodo de generación de imágenes (image_generator_node)...")
         
+        if self.input_data and self.input_data.get("skipped"):
+            return {"seo_result": self.input_data.get("seo_result"), "content_result": None,
+                    "image_result": None, "skipped": self.input_data["skipped"]}
+        
         if not self.input_data or "content_result" not in self.input_data:
             logger.error("No se recibieron datos de artículo válidos del nodo de contenido")
             raise ValueError("Datos de entrada inválidos para el nodo de imágenes")
@@ -362,47 +653,33 @@ class ImageGeneratorNode(LangGraphNode):
         try:
             # Importar y ejecutar el nodo de imágenes
             image_node_path = os.path.join(BASE_DIR, "seo_image/image_generator_node.py")
-            image_module = import_module_from_file(image_node_path, "image_generator_node")
+            image_module = load_node_module(image_node_path, "image_generator_node")
             
             if not image_module:
                 logger.error("No se pudo importar el módulo image_generator_node")
                 raise ImportError("No se pudo importar el módulo image_generator_node")
             
-            # Ajustar la ruta de entrada en el módulo de imágenes si es necesario
-            if hasattr(image_module, "INPUT_DIR"):
-                original_input_dir = image_module.INPUT_DIR
-                image_module.INPUT_DIR = ARTICULOS_DIR
-                logger.info(f"Ajustada ruta de entrada en image_generator_node: {image_module.INPUT_DIR}")
-            
-            # Ajustar la ruta de salida en el módulo de imágenes si es necesario
-            if hasattr(image_module, "OUTPUT_DIR"):
-                original_output_dir = image_module.OUTPUT_DIR
-                image_module.OUTPUT_DIR = STATIC_DIR
-                logger.info(f"Ajustada ruta de salida en image_generator_node: {image_module.OUTPUT_DIR}")
-            
             # Verificar si el módulo tiene la función run_image_generator_node
             if hasattr(image_module, "run_image_generator_node"):
                 # Obtener la ruta del archivo del artículo generado por el nodo anterior
                 content_result = self.input_data.get("content_result", {})
                 article_path = content_result.get("article_path")
+                # Prompt preparado por image_prompt_node mientras se escribía el artículo
+                image_prompt = self.input_data.get("image_prompt")
                 
                 # Verificar que el archivo existe
                 if article_path and os.path.exists(article_path):
                     logger.info(f"Usando archivo de artículo: {article_path}")
                     # Ejecutar el nodo con el artículo del nodo anterior y la ruta de salida correcta
-                    result = image_module.run_image_generator_node(output_dir=STATIC_DIR, article_file=article_path)
+                    result = image_module.run_image_generator_node(output_dir=self.static_dir, article_file=article_path,
+                                                                   input_dir=self.articulos_dir,
+                                                                   image_prompt=image_prompt)
                 else:
                     logger.warning(f"Archivo de artículo no encontrado: {article_path}")
                     # Intentar ejecutar sin archivo específico pero con la ruta de salida correcta
-                    result = image_module.run_image_generator_node(output_dir=STATIC_DIR)
-                
-                # Restaurar el valor original de INPUT_DIR si lo modificamos
-                if hasattr(image_module, "INPUT_DIR") and 'original_input_dir' in locals():
-                    image_module.INPUT_DIR = original_input_dir
-                
-                # Restaurar el valor original de OUTPUT_DIR si lo modificamos
-                if hasattr(image_module, "OUTPUT_DIR") and 'original_output_dir' in locals():
-                    image_module.OUTPUT_DIR = original_output_dir
+                    result = image_module.run_image_generator_node(output_dir=self.static_dir,
+                                                                   input_dir=self.articulos_dir,
+                                                                   image_prompt=image_prompt)
                 
                 if not result:
                     logger.error("El nodo de imágenes no produjo resultados")
@@ -436,8 +713,11 @@ class ImageGeneratorNode(LangGraphNode):
 class ResultsFormatterNode(LangGraphNode):
     """Nodo para formatear los resultados para mostrar en login.html"""
     
-    def __init__(self):
-        super().__init__("results_formatter_node")
+    def __init__(self, name: str = "results_formatter_node",
+                 articulos_dir: str = ARTICULOS_DIR, static_dir: str = STATIC_DIR):
+        super().__init__(name)
+        self.articulos_dir = articulos_dir
+        self.static_dir = static_dir
     
     def _execute(self) -> Dict:
         """Formatea los resultados para mostrar en login.html"""
@@ -447,6 +727,9 @@ class ResultsFormatterNode(LangGraphNode):
             logger.error("No se recibieron datos de los nodos anteriores")
             raise ValueError("Datos de entrada inválidos para el nodo de formateo")
         
+        if self.input_data.get("skipped"):
+            return {"skipped": self.input_data["skipped"]}
+        
         try:
             # Extraer datos de los nodos anteriores
             seo_result = self.input_data.get("seo_result", {})
@@ -455,7 +738,8 @@ class ResultsFormatterNode(LangGraphNode):
             
             # Preparar datos para guardar
             timestamp = datetime.now().isoformat()
-            run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+            # Mismo run_id que la ejecución del DAG (carpeta de checkpoints, trabajo de la cola)
+            run_id = self.run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
             
             # Extraer información relevante
             article_data = {}
@@ -467,7 +751,7 @@ class ResultsFormatterNode(LangGraphNode):
                     article_data = content_result["article_data"]
                 elif "json_file" in content_result:
                     article_json_file = content_result.get("json_file")
-                    article_path = os.path.join(ARTICULOS_DIR, article_json_file)
+                    article_path = os.path.join(self.articulos_dir, article_json_file)
                     logger.info(f"Procesando artículo desde: {article_path}")
                     try:
                         with open(article_path, 'r', encoding='utf-8') as f:
@@ -502,7 +786,7 @@ class ResultsFormatterNode(LangGraphNode):
             else:
                 logger.warning(f"No se recibió un resultado válido del nodo de imágenes")
                 # Usar una imagen predeterminada si no hay imagen
-                default_image = os.path.join(STATIC_DIR, "default_image.png")
+                default_image = os.path.join(self.static_dir, "default_image.png")
                 if os.path.exists(default_image):
                     image_data = {
                         "original_path": default_image,
@@ -558,55 +842,99 @@ class ResultsFormatterNode(LangGraphNode):
 
 # ===== FUNCIÓN PRINCIPAL PARA EJECUTAR EL GRAFO =====
 
-def run_workflow():
-    """Inicia el flujo de trabajo como un grafo LangGraph"""
-    start_time = datetime.now()
-    logger.info("Iniciando flujo de trabajo SEO como grafo LangGraph...")
+def build_workflow_graph(articles: int = ARTICLES_PER_RUN, output_dir: str = OUTPUT_DIR) -> LangGraph:
+    """
+    seo_node.py -> N x (content_writer_node | image_prompt_node) -> image_generator_node -> results_formatter_node
     
-    try:
-        # Crear directorio de resultados si no existe
-        os.makedirs(RESULTS_DIR, exist_ok=True)
-        
-        # Crear objetos de grafo y nodos
-        graph = LangGraph()
-        
-        # 1. Nodo de búsqueda de noticias
-        seo_node_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
-                                     "nodes", "seo_nodes", "seo_node.py")
-        
-        seo_module = import_module_from_file(seo_node_path, "seo_node")
-        seo_node = SeoNode()  # Usar nuestro propio nodo SeoNode en lugar de NewsTriggerNode
-        graph.add_node(seo_node)
-        logger.info("Nodo 'seo_node.py' añadido al grafo")
+    Cada artículo es una rama independiente. Dentro de la rama, el prompt de la imagen
+    solo depende de los temas y se prepara mientras se escribe el artículo; la imagen
+    espera a ambos. El formateador depende del escritor y de la imagen (recibe ambas
+    salidas combinadas).
+    Las rutas de cada etapa cuelgan de output_dir y se pasan a los nodos como argumentos.
+    """
+    seo_json_dir = os.path.join(output_dir, "seo_json")
+    articulos_dir = os.path.join(output_dir, "articulos")
+    static_dir = os.path.join(output_dir, "static")
+    
+    graph = LangGraph()
+    
+    # 1. Nodo de búsqueda de noticias
+    graph.add_node(SeoNode(seo_json_dir=seo_json_dir))
+    
+    articles = max(1, articles)
+    for shard in range(articles):
+        suffix = "" if articles == 1 else f"_{shard + 1}"
         
         # 2. Nodo de generación de contenido
-        content_writer_node = ContentWriterNode()
-        graph.add_node(content_writer_node)
-        logger.info("Nodo 'content_writer_node' añadido al grafo")
+        writer = ContentWriterNode(shard=shard, shards=articles,
+                                   seo_json_dir=seo_json_dir, articulos_dir=articulos_dir)
+        graph.add_node(writer)
         
-        # 3. Nodo de generación de imágenes
-        image_generator_node = ImageGeneratorNode()
-        graph.add_node(image_generator_node)
-        logger.info("Nodo 'image_generator_node' añadido al grafo")
+        # 3. Prompt de la imagen desde los temas (en paralelo con el escritor)
+        prompt_node = ImagePromptNode(shard=shard, shards=articles)
+        graph.add_node(prompt_node)
         
-        # 4. Nodo de formateo de resultados
-        results_formatter_node = ResultsFormatterNode()
-        graph.add_node(results_formatter_node)
-        logger.info("Nodo 'results_formatter_node' añadido al grafo")
+        # 4. Nodo de generación de imágenes
+        image_node = ImageGeneratorNode(f"image_generator_node{suffix}",
+                                        articulos_dir=articulos_dir, static_dir=static_dir)
+        graph.add_node(image_node)
+        
+        # 5. Nodo de formateo de resultados
+        formatter = ResultsFormatterNode(f"results_formatter_node{suffix}",
+                                         articulos_dir=articulos_dir, static_dir=static_dir)
+        graph.add_node(formatter)
         
         # Conectar nodos
-        graph.add_edge("seo_node.py", "content_writer_node")
-        logger.info("Conexión añadida: seo_node.py -> content_writer_node")
+        graph.add_edge("seo_node.py", writer.name)
+        graph.add_edge("seo_node.py", prompt_node.name)
+        graph.add_edge(writer.name, image_node.name)
+        graph.add_edge(prompt_node.name, image_node.name)
+        graph.add_edge(writer.name, formatter.name)
+        graph.add_edge(image_node.name, formatter.name)
+    
+    return graph
+
+def run_workflow(run_id: Optional[str] = None, resume: bool = False,
+                 articles: Optional[int] = None, output_dir: str = OUTPUT_DIR,
+                 progress: Optional[Callable[[str, str, Dict], None]] = None,
+                 cancel_event: Optional[threading.Event] = None):
+    """
+    Inicia el flujo de trabajo como un grafo LangGraph
+    
+    Args:
+        run_id: Identificador de la ejecución (carpeta de checkpoints)
+        resume: Sin run_id, reanuda la última ejecución que no terminó
+        articles: Ramas de artículo (por defecto SEO_ARTICLES_PER_RUN)
+        output_dir: Raíz de seo_json/, articulos/ y static/
+        progress: Callback de progreso por nodo (ver LangGraph.run)
+        cancel_event: Evento para cancelar entre nodos
+    """
+    start_time = datetime.now()
+    logger.info("Iniciando flujo de trabajo SEO como grafo LangGraph...")
+    
+    try:
+        # Crear directorio de resultados si no existe
+        os.makedirs(RESULTS_DIR, exist_ok=True)
         
-        graph.add_edge("content_writer_node", "image_generator_node")
-        logger.info("Conexión añadida: content_writer_node -> image_generator_node")
+        if resume and not run_id:
+            run_id = CheckpointStore.latest_incomplete_run()
+            if run_id:
+                logger.info(f"Reanudando ejecución incompleta: {run_id}")
+            else:
+                logger.info("No hay ejecuciones incompletas, se inicia una nueva")
         
-        graph.add_edge("image_generator_node", "results_formatter_node")
-        logger.info("Conexión añadida: image_generator_node -> results_formatter_node")
+        # Crear objetos de grafo y nodos (no más ramas que temas puede devolver seo_node)
+        articles = max(1, articles or ARTICLES_PER_RUN)
+        max_topics = max_topics_per_run()
+        if max_topics and articles > max_topics:
+            logger.warning(f"{articles} artículos pedidos pero seo_node devuelve como máximo {max_topics} temas: "
+                           f"se usan {max_topics} ramas")
+            articles = max_topics
+        graph = build_workflow_graph(articles, output_dir=output_dir)
+        logger.info(f"Grafo con {len(graph.nodes)} nodos ({articles} artículo(s) en paralelo)")
         
         # Ejecutar el grafo
-        logger.info("Iniciando ejecución del grafo desde el nodo 'seo_node.py'")
-        result = graph.run("seo_node.py")
+        result = graph.run("seo_node.py", run_id=run_id, progress=progress, cancel_event=cancel_event)
         
         # Calcular tiempo de ejecución
         end_time = datetime.now()
@@ -655,18 +983,37 @@ def run_workflow():
 
 if __name__ == "__main__":
     try:
-        result = run_workflow()
+        # --resume [run_id]: continuar una ejecución desde sus checkpoints
+        resume_run_id = None
+        resume = "--resume" in sys.argv
+        if resume:
+            position = sys.argv.index("--resume")
+            if position + 1 < len(sys.argv) and not sys.argv[position + 1].startswith("--"):
+                resume_run_id = sys.argv[position + 1]
+        
+        result = run_workflow(run_id=resume_run_id, resume=resume)
         
-        if result:
+        if result and result.get("failed_nodes"):
+            print(f"\n--- FLUJO DE TRABAJO LANGGRAPH INCOMPLETO ---")
+            print(f"Nodos sin completar: {', '.join(result['failed_nodes'])}")
+            print(f"Reanudar con: python seo_workflow.py --resume {result.get('run_id')}")
+            sys.exit(1)
+        elif result:
             print(f"\n--- FLUJO DE TRABAJO LANGGRAPH COMPLETADO ---")
             print(f"Tiempo de ejecución: {result.get('execution_time', 0):.2f} segundos")
             
-            if "content_result" in result and result["content_result"]:
-                print(f"Artículo generado: {result['content_result'].get('title', 'Sin título')}")
+            # Los resultados van por nombre de nodo: uno por rama de artículo
+            for name, output in result.items():
+                if not name.startswith("results_formatter_node") or not isinstance(output, dict):
+                    continue
+                if output.get("skipped"):
+                    continue
+                display = output.get("display_result") or {}
+                print(f"Artículo generado: {(display.get('article') or {}).get('title', 'Sin título')}")
+                image_result = output.get("image_result") or {}
+                print(f"Imagen generada: {image_result.get('image_path', 'N/A')}")
             
-            if "image_result" in result and result["image_result"]:
-                print(f"Imagen generada: {result['image_result'].get('image_path', 'N/A')}")
-                
+
             print(f"Resultados preparados para mostrar en login.html")
             sys.exit(0)
         else:
@@ -155,6 +155,11 @@ document.addEventListener('DOMContentLoaded', function() {
             this.isTyping = true;
             
             try {
+                // ✅ INTENTAR STREAMING PRIMERO (tokens en vivo)
+                if (await this.sendMessageStream(message)) {
+                    return;
+                }
+                
                 console.log('📤 Enviando al backend...');
                 
                 const response = await fetch('/api/chat/message', {
@@ -268,6 +273,126 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         }
 
+        // ✅ STREAMING SSE: muestra los tokens a medida que AVA responde
+        // Retorna false si el stream no está disponible (se usa /api/chat/message)
+        async sendMessageStream(message) {
+            if (!window.ReadableStream || !window.TextDecoder) {
+                return false;
+            }
+            
+            let response;
+            try {
+                response = await fetch('/api/chat/stream', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'Accept': 'text/event-stream'
+                    },
+                    body: JSON.stringify({ message: message, unlimited: false })
+                });
+            } catch (error) {
+                console.warn('⚠️ Stream no disponible:', error);
+                return false;
+            }
+            
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
+                console.warn('⚠️ Stream no disponible, status:', response.status);
+                return false;
+            }
+            
+            const chatMessages = document.getElementById('chatMessages');
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let streamedText = '';
+            let messageContent = null;
+            let finished = false;
+            
+            const renderToken = (text) => {
+                if (!messageContent) {
+                    this.hideTypingIndicator();
+                    const messageElement = document.createElement('div');
+                    messageElement.className = 'message assistant';
+                    messageElement.innerHTML = '<div class="message-content"></div>';
+                    chatMessages.appendChild(messageElement);
+                    messageContent = messageElement.querySelector('.message-content');
+                }
+                streamedText += text;
+                messageContent.textContent = streamedText;
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            };
+            
+            const handleEvent = (eventType, data) => {
+                if (eventType === 'token') {
+                    renderToken(data.text || '');
+                } else if (eventType === 'reset') {
+                    // El texto transmitido era previo a una herramienta: descartarlo
+                    streamedText = '';
+                    if (messageContent) {
+                        messageContent.parentElement.remove();
+                        messageContent = null;
+                    }
+                    this.showTypingIndicator();
+                } else if (eventType === 'tool') {
+                    if (data.message) {
+                        console.log('🔧', data.message);
+                    }
+                } else if (eventType === 'done') {
+                    finished = true;
+                    this.hideTypingIndicator();
+                    if (data.image_generated && data.image_url && data.image_filename) {
+                        if (messageContent) {
+                            messageContent.parentElement.remove();
+                        }
+                        this.addMessageWithImage(data.response || '', data.image_url, data.image_filename);
+                    } else if (messageContent) {
+                        messageContent.textContent = data.response || streamedText;
+                    } else {
+                        this.addMessage(data.response || 'Respuesta recibida sin contenido', 'assistant');
+                    }
+                } else if (eventType === 'error') {
+                    finished = true;
+                    this.hideTypingIndicator();
+                    this.addMessage(`❌ ${data.message || 'Error desconocido del servidor'}`, 'assistant');
+                }
+            };
+            
+            try {
+                while (!finished) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    
+                    buffer += decoder.decode(value, { stream: true });
+                    let boundary;
+                    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                        const rawEvent = buffer.slice(0, boundary);
+                        buffer = buffer.slice(boundary + 2);
+                        
+                        let eventType = 'message';
+                        const dataLines = [];
+                        rawEvent.split('\n').forEach(line => {
+                            if (line.startsWith('event:')) eventType = line.slice(6).trim();
+                            else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                        });
+                        if (dataLines.length) {
+                            handleEvent(eventType, JSON.parse(dataLines.join('\n')));
+                        }
+                    }
+                }
+            } catch (error) {
+                console.error('❌ Error leyendo stream:', error);
+            } finally {
+                this.isTyping = false;
+                this.hideTypingIndicator();
+            }
+            
+            if (!finished) {
+                this.addMessage(streamedText ? '⚠️ Respuesta interrumpida.' : '🔌 Error de conexión.', 'assistant');
+            }
+            return true;
+        }
+
         // 🔥 ACTUALIZAR FUNCIÓN handleImageUpload
         async handleImageUpload(file) {
             console.log('📸 Imagen seleccionada:', file.name);
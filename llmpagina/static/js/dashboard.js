@@ -32,6 +32,11 @@ if (window.dashboardInitialized) {
     let currentPage = 1;
     let isLoading = false;
     let authChecked = false;
+    
+    // ✅ CURSORES POR PÁGINA (keyset): la página siguiente no recorre las anteriores
+    let pageCursors = {};
+    let cursorQuery = null;
+    let currentTotal = 0;
 
     // ✅ FUNCIÓN PRINCIPAL PARA CARGAR CONVERSACIONES
     function loadConversations(page = 1, filter = 'all', search = '') {
@@ -45,7 +50,17 @@ if (window.dashboardInitialized) {
         
         console.log(`📥 Cargando conversaciones - Página: ${page}, Filtro: ${filter}, Búsqueda: "${search}"`);
         
-        const url = `/api/conversations?page=${page}&filter=${filter}&search=${encodeURIComponent(search)}`;
+        // Los cursores solo valen para el mismo filtro y búsqueda
+        const queryKey = `${filter}|${search}`;
+        if (queryKey !== cursorQuery) {
+            pageCursors = {};
+            cursorQuery = queryKey;
+        }
+        
+        let url = `/api/conversations?page=${page}&filter=${filter}&search=${encodeURIComponent(search)}`;
+        if (pageCursors[page]) {
+            url += `&cursor=${encodeURIComponent(pageCursors[page])}`;
+        }
         
         // Mostrar indicador de carga solo si hay tabla
         const tbody = document.querySelector('.conversation-table tbody');
@@ -78,7 +93,13 @@ if (window.dashboardInitialized) {
                 });
                 
                 if (data.success && data.conversations) {
-                    displayConversations(data.conversations, data.total, page);
+                    if (data.next_cursor) {
+                        pageCursors[page + 1] = data.next_cursor;
+                    }
+                    if (data.total !== null && data.total !== undefined) {
+                        currentTotal = data.total;
+                    }
+                    displayConversations(data.conversations, currentTotal, page);
                 } else {
                     showEmptyState(data.error || 'No hay conversaciones disponibles');
                 }
@@ -1,20 +1,37 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, session
 from datetime import datetime
-import subprocess
+import json
 import logging
-import time
 import os
+import queue
 import sys
-import re
+import threading
+import uuid
 from pathlib import Path
 
+# Módulos de AVA por su nombre plano, igual que los importan ava_bot y sus workers:
+# una sola entrada en sys.path => una sola copia de cada módulo y de su estado
+AVA_BOT_DIR = str(Path(__file__).resolve().parent.parent / 'llmpagina' / 'ava_bot')
+if AVA_BOT_DIR not in sys.path:
+    sys.path.insert(0, AVA_BOT_DIR)
+
+from image_derivatives import schedule_derivatives, select_variant
+from image_registry import get_image_registry, register_image
+
 # Configurar Blueprint
 chat_bp = Blueprint('chat', __name__)
 logger = logging.getLogger(__name__)
 
 # Variables globales
-ava_process = None
 ava_bot_path = None
+ava_pool = None
+ava_start_lock = threading.Lock()
+
+# Modo de los workers: 'thread' (LLMWithMCPTools en proceso, por defecto) o 'process' (ava_bot.py --ipc)
+AVA_WORKER_MODE = os.environ.get('AVA_WORKER_MODE', 'thread').lower()
+AVA_RESPONSE_TIMEOUT = 240
+AVA_UNLIMITED_TIMEOUT = 600
+SSE_KEEPALIVE_SECONDS = 15
 
 def find_ava_script():
     """Encuentra el script de AVA con múltiples métodos"""
@@ -59,344 +76,124 @@ def get_python_executable():
     venv_python = Path(__file__).parent.parent / 'venv' / 'Scripts' / 'python.exe'
     return str(venv_python) if venv_python.exists() else sys.executable
 
+def ava_is_running():
+    """True si el pool tiene al menos un worker vivo"""
+    return ava_pool is not None and ava_pool.started and ava_pool.status()['alive'] > 0
+
 def start_ava():
-    """Inicia AVA con diagnóstico mejorado"""
-    global ava_process, ava_bot_path
+    """Inicia el pool de workers AVA precalentados"""
+    global ava_pool, ava_bot_path
     
-    try:
-        print("🔍 DIAGNÓSTICO PARA llmpagina/ava_bot/ava_bot.py:")
-        print("=" * 60)
-        
-        # Paso 1: Encontrar script
-        ava_bot_path, script_path = find_ava_script()
-        if not script_path:
-            print("❌ FALLO: ava_bot.py no encontrado en llmpagina/ava_bot/")
-            return False
-        
-        print(f"✅ Script encontrado: {script_path}")
-        
-        # Paso 2: Verificar Python
-        python_exe = get_python_executable()
-        if not Path(python_exe).exists():
-            print(f"❌ FALLO: Python no existe: {python_exe}")
-            return False
-        
-        print(f"✅ Python verificado: {python_exe}")
-        
-        # Paso 3: Verificar API key
-        groq_key = os.environ.get('GROQ_API_KEY')
-        if not groq_key:
-            print("❌ FALLO: GROQ_API_KEY no configurada")
-            return False
+    with ava_start_lock:
+        if ava_is_running():
+            return True
         
-        print(f"✅ GROQ_API_KEY encontrada: {groq_key[:10]}...")
-        
-        # Paso 4: Terminar proceso anterior
-        if ava_process and ava_process.poll() is None:
-            print("🔄 Terminando proceso anterior...")
-            ava_process.terminate()
-            try:
-                ava_process.wait(timeout=5)
-                print("✅ Proceso anterior terminado")
-            except subprocess.TimeoutExpired:
-                ava_process.kill()
-                print("⚠️ Proceso anterior forzado a terminar")
-        
-        # Paso 5: Configurar entorno
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-        env['PYTHONUNBUFFERED'] = '1'
-        env['PYTHONPATH'] = str(ava_bot_path)
-        
-        # Paso 6: Iniciar proceso
-        print("\n🚀 INICIANDO ava_bot.py...")
-        
-        ava_process = subprocess.Popen(
-            [str(python_exe), str(script_path)],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            bufsize=0,
-            cwd=str(ava_bot_path),
-            env=env
-        )
-        
-        print(f"✅ Proceso iniciado con PID: {ava_process.pid}")
-        
-        # Paso 7: Monitoreo de inicialización
-        print("\n⏳ MONITOREANDO INICIALIZACIÓN...")
-        start_time = time.time()
-        initialization_timeout = 45
-        
-        while time.time() - start_time < initialization_timeout:
-            if ava_process.poll() is not None:
-                stderr_output = ava_process.stderr.read()
-                stdout_output = ava_process.stdout.read()
-                
-                print(f"\n❌ PROCESO TERMINÓ PREMATURAMENTE:")
-                print(f"   Código de salida: {ava_process.returncode}")
-                
-                if stderr_output:
-                    print(f"   STDERR: {stderr_output}")
-                
-                if stdout_output:
-                    print(f"   STDOUT: {stdout_output}")
-                
+        try:
+            print("🔍 DIAGNÓSTICO PARA llmpagina/ava_bot/ava_bot.py:")
+            print("=" * 60)
+            
+            ava_bot_path, script_path = find_ava_script()
+            if not script_path:
+                print("❌ FALLO: ava_bot.py no encontrado en llmpagina/ava_bot/")
                 return False
             
-            try:
-                line = ava_process.stdout.readline()
-                if line:
-                    clean_line = line.strip()
-                    if clean_line:
-                        print(f"📋 ava_bot.py: {clean_line}")
-                        
-                        # Detectar inicialización exitosa
-                        success_markers = [
-                            "🎯 SISTEMA AVA INICIALIZADO",
-                            "💬 ¡Empecemos a conversar!",
-                            "✅ Sistema listo",
-                            "💬 Escribe tu mensaje:"
-                        ]
-                        
-                        if any(marker in clean_line for marker in success_markers):
-                            print("✅ ava_bot.py iniciado correctamente!")
-                            return True
-                        
-                        # Detectar errores críticos
-                        error_markers = [
-                            "❌ Error:",
-                            "GROQ_API_KEY no encontrada", 
-                            "FileNotFoundError",
-                            "ModuleNotFoundError",
-                            "ImportError"
-                        ]
-                        
-                        if any(error in clean_line for error in error_markers):
-                            print(f"❌ ERROR CRÍTICO: {clean_line}")
-                            return False
-                            
-            except Exception as e:
-                print(f"⚠️ Error leyendo stdout: {e}")
+            groq_key = os.environ.get('GROQ_API_KEY')
+            if not groq_key:
+                print("❌ FALLO: GROQ_API_KEY no configurada")
+                return False
             
-            time.sleep(0.5)
-        
-        # Timeout
-        print(f"\n⏰ TIMEOUT ({initialization_timeout}s)")
-        if ava_process.poll() is None:
-            print("⚠️ Proceso aún activo - asumiendo éxito")
-            return True
-        else:
-            print("❌ Proceso terminó durante timeout")
-            return False
+            print(f"✅ GROQ_API_KEY encontrada: {groq_key[:10]}...")
             
-    except Exception as e:
-        print(f"\n💥 EXCEPCIÓN EN start_ava(): {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-def detect_image_generation(lines):
-    """Detecta generación de imagen - VERSIÓN SIMPLE"""
-    try:
-        for line in lines:
-            # Patrones simples y efectivos
-            image_patterns = [
-                r'imagen guardada en:?\s*([a-zA-Z0-9_\-]+\.png)',
-                r'imagen generada:?\s*([a-zA-Z0-9_\-]+\.png)',
-                r'filepath[:\s]*.*?([a-zA-Z0-9_\-]+\.png)',
-                r'guardada en.*?([a-zA-Z0-9_\-]+\.png)',
-                r'saved.*?([a-zA-Z0-9_\-]+\.png)',
-                r'ava_generated_\d{8}_\d{6}\.png'
-            ]
+            if str(ava_bot_path) not in sys.path:
+                sys.path.insert(0, str(ava_bot_path))
+            from worker_pool import AvaWorkerPool
             
-            for pattern in image_patterns:
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    filename = match.group(1)
-                    logger.info(f"🖼️ Imagen detectada con patrón exitoso: {filename}")
-                    return {
-                        'filename': filename,
-                        'path': line,
-                        'detected_pattern': pattern
-                    }
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"❌ Error detectando imagen: {e}")
-        return None
-
-def send_to_ava(message):
-    """Envía mensaje a ava_bot.py - VERSIÓN SIMPLE"""
-    global ava_process
-    
-    if not ava_process or ava_process.poll() is not None:
-        logger.error("❌ ava_bot.py no disponible")
-        return "AVA no está disponible. Presiona 'Reiniciar AVA'."
-    
-    try:
-        logger.info(f"📤 Enviando a ava_bot.py: {message[:50]}...")
-        
-        # Enviar mensaje
-        ava_process.stdin.write(f"{message}\n")
-        ava_process.stdin.flush()
-        
-        # Variables de captura
-        response_parts = []
-        all_lines = []
-        ava_response_started = False
-        
-        logger.debug("🔍 Esperando respuesta...")
-        
-        while True:
-            if ava_process.poll() is not None:
-                logger.warning("⚠️ Proceso ava_bot.py terminó")
-                break
+            mode = AVA_WORKER_MODE
+            if mode != 'process':
+                try:
+                    import ava_bot  # noqa: F401 - dependencias del modo en proceso
+                except ImportError as e:
+                    print(f"⚠️ Workers en proceso no disponibles ({e}) - usando ava_bot.py --ipc")
+                    mode = 'process'
             
-            try:
-                line = ava_process.stdout.readline()
-                if line:
-                    clean_line = line.strip()
-                    all_lines.append(clean_line)
-                    
-                    # Detectar fin por marcador
-                    if clean_line == "🔚 AVA_RESPONSE_END":
-                        logger.debug("🔚 FIN DETECTADO")
-                        break
-                    
-                    # Detectar inicio de respuesta
-                    if clean_line.startswith("🤖 Ava: "):
-                        ava_response_started = True
-                        content = clean_line[7:].strip()
-                        if content:
-                            response_parts.append(content)
-                        continue
-                    
-                    # Capturar contenido
-                    if ava_response_started:
-                        # Ignorar logs
-                        if any(keyword in clean_line for keyword in [
-                            "INFO:httpx:", "INFO:mcp_client:", "INFO:__main__:",
-                            "WARNING:", "DEBUG:", "ERROR:", "💬 Mensaje agregado",
-                            "HTTP Request:", "🔍 DEBUG:", "📤", "📥", "🎯", "⏳",
-                            "✅ LLM respondió", "🔄 Ava está procesando"
-                        ]):
-                            continue
-                        
-                        response_parts.append(clean_line)
-                
-                else:
-                    time.sleep(0.01)
-                    
-            except Exception as e:
-                logger.debug(f"⚠️ Error leyendo línea: {e}")
-                continue
-        
-        # Construir respuesta final
-        if response_parts:
-            while response_parts and response_parts[-1] == "":
-                response_parts.pop()
+            if ava_pool is not None:
+                ava_pool.shutdown()
             
-            full_response = "\n".join(response_parts).strip()
-            logger.info(f"✅ Respuesta capturada: {len(full_response)} chars, {len(response_parts)} líneas")
+            ava_pool = AvaWorkerPool(
+                groq_key,
+                str(ava_bot_path / 'mcp_server' / 'run_server.py'),
+                mode=mode,
+                python_executable=get_python_executable()
+            )
             
-            # Buscar imágenes
-            image_info = detect_image_generation(all_lines)
+            print(f"\n🚀 INICIANDO POOL AVA ({mode})...")
+            ready = ava_pool.start()
+            if not ready:
+                print("❌ Ningún worker AVA pudo inicializarse")
+                ava_pool = None
+                return False
             
-            if image_info:
-                logger.info(f"🖼️ Imagen detectada: {image_info['filename']}")
-                return {
-                    'text': full_response,
-                    'image_generated': True,
-                    'image_filename': image_info['filename'],
-                    'image_url': f"/api/chat/image/{image_info['filename']}"
-                }
-            else:
-                logger.info("📝 No se detectaron imágenes")
-                return full_response
-        
-        logger.warning("❌ No se capturó respuesta válida")
-        return "No se recibió respuesta válida de AVA."
-        
-    except Exception as e:
-        logger.error(f"❌ Error comunicando con ava_bot.py: {e}")
-        return f"Error de comunicación: {str(e)}"
+            print(f"✅ Pool AVA listo: {ready}/{ava_pool.size} workers")
+            return True
+            
+        except Exception as e:
+            print(f"\n💥 EXCEPCIÓN EN start_ava(): {e}")
+            import traceback
+            traceback.print_exc()
+            return False
 
-def send_to_ava_unlimited(message):
-    """Versión ilimitada para mensajes largos"""
-    global ava_process
+def build_ava_response(result):
+    """Convierte el resultado estructurado de un worker al formato de respuesta del chat"""
+    full_response = result.get('text', '').strip()
+    images = result.get('images', [])
     
-    if not ava_process or ava_process.poll() is not None:
-        logger.error("❌ ava_bot.py no disponible")
-        return "AVA no está disponible."
+    if images:
+        filename = images[-1]['filename']
+        logger.info(f"🖼️ Imagen generada: {filename}")
+        return {
+            'text': full_response,
+            'image_generated': True,
+            'image_filename': filename,
+            'image_url': f"/api/chat/image/{filename}"
+        }
+    
+    return full_response or "No se recibió respuesta válida de AVA."
+
+def ava_chat_context():
+    """Sesión y usuario del turno, para que el pool use su historial y no el del worker.
+
+    Debe llamarse dentro del request: los hilos del pool no ven la sesión de Flask.
+    """
+    session_key = session.get('user_id')
+    if session_key is None:
+        session_key = session.setdefault('chat_session_id', uuid.uuid4().hex)
+    return {'session_key': str(session_key), 'user_email': session.get('email')}
+
+def send_to_ava(message, timeout=AVA_RESPONSE_TIMEOUT):
+    """Envía mensaje a un worker AVA libre y espera su respuesta estructurada"""
+    if not ava_is_running():
+        logger.error("❌ AVA no disponible")
+        return "AVA no está disponible. Presiona 'Reiniciar AVA'."
     
     try:
-        logger.info(f"📤 Enviando (ilimitado): {message[:50]}...")
-        
-        ava_process.stdin.write(f"{message}\n")
-        ava_process.stdin.flush()
-        
-        response_parts = []
-        all_lines = []
-        ava_response_started = False
-        start_time = time.time()
-        timeout = 120
-        
-        while time.time() - start_time < timeout:
-            if ava_process.poll() is not None:
-                break
-            
-            try:
-                line = ava_process.stdout.readline()
-                if line:
-                    clean_line = line.strip()
-                    all_lines.append(clean_line)
-                    
-                    if clean_line == "🔚 AVA_RESPONSE_END":
-                        break
-                    
-                    if clean_line.startswith("🤖 Ava: "):
-                        ava_response_started = True
-                        content = clean_line[7:].strip()
-                        if content:
-                            response_parts.append(content)
-                        continue
-                    
-                    if ava_response_started:
-                        if any(keyword in clean_line for keyword in [
-                            "INFO:", "WARNING:", "DEBUG:", "ERROR:", "💬", "📤", "📥"
-                        ]):
-                            continue
-                        response_parts.append(clean_line)
-                
-                else:
-                    time.sleep(0.1)
-                    
-            except Exception as e:
-                continue
-        
-        if response_parts:
-            full_response = "\n".join(response_parts).strip()
-            image_info = detect_image_generation(all_lines)
-            
-            if image_info:
-                return {
-                    'text': full_response,
-                    'image_generated': True,
-                    'image_filename': image_info['filename'],
-                    'image_url': f"/api/chat/image/{image_info['filename']}"
-                }
-            return full_response
-        
-        return "No se recibió respuesta válida."
-        
+        logger.info(f"📤 Enviando a AVA: {message[:50]}...")
+        result = ava_pool.submit(message, timeout=timeout, **ava_chat_context())
+    except TimeoutError as e:
+        logger.error(f"⏰ {e}")
+        return "AVA tardó demasiado en responder. Intenta nuevamente."
     except Exception as e:
-        logger.error(f"❌ Error: {e}")
-        return f"Error: {str(e)}"
+        logger.error(f"❌ Error comunicando con AVA: {e}")
+        return f"Error de comunicación: {str(e)}"
+    
+    for event in result.get('tool_events', []):
+        logger.info(f"🔧 Worker {result.get('worker_id')}: {event.get('name')} {event.get('status')}")
+    
+    logger.info(f"✅ Respuesta del worker {result.get('worker_id')}: {len(result.get('text', ''))} chars")
+    return build_ava_response(result)
+
+def send_to_ava_unlimited(message):
+    """Versión con timeout extendido para mensajes largos"""
+    return send_to_ava(message, timeout=AVA_UNLIMITED_TIMEOUT)
 
 # ============================================================================
 # ENDPOINTS DE LA API - SOLO UNA DEFINICIÓN DE CADA UNO
@@ -405,14 +202,12 @@ def send_to_ava_unlimited(message):
 @chat_bp.route('/api/chat/status', methods=['GET'])
 def chat_status():
     """Estado del chat AVA"""
-    global ava_process
-    
-    is_running = ava_process is not None and ava_process.poll() is None
+    is_running = ava_is_running()
     
     return jsonify({
         'ava_status': 'running' if is_running else 'stopped',
         'timestamp': datetime.now().isoformat(),
-        'process_id': ava_process.pid if is_running else None,
+        'pool': ava_pool.status() if ava_pool is not None else None,
         'script': 'ava_bot.py'
     })
 
@@ -429,10 +224,9 @@ def chat_message():
         
         logger.info(f"📤 Mensaje recibido: {message[:100]}...")
         
-        # Verificar ava_bot.py
-        global ava_process
-        if not ava_process or ava_process.poll() is None:
-            logger.info("🚀 Iniciando ava_bot.py...")
+        # Verificar AVA (solo arranca si no hay workers/proceso vivos)
+        if not ava_is_running():
+            logger.info("🚀 Iniciando AVA...")
             if not start_ava():
                 return jsonify({
                     'success': False, 
@@ -476,47 +270,107 @@ def chat_message():
             'response': 'Error procesando mensaje'
         }), 500
 
+def sse_event(event_type, data):
+    """Formatea un evento Server-Sent Events"""
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_from_ava(message, timeout, chat_context):
+    """Generador SSE: token/tool/reset mientras AVA trabaja y un evento 'done' al final"""
+    events = queue.Queue()
+    
+    def run():
+        try:
+            result = ava_pool.submit(message, timeout=timeout, on_event=lambda event_type, data: events.put((event_type, data)),
+                                     **chat_context)
+            events.put(('result', result))
+        except TimeoutError as e:
+            logger.error(f"⏰ {e}")
+            events.put(('error', {'message': 'AVA tardó demasiado en responder. Intenta nuevamente.'}))
+        except Exception as e:
+            logger.error(f"❌ Error comunicando con AVA: {e}")
+            events.put(('error', {'message': f'Error de comunicación: {str(e)}'}))
+    
+    threading.Thread(target=run, name='ava-sse', daemon=True).start()
+    
+    while True:
+        try:
+            event_type, data = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+        except queue.Empty:
+            # Comentario SSE para que proxies y navegador no cierren la conexión
+            yield ": keepalive\n\n"
+            continue
+        
+        if event_type == 'tool':
+            data = dict(data, message=f"Ejecutando herramienta {data.get('name', '')}..." if data.get('status') == 'started' else '')
+            yield sse_event('tool', data)
+        elif event_type in ('token', 'reset'):
+            yield sse_event(event_type, data)
+        elif event_type == 'error':
+            yield sse_event('error', data)
+            return
+        elif event_type == 'result':
+            response = build_ava_response(data)
+            logger.info(f"✅ Stream del worker {data.get('worker_id')} completado")
+            if isinstance(response, dict):
+                payload = {
+                    'response': response.get('text', ''),
+                    'image_generated': True,
+                    'image_url': response.get('image_url'),
+                    'image_filename': response.get('image_filename')
+                }
+            else:
+                payload = {'response': str(response), 'image_generated': False}
+            payload.update({'worker_id': data.get('worker_id'), 'timestamp': datetime.now().isoformat()})
+            yield sse_event('done', payload)
+            return
+
+@chat_bp.route('/api/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """Versión streaming de /api/chat/message (text/event-stream)"""
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    message = (data.get('message') or '').strip()
+    unlimited_mode = str(data.get('unlimited', '')).lower() in ('1', 'true')
+    
+    if not message:
+        return jsonify({'success': False, 'response': 'Mensaje vacío'}), 400
+    
+    logger.info(f"📡 Mensaje (stream) recibido: {message[:100]}...")
+    
+    if not ava_is_running():
+        logger.info("🚀 Iniciando AVA...")
+        if not start_ava():
+            return jsonify({'success': False, 'response': 'Error iniciando AVA.'}), 500
+    
+    timeout = AVA_UNLIMITED_TIMEOUT if unlimited_mode else AVA_RESPONSE_TIMEOUT
+    return Response(
+        stream_with_context(stream_from_ava(message, timeout, ava_chat_context())),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx: no acumular la respuesta
+        }
+    )
+
 @chat_bp.route('/api/chat/image/<path:image_path>', methods=['GET'])
 def get_image(image_path):
-    """Servir imágenes - VERSIÓN ACTUALIZADA"""
+    """Servir imágenes - resueltas con el registro de imágenes en una sola consulta"""
     try:
-        logger.info(f"📷 Solicitando imagen: {image_path}")
+        logger.debug(f"📷 Solicitando imagen: {image_path}")
         
-        base_path = Path(__file__).parent.parent
+        # Prioridad: subidas > almacenadas por herramientas > generadas (ver image_registry.LOCATIONS)
+        location_path = get_image_registry().resolve(image_path)
         
-        # 🔥 AGREGAR uploaded images COMO PRIMERA PRIORIDAD
-        search_locations = [
-            # Prioridad 1: Imágenes subidas por usuarios
-            ('uploaded_images', base_path / 'llmpagina' / 'ava_bot' / 'uploaded images' / image_path),
-            # Prioridad 2: Imágenes almacenadas por herramientas
-            ('stored_images', base_path / 'llmpagina' / 'ava_bot' / 'tools' / 'adapters' / 'stored_images' / image_path),
-            # Prioridad 3: Imágenes generadas
-            ('generated_images', base_path / 'generated_images' / image_path),
-            ('ava_generated', base_path / 'llmpagina' / 'ava_bot' / 'generated_images' / image_path),
-        ]
-        
-        for location_name, location_path in search_locations:
-            if location_path.exists():
-                logger.info(f"✅ Imagen encontrada en {location_name}: {location_path}")
-                
-                # Detectar el tipo MIME correcto
-                mime_type = 'image/png'  # Default
-                if image_path.lower().endswith(('.jpg', '.jpeg')):
-                    mime_type = 'image/jpeg'
-                elif image_path.lower().endswith('.png'):
-                    mime_type = 'image/png'
-                elif image_path.lower().endswith('.gif'):
-                    mime_type = 'image/gif'
-                elif image_path.lower().endswith('.webp'):
-                    mime_type = 'image/webp'
-                
-                return send_file(str(location_path), mimetype=mime_type)
-        
-        logger.error(f"❌ Imagen no encontrada en ninguna ubicación: {image_path}")
-        logger.info("🔍 Ubicaciones buscadas:")
-        for location_name, location_path in search_locations:
-            logger.info(f"   {location_name}: {location_path} ({'✅' if location_path.exists() else '❌'})")
+        if location_path is not None:
+            # Variante según Accept (WebP/AVIF) y ancho pedido (?w=); original si aún no hay derivados
+            variant_path, mime_type = select_variant(location_path,
+                                                     request.headers.get('Accept', ''),
+                                                     request.args.get('w', type=int))
+            
+            response = send_file(str(variant_path), mimetype=mime_type)
+            response.headers['Vary'] = 'Accept'
+            return response
         
+        logger.error(f"❌ Imagen no encontrada en el registro: {image_path}")
         return jsonify({'error': f'Imagen no encontrada: {image_path}'}), 404
         
     except Exception as e:
@@ -529,10 +383,10 @@ def restart_ava():
     try:
         logger.info("🔄 Reiniciando AVA...")
         
-        global ava_process
-        if ava_process:
-            ava_process.terminate()
-            ava_process = None
+        global ava_pool
+        if ava_pool is not None:
+            ava_pool.shutdown()
+            ava_pool = None
         
         success = start_ava()
         
@@ -662,7 +516,6 @@ def analyze_image():
         logger.info(f"📋 Procesando imagen: {file.filename} ({file.content_type}, {file_size} bytes)")
         
         # 🔥 PASO 1: GUARDAR EN LA RUTA EXACTA QUE YA EXISTE
-        import uuid
         import os
         
         file_extension = os.path.splitext(file.filename)[1].lower() or '.png'
@@ -682,6 +535,8 @@ def analyze_image():
             return jsonify({'success': False, 'response': 'Error guardando imagen'}), 500
         
         actual_file_size = permanent_file_path.stat().st_size
+        register_image(permanent_file_path, user_id=session.get('user_id'), source='upload')
+        schedule_derivatives(permanent_file_path)  # WebP/tamaños y JPEG para visión en segundo plano
         logger.info(f"💾 Imagen guardada: {permanent_file_path}")
         logger.info(f"📏 Tamaño: {actual_file_size} bytes")
         
@@ -718,15 +573,13 @@ def analyze_image():
         logger.info(f"Longitud mensaje: {len(ava_message)} caracteres")
         
         # 🔥 PASO 4: VERIFICAR AVA DISPONIBLE
-        global ava_process
-        if not ava_process or ava_process.poll() is not None:
+        if not ava_is_running():
             logger.info("🚀 Iniciando AVA...")
             if not start_ava():
                 return jsonify({
                     'success': False,
                     'response': 'Error iniciando AVA'
                 }), 500
-            time.sleep(3)
         
         # 🔥 PASO 5: ENVIAR A AVA
         logger.info("📤 Enviando a AVA...")
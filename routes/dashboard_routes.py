@@ -1,46 +1,344 @@
-from flask import Blueprint, render_template, session, jsonify
+from flask import Blueprint, Response, render_template, session, jsonify
 from utils.decorators import login_required, admin_required
 from database.db_manager import get_db_connection
+import base64
+import csv
+import io
+import json
 import logging
+import os
+import platform
 import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 
+# Módulos de AVA por su nombre plano (una sola copia, compartida con ava_bot)
+AVA_BOT_DIR = str(Path(__file__).resolve().parent.parent / 'llmpagina' / 'ava_bot')
+if AVA_BOT_DIR not in sys.path:
+    sys.path.insert(0, AVA_BOT_DIR)
+
+from fts_utils import MEMORY_ENTRIES_FTS, ensure_fts, fts_match_query, fts_rowids_sql
+from stats_rollups import ensure_login_rollups, ensure_memory_rollups
+from sqlite_pool import PooledConnection, database_path, get_connection, read_only_uri
+
 logger = logging.getLogger(__name__)
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Bases de memoria ya preparadas (ruta -> {'fts': bool, 'rollups': bool})
+_memory_db_checked = {}
+
+# Agregados de login_attempts en users.db (None = sin verificar)
+_login_rollups_enabled = None
+
+
+class MemoryConnection(PooledConnection):
+    """Conexión a memory.db que recuerda si el índice FTS5 y los agregados están disponibles"""
+    fts_enabled = False
+    rollups_enabled = False
+
+# ✅ UBICACIÓN DE MEMORY.DB (resuelta al arrancar, no en cada petición)
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+MEMORY_DB_RETRY_SECONDS = 30
+
+_memory_db_path = None
+_memory_db_checked_at = 0.0
+_memory_db_lock = threading.Lock()
+
+
+def _is_cloud_environment() -> bool:
+    """Mismos indicadores que SQLiteMemoryManager._is_cloud_environment"""
+    return bool(
+        os.getenv("WEBSITE_SITE_NAME") or
+        os.getenv("FUNCTIONS_WORKER_RUNTIME") or
+        os.path.exists("/.dockerenv") or
+        (platform.system() == "Linux" and os.path.exists("/app"))
+    )
+
+
+def memory_db_candidates() -> list:
+    """Rutas posibles de memory.db, en el orden que usan los gestores de memoria"""
+    candidates = []
+
+    # SQLiteMemoryManager._get_universal_db_path: variable de entorno, cloud, local
+    if db_path_env := os.getenv("MEMORY_DB_PATH"):
+        candidates.append(Path(db_path_env))
+    registered = database_path('memory')
+    if registered:
+        candidates.append(Path(registered))
+
+    local_db = PROJECT_ROOT / "llmpagina" / "ava_bot" / "tools" / "adapters" / "memory.db"
+    cloud_db = Path("/tmp/ava_memory.db")
+    candidates.extend([cloud_db, local_db] if _is_cloud_environment() else [local_db, cloud_db])
+
+    # CloudMemoryManager._define_memory_paths (si app.py lo cargó; importarlo crea directorios)
+    cloud_module = sys.modules.get('database.cloud_memory_manager')
+    if cloud_module is not None and getattr(cloud_module, 'cloud_memory_manager', None):
+        candidates.append(Path(cloud_module.cloud_memory_manager.memory_paths['memory_db']))
+
+    candidates.extend([
+        PROJECT_ROOT / "llmpagina" / "ava_bot" / "memory.db",
+        PROJECT_ROOT / "memory.db"
+    ])
+    return candidates
+
+
+def locate_memory_db(refresh: bool = False):
+    """Ruta de memory.db cacheada; si aún no existe se reintenta como mucho cada 30 s"""
+    global _memory_db_path, _memory_db_checked_at
+    with _memory_db_lock:
+        if _memory_db_path is not None and _memory_db_path.exists() and not refresh:
+            return _memory_db_path
+        if (_memory_db_path is None and not refresh
+                and time.time() - _memory_db_checked_at < MEMORY_DB_RETRY_SECONDS):
+            return None
+
+        _memory_db_checked_at = time.time()
+        _memory_db_path = next((path.absolute() for path in memory_db_candidates() if path.is_file()), None)
+        if _memory_db_path:
+            logger.info(f"🗃️ memory.db del dashboard: {_memory_db_path}")
+        else:
+            logger.warning("⚠️ memory.db no encontrada en las rutas conocidas")
+        return _memory_db_path
+
+
+@dashboard_bp.record_once
+def _discover_memory_db(state):
+    locate_memory_db(refresh=True)
+
+
+def _prepare_memory_db(db_path: Path) -> dict:
+    """Migraciones FTS5 y de agregados una vez por proceso, con una conexión de escritura"""
+    key = str(db_path)
+    if key not in _memory_db_checked:
+        features = {'fts': False, 'rollups': False}
+        conn = get_connection(db_path)
+        try:
+            try:
+                features['fts'] = ensure_fts(conn, MEMORY_ENTRIES_FTS)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ No se pudo preparar FTS5 en memory.db: {e}")
+            try:
+                features['rollups'] = ensure_memory_rollups(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ No se pudieron preparar los agregados de memory.db: {e}")
+            try:
+                ensure_keyset_indexes(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ No se pudieron crear los índices de paginación: {e}")
+        finally:
+            conn.close()
+        _memory_db_checked[key] = features
+    return _memory_db_checked[key]
+
+
+def ensure_keyset_indexes(conn):
+    """Índices (timestamp, id) para paginar por cursor y exportar por tramos"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_type_timestamp_id
+        ON memory_entries(entry_type, timestamp, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_type_timestamp_id
+        ON memory_entries(user_id, entry_type, timestamp, id)
+    ''')
+
+
+def login_rollups_enabled(conn) -> bool:
+    """Agregados de login_attempts listos en users.db (se crean una vez por proceso)"""
+    global _login_rollups_enabled
+    if _login_rollups_enabled is None:
+        try:
+            _login_rollups_enabled = ensure_login_rollups(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ No se pudieron preparar los agregados de login: {e}")
+            _login_rollups_enabled = False
+    return _login_rollups_enabled
+
+
 # ✅ FUNCIÓN PARA CONECTAR A MEMORY.DB
 def get_memory_connection():
-    """Conecta a la base de datos de memoria de Ava"""
+    """Conexión de solo lectura (del pool del hilo) a la base de datos de memoria de Ava"""
     try:
-        # Buscar memory.db en ubicaciones comunes
-        possible_paths = [
-            Path("llmpagina/ava_bot/tools/adapters/memory.db"),
-            Path("llmpagina/ava_bot/memory.db"),
-            Path("memory.db")
-        ]
-        
-        db_path = None
-        for path in possible_paths:
-            if path.exists():
-                db_path = path
-                break
-        
+        db_path = locate_memory_db()
         if not db_path:
-            # Buscar recursivamente
-            for root, dirs, files in Path(".").rglob("memory.db"):
-                db_path = root / "memory.db"
-                break
-        
-        if db_path:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            return conn
-        
-        return None
+            return None
+
+        features = _prepare_memory_db(db_path)
+        conn = get_connection(read_only_uri(db_path), row_factory=sqlite3.Row, factory=MemoryConnection)
+        conn.fts_enabled = features['fts']
+        conn.rollups_enabled = features['rollups']
+        return conn
     except Exception as e:
         logger.error(f"Error conectando a memory.db: {e}")
         return None
 
+
+def conversation_summary(memory_conn) -> dict:
+    """Mensajes totales, usuarios y entradas de hoy: de los agregados o, sin ellos, de memory_entries"""
+    if memory_conn.rollups_enabled:
+        queries = {
+            'total': "SELECT SUM(entries) FROM memory_user_stats WHERE entry_type = 'message'",
+            'users': 'SELECT COUNT(DISTINCT user_id) FROM memory_user_stats',
+            'today': "SELECT SUM(entries) FROM memory_daily_stats WHERE day = DATE('now')"
+        }
+    else:
+        queries = {
+            'total': 'SELECT COUNT(*) FROM memory_entries WHERE entry_type = "message"',
+            'users': 'SELECT COUNT(DISTINCT user_id) FROM memory_entries',
+            'today': 'SELECT COUNT(*) FROM memory_entries WHERE DATE(timestamp) = DATE("now")'
+        }
+    return {name: memory_conn.execute(sql).fetchone()[0] or 0 for name, sql in queries.items()}
+
+
+# ✅ PAGINACIÓN POR CURSOR (timestamp, rowid) Y EXPORTACIONES EN STREAMING
+PAGE_SIZE = 20
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FORMATS = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+
+def encode_cursor(row) -> str:
+    """Cursor opaco con la clave (timestamp, rowid) de la última fila entregada"""
+    raw = json.dumps([row['timestamp'], row['rowid']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str):
+    """(timestamp, rowid) del cursor; ValueError si no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        timestamp, rowid = json.loads(raw)
+        return str(timestamp), int(rowid)
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+
+def iter_user_messages(memory_conn, user_id: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Mensajes del usuario en orden cronológico, leídos por tramos con keyset (memoria constante)"""
+    last_key = None
+    while True:
+        sql = '''
+            SELECT rowid AS rowid, content, response, timestamp
+            FROM memory_entries
+            WHERE user_id = ? AND entry_type = "message"
+        '''
+        params = [user_id]
+        if last_key:
+            sql += ' AND (timestamp, rowid) > (?, ?)'
+            params.extend(last_key)
+        sql += ' ORDER BY timestamp, rowid LIMIT ?'
+        params.append(chunk_size)
+
+        rows = memory_conn.execute(sql, params).fetchall()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_key = (rows[-1]['timestamp'], rows[-1]['rowid'])
+
+
+def count_user_messages(memory_conn, user_id: str) -> int:
+    if memory_conn.rollups_enabled:
+        row = memory_conn.execute(
+            'SELECT entries FROM memory_user_stats WHERE user_id = ? AND entry_type = "message"', (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+    return memory_conn.execute(
+        'SELECT COUNT(*) FROM memory_entries WHERE user_id = ? AND entry_type = "message"', (user_id,)
+    ).fetchone()[0]
+
+
+def _format_export_time(timestamp) -> str:
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M:%S')
+    except Exception:
+        return timestamp
+
+
+def stream_user_export(user_id: str, export_format: str, filename: str, total: int, labels: dict) -> Response:
+    """
+    Respuesta en streaming (txt/csv/ndjson/json) con el historial completo del usuario.
+    El 200 ya salió al empezar: si algo falla a mitad, la excepción se relanza para que
+    el servidor corte la respuesta chunked sin el chunk final y el cliente vea la
+    descarga como incompleta en vez de un archivo truncado que parece válido.
+    """
+    exported_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def generate():
+        memory_conn = get_memory_connection()
+        if not memory_conn:
+            raise RuntimeError(f"Sin conexión a memory.db exportando historial de {user_id}")
+        try:
+            messages = iter_user_messages(memory_conn, user_id)
+
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(['n', 'timestamp', 'content', 'response'])
+                for i, msg in enumerate(messages, 1):
+                    writer.writerow([i, msg['timestamp'], msg['content'], msg['response']])
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate(0)
+                yield buffer.getvalue()
+
+            elif export_format == 'ndjson':
+                for msg in messages:
+                    yield json.dumps({'timestamp': msg['timestamp'], 'content': msg['content'],
+                                      'response': msg['response']}, ensure_ascii=False) + '\n'
+
+            elif export_format == 'json':
+                header = json.dumps({'user_id': user_id, 'exported_at': exported_at, 'total': total},
+                                    ensure_ascii=False)
+                yield header[:-1] + ', "conversations": ['
+                for i, msg in enumerate(messages):
+                    yield (',' if i else '') + json.dumps({'timestamp': msg['timestamp'], 'content': msg['content'],
+                                                           'response': msg['response']}, ensure_ascii=False)
+                yield ']}'
+
+            else:
+                yield f"""{labels['title']}
+================================================
+
+{labels['subject']}: {user_id}
+Fecha de exportación: {exported_at}
+{labels['total']}: {total}
+
+{labels['history']}:
+================================================
+
+"""
+                for i, msg in enumerate(messages, 1):
+                    yield f"""
+--- {labels['item']} #{i} ---
+Fecha: {_format_export_time(msg['timestamp'])}
+
+👤 {labels['speaker']}:
+{msg['content']}
+
+🤖 AVA:
+{msg['response']}
+
+{'='*50}
+"""
+        except Exception as e:
+            logger.error(f"Error exportando historial de {user_id}: {e}")
+            raise
+        finally:
+            memory_conn.close()
+
+    return Response(generate(), mimetype=EXPORT_FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{export_format}"',
+        'X-Accel-Buffering': 'no',
+        'Cache-Control': 'no-store'
+    })
+
 @dashboard_bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -53,28 +351,23 @@ def dashboard():
         stats['total_users'] = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] or 0
         stats['active_users'] = conn.execute('SELECT COUNT(*) FROM users WHERE is_active = 1').fetchone()[0] or 0
         stats['admin_users'] = conn.execute('SELECT COUNT(*) FROM users WHERE is_admin = 1').fetchone()[0] or 0
-        stats['today_logins'] = conn.execute(
-            'SELECT COUNT(*) FROM login_attempts WHERE DATE(attempted_at) = DATE("now") AND success = 1'
-        ).fetchone()[0] or 0
+        if login_rollups_enabled(conn):
+            row = conn.execute('SELECT successes FROM login_daily_stats WHERE day = DATE("now")').fetchone()
+            stats['today_logins'] = row[0] if row else 0
+        else:
+            stats['today_logins'] = conn.execute(
+                'SELECT COUNT(*) FROM login_attempts WHERE DATE(attempted_at) = DATE("now") AND success = 1'
+            ).fetchone()[0] or 0
         
         # ✅ ESTADÍSTICAS DE CONVERSACIONES AVA (AJUSTADO)
         memory_conn = get_memory_connection()
         if memory_conn:
             try:
-                # Total conversaciones
-                stats['total_conversations'] = memory_conn.execute(
-                    'SELECT COUNT(*) FROM memory_entries WHERE entry_type = "message"'
-                ).fetchone()[0] or 0
-                
-                # Usuarios únicos que han conversado - CAMBIAR NOMBRE
-                stats['unique_users'] = memory_conn.execute(
-                    'SELECT COUNT(DISTINCT user_id) FROM memory_entries'
-                ).fetchone()[0] or 0
-                
-                # Conversaciones hoy
-                stats['today_conversations'] = memory_conn.execute(
-                    'SELECT COUNT(*) FROM memory_entries WHERE DATE(timestamp) = DATE("now")'
-                ).fetchone()[0] or 0
+                # Total conversaciones, usuarios únicos que han conversado y conversaciones hoy
+                summary = conversation_summary(memory_conn)
+                stats['total_conversations'] = summary['total']
+                stats['unique_users'] = summary['users']
+                stats['today_conversations'] = summary['today']
                 
                 # ✅ AGREGAR TIEMPO PROMEDIO DE RESPUESTA (simulado por ahora)
                 stats['avg_response_time'] = 2.3  # Tiempo promedio en segundos
@@ -139,10 +432,7 @@ def conversations():
                                  active_menu='conversations')
         
         # Estadísticas
-        stats = {}
-        stats['total'] = memory_conn.execute('SELECT COUNT(*) FROM memory_entries WHERE entry_type = "message"').fetchone()[0] or 0
-        stats['users'] = memory_conn.execute('SELECT COUNT(DISTINCT user_id) FROM memory_entries').fetchone()[0] or 0
-        stats['today'] = memory_conn.execute('SELECT COUNT(*) FROM memory_entries WHERE DATE(timestamp) = DATE("now")').fetchone()[0] or 0
+        stats = conversation_summary(memory_conn)
         
         # Conversaciones recientes (últimas 50)
         conversations = memory_conn.execute('''
@@ -154,14 +444,23 @@ def conversations():
         ''').fetchall()
         
         # Usuarios más activos
-        active_users = memory_conn.execute('''
-            SELECT user_id, COUNT(*) as conversation_count
-            FROM memory_entries 
-            WHERE entry_type = "message"
-            GROUP BY user_id
-            ORDER BY conversation_count DESC
-            LIMIT 10
-        ''').fetchall()
+        if memory_conn.rollups_enabled:
+            active_users = memory_conn.execute('''
+                SELECT user_id, entries as conversation_count
+                FROM memory_user_stats
+                WHERE entry_type = "message"
+                ORDER BY conversation_count DESC
+                LIMIT 10
+            ''').fetchall()
+        else:
+            active_users = memory_conn.execute('''
+                SELECT user_id, COUNT(*) as conversation_count
+                FROM memory_entries 
+                WHERE entry_type = "message"
+                GROUP BY user_id
+                ORDER BY conversation_count DESC
+                LIMIT 10
+            ''').fetchall()
         
         memory_conn.close()
         
@@ -193,22 +492,39 @@ def search_conversations_detailed():
         if not memory_conn:
             return jsonify({'error': 'No se pudo conectar a la base de datos'})
         
-        sql = '''
-            SELECT user_id, content, response, timestamp
-            FROM memory_entries 
-            WHERE entry_type = "message"
-        '''
-        params = []
+        match_query = fts_match_query(query) if query and getattr(memory_conn, 'fts_enabled', False) else ''
         
-        if query:
-            sql += ' AND (content LIKE ? OR response LIKE ?)'
-            params.extend([f'%{query}%', f'%{query}%'])
+        if match_query:
+            # FTS5: ranking BM25 y fragmento resaltado
+            sql = '''
+                SELECT m.user_id, m.content, m.response, m.timestamp,
+                       snippet(memory_entries_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet
+                FROM memory_entries_fts
+                JOIN memory_entries m ON m.id = memory_entries_fts.rowid
+                WHERE memory_entries_fts MATCH '{content response} : (' || ? || ')'
+                AND m.entry_type = "message"
+            '''
+            params = [match_query]
+        else:
+            sql = '''
+                SELECT user_id, content, response, timestamp
+                FROM memory_entries m
+                WHERE entry_type = "message"
+            '''
+            params = []
+            
+            if query:
+                sql += ' AND (content LIKE ? OR response LIKE ?)'
+                params.extend([f'%{query}%', f'%{query}%'])
         
         if user_id:
-            sql += ' AND user_id LIKE ?'
+            sql += ' AND m.user_id LIKE ?'
             params.append(f'%{user_id}%')
         
-        sql += ' ORDER BY timestamp DESC LIMIT 100'
+        if match_query:
+            sql += ' ORDER BY bm25(memory_entries_fts) LIMIT 100'
+        else:
+            sql += ' ORDER BY timestamp DESC LIMIT 100'
         
         results = memory_conn.execute(sql, params).fetchall()
         memory_conn.close()
@@ -267,17 +583,29 @@ def clients():
         if memory_conn:
             try:
                 # Obtener clientes únicos con estadísticas
-                conversation_data = memory_conn.execute('''
-                    SELECT 
-                        user_id,
-                        COUNT(*) as conversations,
-                        MAX(timestamp) as last_activity,
-                        MIN(timestamp) as first_activity
-                    FROM memory_entries 
-                    WHERE entry_type = "message" AND user_id IS NOT NULL
-                    GROUP BY user_id
-                    ORDER BY last_activity DESC
-                ''').fetchall()
+                if memory_conn.rollups_enabled:
+                    conversation_data = memory_conn.execute('''
+                        SELECT 
+                            user_id,
+                            entries as conversations,
+                            last_at as last_activity,
+                            first_at as first_activity
+                        FROM memory_user_stats
+                        WHERE entry_type = "message"
+                        ORDER BY last_activity DESC
+                    ''').fetchall()
+                else:
+                    conversation_data = memory_conn.execute('''
+                        SELECT 
+                            user_id,
+                            COUNT(*) as conversations,
+                            MAX(timestamp) as last_activity,
+                            MIN(timestamp) as first_activity
+                        FROM memory_entries 
+                        WHERE entry_type = "message" AND user_id IS NOT NULL
+                        GROUP BY user_id
+                        ORDER BY last_activity DESC
+                    ''').fetchall()
                 
                 # Convertir a lista de diccionarios con nombres amigables
                 for row in conversation_data:
@@ -399,15 +727,25 @@ def statistics():
         ''').fetchall()
         
         # Intentos de login por día
-        login_stats = conn.execute('''
-            SELECT DATE(attempted_at) as date, 
-                   SUM(success) as successful_logins,
-                   COUNT(*) as total_attempts
-            FROM login_attempts
-            WHERE attempted_at >= DATE('now', '-30 days')
-            GROUP BY DATE(attempted_at)
-            ORDER BY date
-        ''').fetchall()
+        if login_rollups_enabled(conn):
+            login_stats = conn.execute('''
+                SELECT day as date,
+                       successes as successful_logins,
+                       attempts as total_attempts
+                FROM login_daily_stats
+                WHERE day >= DATE('now', '-30 days')
+                ORDER BY date
+            ''').fetchall()
+        else:
+            login_stats = conn.execute('''
+                SELECT DATE(attempted_at) as date, 
+                       SUM(success) as successful_logins,
+                       COUNT(*) as total_attempts
+                FROM login_attempts
+                WHERE attempted_at >= DATE('now', '-30 days')
+                GROUP BY DATE(attempted_at)
+                ORDER BY date
+            ''').fetchall()
         
         conn.close()
         
@@ -416,13 +754,22 @@ def statistics():
         conversation_stats = []
         if memory_conn:
             try:
-                conversation_stats = memory_conn.execute('''
-                    SELECT DATE(timestamp) as date, COUNT(*) as count
-                    FROM memory_entries
-                    WHERE timestamp >= DATE('now', '-30 days') AND entry_type = "message"
-                    GROUP BY DATE(timestamp)
-                    ORDER BY date
-                ''').fetchall()
+                if memory_conn.rollups_enabled:
+                    conversation_stats = memory_conn.execute('''
+                        SELECT day as date, SUM(entries) as count
+                        FROM memory_daily_stats
+                        WHERE day >= DATE('now', '-30 days') AND entry_type = "message"
+                        GROUP BY day
+                        ORDER BY date
+                    ''').fetchall()
+                else:
+                    conversation_stats = memory_conn.execute('''
+                        SELECT DATE(timestamp) as date, COUNT(*) as count
+                        FROM memory_entries
+                        WHERE timestamp >= DATE('now', '-30 days') AND entry_type = "message"
+                        GROUP BY DATE(timestamp)
+                        ORDER BY date
+                    ''').fetchall()
                 memory_conn.close()
             except:
                 pass
@@ -453,15 +800,20 @@ def configuration():
 @dashboard_bp.route('/api/conversations')
 @login_required
 def api_conversations():
-    """API para el dashboard que busca conversaciones"""
+    """API para el dashboard que busca conversaciones (cursor = keyset, page = OFFSET como respaldo)"""
     from flask import request
     
     try:
         page = int(request.args.get('page', 1))
         filter_type = request.args.get('filter', 'all')
         search_term = request.args.get('search', '')
+        cursor_token = request.args.get('cursor', '').strip()
+        try:
+            cursor = decode_cursor(cursor_token) if cursor_token else None
+        except ValueError as e:
+            return jsonify({'success': False, 'conversations': [], 'total': 0, 'error': str(e)}), 400
         
-        logger.info(f"🔍 API Conversations llamada: page={page}, filter={filter_type}, search='{search_term}'")
+        logger.info(f"🔍 API Conversations llamada: page={page}, cursor={bool(cursor)}, filter={filter_type}, search='{search_term}'")
         
         memory_conn = get_memory_connection()
         if not memory_conn:
@@ -476,34 +828,51 @@ def api_conversations():
         try:
             # ✅ AGREGAR ROWID A LA CONSULTA
             sql = '''
-                SELECT rowid, user_id, content, response, timestamp
+                SELECT rowid AS rowid, user_id, content, response, timestamp
                 FROM memory_entries 
                 WHERE entry_type = "message"
             '''
             params = []
             
-            # Filtro de búsqueda
-            if search_term:
-                sql += ' AND (content LIKE ? OR response LIKE ? OR user_id LIKE ?)'
+            # Filtro de búsqueda: índice FTS5 (contenido, respuesta y usuario) o LIKE como respaldo
+            match_query = fts_match_query(search_term) if search_term and memory_conn.fts_enabled else ''
+            if match_query:
+                search_filter = f' AND rowid IN ({fts_rowids_sql(MEMORY_ENTRIES_FTS)})'
+                search_params = [match_query]
+            elif search_term:
+                search_filter = ' AND (content LIKE ? OR response LIKE ? OR user_id LIKE ?)'
                 search_param = f'%{search_term}%'
-                params.extend([search_param, search_param, search_param])
+                search_params = [search_param, search_param, search_param]
+            else:
+                search_filter = ''
+                search_params = []
+            
+            sql += search_filter
+            params.extend(search_params)
             
-            # Ordenar y paginar
-            sql += ' ORDER BY timestamp DESC LIMIT 20 OFFSET ?'
-            params.append((page - 1) * 20)
+            # Ordenar y paginar: con cursor, keyset sobre idx_type_timestamp_id (coste constante por página)
+            if cursor:
+                sql += ' AND (timestamp, rowid) < (?, ?)'
+                params.extend(cursor)
+                sql += ' ORDER BY timestamp DESC, rowid DESC LIMIT ?'
+                params.append(PAGE_SIZE)
+            else:
+                sql += ' ORDER BY timestamp DESC, rowid DESC LIMIT ? OFFSET ?'
+                params.extend([PAGE_SIZE, (page - 1) * PAGE_SIZE])
             
             logger.info(f"📝 Ejecutando SQL: {sql}")
             logger.info(f"📝 Parámetros: {params}")
             
             conversations = memory_conn.execute(sql, params).fetchall()
             
-            # Contar total
-            count_sql = 'SELECT COUNT(*) FROM memory_entries WHERE entry_type = "message"'
-            if search_term:
-                count_sql += ' AND (content LIKE ? OR response LIKE ? OR user_id LIKE ?)'
-                total = memory_conn.execute(count_sql, [search_param, search_param, search_param]).fetchone()[0]
+            # Contar total: de los agregados sin búsqueda; con búsqueda solo en la primera página
+            if not search_filter and memory_conn.rollups_enabled:
+                total = conversation_summary(memory_conn)['total']
+            elif not cursor:
+                count_sql = 'SELECT COUNT(*) FROM memory_entries WHERE entry_type = "message"' + search_filter
+                total = memory_conn.execute(count_sql, search_params).fetchone()[0]
             else:
-                total = memory_conn.execute(count_sql).fetchone()[0]
+                total = None
             
             memory_conn.close()
             
@@ -511,7 +880,8 @@ def api_conversations():
                 'success': True,
                 'conversations': [dict(row) for row in conversations],
                 'total': total,
-                'page': page
+                'page': page,
+                'next_cursor': encode_cursor(conversations[-1]) if len(conversations) == PAGE_SIZE else None
             }
             
             logger.info(f"✅ API Conversations exitosa: {len(conversations)} conversaciones, total: {total}")
@@ -604,72 +974,47 @@ def conversation_details(conversation_id):
 @dashboard_bp.route('/api/conversation/<conversation_id>/export')
 @login_required  
 def export_conversation_details(conversation_id):
-    """API para exportar detalles completos de conversación"""
+    """API para exportar detalles completos de conversación (?format=txt|csv|ndjson|json, en streaming)"""
+    from flask import request
+    
     try:
+        export_format = request.args.get('format', 'txt').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f'Formato no soportado: {export_format}'}), 400
+        
         memory_conn = get_memory_connection()
         if not memory_conn:
             return jsonify({'success': False, 'error': 'No se pudo conectar a la base de datos'})
         
         # Obtener conversación
         conversation = memory_conn.execute('''
-            SELECT user_id, content, response, timestamp
+            SELECT user_id
             FROM memory_entries 
             WHERE rowid = ? AND entry_type = "message"
         ''', (conversation_id,)).fetchone()
         
         if not conversation:
-            return jsonify({'success': False, 'error': 'Conversación no encontrada'})
-        
-        # Obtener historial completo
-        user_history = memory_conn.execute('''
-            SELECT content, response, timestamp
-            FROM memory_entries 
-            WHERE user_id = ? AND entry_type = "message"
-            ORDER BY timestamp ASC
-        ''', (conversation['user_id'],)).fetchall()
+            memory_conn.close()
+            return jsonify({'success': False, 'error': 'Conversación no encontrada'}), 404
         
+        user_id = conversation['user_id']
+        total = count_user_messages(memory_conn, user_id)
         memory_conn.close()
         
-        # Generar contenido del archivo
-        export_content = f"""DETALLES DE CONVERSACIÓN - AVA BOT
-================================================
-
-Usuario: {conversation['user_id']}
-Fecha de exportación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Total de intercambios: {len(user_history)}
-
-HISTORIAL COMPLETO DE CONVERSACIONES:
-================================================
-
-"""
-        
-        for i, msg in enumerate(user_history, 1):
-            timestamp = msg['timestamp']
-            try:
-                # Formatear timestamp
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                formatted_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                formatted_time = timestamp
-            
-            export_content += f"""
---- Intercambio #{i} ---
-Fecha: {formatted_time}
-
-👤 USUARIO:
-{msg['content']}
-
-🤖 AVA:
-{msg['response']}
-
-{'='*50}
-"""
-        
-        return jsonify({
-            'success': True,
-            'content': export_content,
-            'filename': f"conversacion_detallada_{conversation['user_id'].replace('@', '_')}_{conversation_id}.txt"
-        })
+        # El historial se lee por tramos y se escribe directamente en la respuesta
+        return stream_user_export(
+            user_id, export_format,
+            filename=f"conversacion_detallada_{user_id.replace('@', '_')}_{conversation_id}",
+            total=total,
+            labels={
+                'title': 'DETALLES DE CONVERSACIÓN - AVA BOT',
+                'subject': 'Usuario',
+                'total': 'Total de intercambios',
+                'history': 'HISTORIAL COMPLETO DE CONVERSACIONES',
+                'item': 'Intercambio',
+                'speaker': 'USUARIO'
+            }
+        )
         
     except Exception as e:
         logger.error(f"Error exportando conversación: {e}")
@@ -710,64 +1055,35 @@ def get_client_conversations(client_id):
 @dashboard_bp.route('/api/client/<client_id>/export')
 @login_required
 def export_client_data(client_id):
-    """API para exportar datos completos de un cliente"""
+    """API para exportar datos completos de un cliente (?format=txt|csv|ndjson|json, en streaming)"""
+    from flask import request
+    
     try:
+        export_format = request.args.get('format', 'txt').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f'Formato no soportado: {export_format}'}), 400
+        
         memory_conn = get_memory_connection()
         if not memory_conn:
             return jsonify({'success': False, 'error': 'No se pudo conectar a la base de datos'})
         
-        # Obtener todas las conversaciones
-        conversations = memory_conn.execute('''
-            SELECT content, response, timestamp
-            FROM memory_entries 
-            WHERE user_id = ? AND entry_type = "message"
-            ORDER BY timestamp ASC
-        ''', (client_id,)).fetchall()
-        
+        total = count_user_messages(memory_conn, client_id)
         memory_conn.close()
         
-        # Generar contenido del archivo
-        from datetime import datetime
-        
-        export_content = f"""REPORTE COMPLETO DE CLIENTE - AVA BOT
-================================================
-
-Cliente: {client_id}
-Fecha de exportación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Total de conversaciones: {len(conversations)}
-
-HISTORIAL COMPLETO:
-================================================
-
-"""
-        
-        for i, conv in enumerate(conversations, 1):
-            timestamp = conv['timestamp']
-            try:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                formatted_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except:
-                formatted_time = timestamp
-            
-            export_content += f"""
---- Conversación #{i} ---
-Fecha: {formatted_time}
-
-👤 CLIENTE:
-{conv['content']}
-
-🤖 AVA:
-{conv['response']}
-
-{'='*50}
-"""
-        
-        return jsonify({
-            'success': True,
-            'content': export_content,
-            'filename': f"cliente_{client_id.replace('@', '_')}_{datetime.now().strftime('%Y%m%d')}.txt"
-        })
+        return stream_user_export(
+            client_id, export_format,
+            filename=f"cliente_{client_id.replace('@', '_')}_{datetime.now().strftime('%Y%m%d')}",
+            total=total,
+            labels={
+                'title': 'REPORTE COMPLETO DE CLIENTE - AVA BOT',
+                'subject': 'Cliente',
+                'total': 'Total de conversaciones',
+                'history': 'HISTORIAL COMPLETO',
+                'item': 'Conversación',
+                'speaker': 'CLIENTE'
+            }
+        )
         
     except Exception as e:
         logger.error(f"Error exportando cliente {client_id}: {e}")
-        return jsonify({'success': False, 'error': str(e)})
\ No newline at end of file
+        return jsonify({'success': False, 'error': str(e)})
@@ -1,13 +1,25 @@
-from flask import Blueprint, render_template, jsonify, current_app, send_from_directory, redirect, url_for, abort
+from flask import Blueprint, render_template, jsonify, current_app, send_from_directory, redirect, url_for, abort, request
 from datetime import datetime, timedelta
 from pathlib import Path
 import threading
 import logging
 import json
-import subprocess
+import hashlib
 import time
 import os
+import re
 import sys  # ✅ AGREGAR IMPORT FALTANTE
+import unicodedata
+
+from utils.decorators import login_required
+from llmpagina.ava_seo.job_queue import get_job_runner
+
+# Módulos de AVA por su nombre plano (una sola copia, compartida con ava_bot y ava_seo)
+AVA_BOT_DIR = str(Path(__file__).resolve().parent.parent / 'llmpagina' / 'ava_bot')
+if AVA_BOT_DIR not in sys.path:
+    sys.path.insert(0, AVA_BOT_DIR)
+
+from image_derivatives import select_variant
 
 logger = logging.getLogger(__name__)
 news_bp = Blueprint('news', __name__)
@@ -15,12 +27,28 @@ news_bp = Blueprint('news', __name__)
 # Variables globales para control del flujo SEO
 last_seo_execution = None  # ✅ NOMBRE CORRECTO
 seo_execution_interval = timedelta(hours=12)  # 2 veces al día
-seo_lock = threading.Lock()
+SEO_JOB_TIMEOUT = 1800  # segundos que execute_seo_workflow espera al trabajo
 
 # ✅ VARIABLE PARA CONTROLAR EJECUCIÓN AUTOMÁTICA
 auto_seo_enabled = True
 last_check_time = None
 
+# ✅ MANIFIESTO DE ARTÍCULOS E ÍNDICE DE IMÁGENES (cache en memoria invalidada por mtime)
+LISTED_ARTICLES = 6  # artículos que muestran /noticias y /api/noticias
+_manifest_cache = {'source_mtime': None, 'data': None}
+_manifest_lock = threading.Lock()
+_image_index_cache = {}  # str(static_dir) -> (mtime del directorio, índice)
+_image_index_lock = threading.Lock()
+
+# ✅ CACHE HTTP DE PÁGINAS PÚBLICAS E IMÁGENES
+PAGE_MAX_AGE = int(os.getenv('NEWS_PAGE_MAX_AGE', '300'))  # navegadores/CDN revalidan cada 5 min
+IMAGE_MAX_AGE = int(os.getenv('NEWS_IMAGE_MAX_AGE', '86400'))  # imagen pedida sin versión
+IMMUTABLE_MAX_AGE = 31536000  # imagen con ?v=<hash>: el contenido de esa URL no cambia
+_page_cache = {'version': None, 'entries': {}}  # respuestas renderizadas por versión del manifiesto
+_page_cache_lock = threading.Lock()
+_image_versions = {}  # ruta -> ((mtime, tamaño), hash corto del contenido)
+_image_versions_lock = threading.Lock()
+
 def get_seo_paths():
     """Obtener rutas del sistema SEO"""
     base_dir = Path(__file__).parent.parent
@@ -34,7 +62,8 @@ def get_seo_paths():
         'static_dir': seo_dir / 'output' / 'static',
         'results_dir': seo_dir / 'results',
         'latest_articles': seo_dir / 'results' / 'latest_articles.json',
-        'latest_results': seo_dir / 'results' / 'latest_results.json'
+        'latest_results': seo_dir / 'results' / 'latest_results.json',
+        'manifest': seo_dir / 'results' / 'articles_manifest.json'
     }
 
 def create_default_image():
@@ -106,7 +135,94 @@ def create_basic_png_fallback():
     except Exception as e:
         logger.error(f"Error creando PNG básico: {e}")
 
-def find_corresponding_image(article_data, static_dir, app_context=None):
+def slugify_title(title):
+    """Slug estable del título: sin acentos, minúsculas y guiones"""
+    text = unicodedata.normalize('NFKD', title or '').encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+def build_image_index(static_dir):
+    """
+    Índice de imágenes del directorio: metadata por título y por archivo de artículo,
+    y nombres de PNG. Se recorre el directorio una vez y se reutiliza mientras su
+    mtime no cambie (añadir o borrar archivos actualiza el mtime del directorio).
+    """
+    try:
+        dir_mtime = static_dir.stat().st_mtime
+    except OSError:
+        return {'by_title': {}, 'by_article_file': [], 'pngs': []}
+    
+    key = str(static_dir)
+    with _image_index_lock:
+        cached = _image_index_cache.get(key)
+        if cached and cached[0] == dir_mtime:
+            return cached[1]
+    
+    index = {'by_title': {}, 'by_article_file': [], 'pngs': []}
+    
+    for metadata_file in sorted(static_dir.glob('*_metadata.json')):
+        try:
+            with open(metadata_file, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except Exception as e:
+            logger.error(f"Error leyendo metadata {metadata_file}: {e}")
+            continue
+        
+        image_filename = metadata.get('image_filename', '')
+        if not image_filename or not (static_dir / image_filename).exists():
+            continue
+        
+        entry = {
+            "image_path": static_dir / image_filename,
+            "filename": image_filename,
+            "exists": True,
+            "metadata": metadata,
+            "metadata_file": metadata_file.name
+        }
+        metadata_title = (metadata.get('article_title') or '').strip().lower()
+        if metadata_title:
+            index['by_title'].setdefault(metadata_title, entry)
+        if metadata.get('article_file'):
+            index['by_article_file'].append((metadata['article_file'], entry))
+    
+    index['pngs'] = [(png_file.stem.lower(), png_file) for png_file in sorted(static_dir.glob('*.png'))]
+    
+    with _image_index_lock:
+        _image_index_cache[key] = (dir_mtime, index)
+    logger.info(f"🗂️ Índice de imágenes: {len(index['pngs'])} PNG, {len(index['by_title'])} metadata")
+    return index
+
+def image_version(image_path):
+    """Hash corto del contenido de la imagen (recalculado solo si cambian mtime o tamaño)"""
+    try:
+        stat = image_path.stat()
+    except OSError:
+        return None
+    
+    key = str(image_path)
+    signature = (stat.st_mtime, stat.st_size)
+    with _image_versions_lock:
+        cached = _image_versions.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+    
+    digest = hashlib.sha1()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    version = digest.hexdigest()[:12]
+    
+    with _image_versions_lock:
+        _image_versions[key] = (signature, version)
+    return version
+
+def versioned_image_url(web_path, filename):
+    """URL direccionada por contenido (?v=<hash>) para imágenes servidas por serve_seo_image"""
+    if not filename or not web_path or not web_path.startswith('/static/seo_images/'):
+        return web_path
+    version = image_version(get_seo_paths()['static_dir'] / filename)
+    return f"{web_path.split('?')[0]}?v={version}" if version else web_path
+
+def find_corresponding_image(article_data, static_dir, app_context=None, image_index=None):
     """Buscar imagen correspondiente al artículo específico"""
     try:
         article_title = article_data.get('title', '')
@@ -122,21 +238,24 @@ def find_corresponding_image(article_data, static_dir, app_context=None):
             logger.warning(f"⚠️ Directorio no existe: {static_dir}")
             return get_fallback_image(article_title, app_context)
         
+        if image_index is None:
+            image_index = build_image_index(static_dir)
+        
         # MÉTODO 1: Buscar por archivo de metadata específico
-        image_from_metadata = find_image_by_metadata_safe(article_data, static_dir)
+        image_from_metadata = find_image_by_metadata_safe(article_data, static_dir, image_index)
         if image_from_metadata and image_from_metadata.get('exists'):
             logger.info(f"✅ Imagen encontrada por metadata: {image_from_metadata.get('filename', 'N/A')}")
             return build_image_response(image_from_metadata, article_title, 'metadata_title', app_context)
         
         # MÉTODO 2: Buscar por run_id
         if run_id:
-            image_from_run_id = find_image_by_run_id_safe(run_id, static_dir)
+            image_from_run_id = find_image_by_run_id_safe(run_id, static_dir, image_index)
             if image_from_run_id and image_from_run_id.get('exists'):
                 logger.info(f"✅ Imagen encontrada por run_id: {image_from_run_id.get('filename', 'N/A')}")
                 return build_image_response(image_from_run_id, article_title, 'run_id', app_context)
         
         # MÉTODO 3: Buscar por título
-        image_from_title = find_image_by_title_safe(article_title, static_dir)
+        image_from_title = find_image_by_title_safe(article_title, static_dir, image_index)
         if image_from_title and image_from_title.get('exists'):
             logger.info(f"✅ Imagen encontrada por título: {image_from_title.get('filename', 'N/A')}")
             return build_image_response(image_from_title, article_title, 'title_pattern', app_context)
@@ -149,49 +268,25 @@ def find_corresponding_image(article_data, static_dir, app_context=None):
         logger.error(f"Error buscando imagen: {e}")
         return get_fallback_image(article_data.get('title', 'Artículo'), app_context)
 
-def find_image_by_metadata_safe(article_data, static_dir):
+def find_image_by_metadata_safe(article_data, static_dir, image_index=None):
     """Buscar imagen usando archivos de metadata"""
     try:
         article_title = article_data.get('title', '')
         filename = article_data.get('filename', '')
+        index = image_index if image_index is not None else build_image_index(static_dir)
         
-        metadata_files = list(static_dir.glob('*_metadata.json'))
+        # Verificar coincidencia exacta por título
+        entry = index['by_title'].get(article_title.strip().lower()) if article_title else None
+        if entry:
+            logger.info(f"📋 Coincidencia por título en metadata: {entry['metadata_file']}")
+            return entry
         
-        for metadata_file in metadata_files:
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                metadata_title = metadata.get('article_title', '')
-                metadata_article_file = metadata.get('article_file', '')
-                image_filename = metadata.get('image_filename', '')
-                
-                # Verificar coincidencia exacta por título
-                if metadata_title and article_title and metadata_title.strip().lower() == article_title.strip().lower():
-                    image_path = static_dir / image_filename
-                    if image_path.exists():
-                        logger.info(f"📋 Coincidencia por título en metadata: {metadata_file.name}")
-                        return {
-                            "image_path": image_path,
-                            "filename": image_filename,
-                            "exists": True,
-                            "metadata": metadata
-                        }
-                
-                # Verificar coincidencia por archivo
-                if metadata_article_file and filename and metadata_article_file in filename:
-                    image_path = static_dir / image_filename
-                    if image_path.exists():
-                        logger.info(f"📋 Coincidencia por archivo en metadata: {metadata_file.name}")
-                        return {
-                            "image_path": image_path,
-                            "filename": image_filename,
-                            "exists": True,
-                            "metadata": metadata
-                        }
-                        
-            except Exception as e:
-                logger.error(f"Error leyendo metadata {metadata_file}: {e}")
+        # Verificar coincidencia por archivo
+        if filename:
+            for metadata_article_file, entry in index['by_article_file']:
+                if metadata_article_file in filename:
+                    logger.info(f"📋 Coincidencia por archivo en metadata: {entry['metadata_file']}")
+                    return entry
         
         return None
         
@@ -199,15 +294,13 @@ def find_image_by_metadata_safe(article_data, static_dir):
         logger.error(f"Error en find_image_by_metadata_safe: {e}")
         return None
 
-def find_image_by_run_id_safe(run_id, static_dir):
+def find_image_by_run_id_safe(run_id, static_dir, image_index=None):
     """Buscar imagen por run_id exacto"""
     try:
-        png_files = list(static_dir.glob('*.png'))
+        index = image_index if image_index is not None else build_image_index(static_dir)
+        run_id_clean = run_id.lower().replace('.json', '')
         
-        for png_file in png_files:
-            png_name = png_file.stem.lower()
-            run_id_clean = run_id.lower().replace('.json', '')
-            
+        for png_name, png_file in index['pngs']:
             # Verificar coincidencia exacta del run_id
             if run_id_clean in png_name or png_name in run_id_clean:
                 # Verificar que sea una coincidencia significativa
@@ -225,7 +318,7 @@ def find_image_by_run_id_safe(run_id, static_dir):
         logger.error(f"Error en find_image_by_run_id_safe: {e}")
         return None
 
-def find_image_by_title_safe(article_title, static_dir):
+def find_image_by_title_safe(article_title, static_dir, image_index=None):
     """Buscar imagen por título del artículo"""
     try:
         # Limpiar título para comparación
@@ -250,11 +343,9 @@ def find_image_by_title_safe(article_title, static_dir):
         # Solo usar patrones suficientemente largos
         patterns = [p for p in patterns if len(p) > 8]
         
-        png_files = list(static_dir.glob('*.png'))
+        index = image_index if image_index is not None else build_image_index(static_dir)
         
-        for png_file in png_files:
-            png_name = png_file.stem.lower()
-            
+        for png_name, png_file in index['pngs']:
             for pattern in patterns:
                 # Verificar coincidencia significativa
                 if len(pattern) > 8 and pattern in png_name:
@@ -401,7 +492,7 @@ def check_and_run_seo():
             logger.info("🚀 INICIANDO ejecución automática del flujo SEO")
             logger.info(f"⏰ Hora actual: {current_time.strftime('%H:%M:%S')}")
             logger.info(f"📅 Fecha: {current_time.strftime('%Y-%m-%d')}")
-            threading.Thread(target=execute_seo_workflow, daemon=True).start()
+            submit_seo_job()
         else:
             # ✅ CORRECCIÓN: Cambiar "last_seeo_execution" por "last_seo_execution"
             if last_seo_execution:
@@ -417,57 +508,54 @@ def check_and_run_seo():
     except Exception as e:
         logger.error(f"❌ Error en check_and_run_seo: {e}")
 
-def execute_seo_workflow():
-    """Ejecutar el flujo de trabajo SEO en segundo plano - VERSIÓN ÚNICA"""
+def _on_seo_job_done(job):
+    """Al terminar un trabajo SEO correcto: registrar la hora y actualizar resultados"""
     global last_seo_execution
     
-    with seo_lock:
-        try:
-            start_time = datetime.now()
-            logger.info(f"🚀 INICIO ejecución SEO - {start_time.strftime('%H:%M:%S')}")
-            
-            paths = get_seo_paths()
-            workflow_script = paths['workflow_script']
-            
-            if not workflow_script.exists():
-                logger.error(f"❌ Script SEO no encontrado: {workflow_script}")
-                return False
-            
-            for dir_path in [paths['output_dir'], paths['articulos_dir'], 
-                           paths['seo_json_dir'], paths['static_dir'], paths['results_dir']]:
-                dir_path.mkdir(parents=True, exist_ok=True)
-            
-            logger.info("📋 Ejecutando script SEO...")
-            
-            result = subprocess.run([
-                sys.executable, str(workflow_script)
-            ], capture_output=True, text=True, timeout=1800)
-            
-            end_time = datetime.now()
-            duration = end_time - start_time
-            
-            if result.returncode == 0:
-                logger.info(f"✅ Flujo SEO completado exitosamente en {duration.total_seconds():.1f}s")
-                logger.info(f"🕐 Finalizado a las: {end_time.strftime('%H:%M:%S')}")
-                last_seo_execution = end_time
-                update_results_files()
-                
-                # Log de próxima ejecución
-                next_execution = last_seo_execution + seo_execution_interval
-                logger.info(f"⏰ Próxima ejecución programada: {next_execution.strftime('%H:%M:%S')}")
-                
-                return True
-            else:
-                logger.error(f"❌ Error ejecutando flujo SEO: {result.stderr}")
-                logger.info(f"📋 Salida del script: {result.stdout}")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            logger.error("⏰ Timeout ejecutando flujo SEO (30 minutos)")
-            return False
-        except Exception as e:
-            logger.error(f"💥 Excepción ejecutando flujo SEO: {e}")
+    if job.status != 'succeeded':
+        logger.error(f"❌ Trabajo SEO {job.id} terminó con estado {job.status}: {job.error}")
+        return
+    
+    end_time = job.finished_at or datetime.now()
+    duration = (end_time - job.started_at).total_seconds() if job.started_at else 0
+    logger.info(f"✅ Flujo SEO completado exitosamente en {duration:.1f}s")
+    logger.info(f"🕐 Finalizado a las: {end_time.strftime('%H:%M:%S')}")
+    last_seo_execution = end_time
+    update_results_files()
+    
+    # Log de próxima ejecución
+    next_execution = last_seo_execution + seo_execution_interval
+    logger.info(f"⏰ Próxima ejecución programada: {next_execution.strftime('%H:%M:%S')}")
+
+def submit_seo_job(run_id=None, resume=False, articles=None):
+    """Encolar el flujo SEO en la cola del proceso (devuelve el trabajo activo si ya hay uno)"""
+    paths = get_seo_paths()
+    for dir_path in [paths['output_dir'], paths['articulos_dir'], 
+                   paths['seo_json_dir'], paths['static_dir'], paths['results_dir']]:
+        dir_path.mkdir(parents=True, exist_ok=True)
+    
+    job = get_job_runner().submit(run_id=run_id, resume=resume, articles=articles,
+                                  on_done=_on_seo_job_done)
+    logger.info(f"🚀 Trabajo SEO {job.id} ({job.status})")
+    return job
+
+def execute_seo_workflow():
+    """Ejecutar el flujo de trabajo SEO y esperar el resultado - VERSIÓN ÚNICA"""
+    try:
+        start_time = datetime.now()
+        logger.info(f"🚀 INICIO ejecución SEO - {start_time.strftime('%H:%M:%S')}")
+        
+        job = submit_seo_job()
+        if not job.wait(timeout=SEO_JOB_TIMEOUT):
+            logger.error("⏰ Timeout ejecutando flujo SEO (30 minutos), se solicita cancelación")
+            get_job_runner().cancel(job.id)
             return False
+        
+        return job.status == 'succeeded'
+            
+    except Exception as e:
+        logger.error(f"💥 Excepción ejecutando flujo SEO: {e}")
+        return False
 
 def update_results_files():
     """Actualizar archivos de resultados agregando los nuevos artículos"""
@@ -487,20 +575,24 @@ def update_results_files():
                 logger.error(f"Error cargando resultados existentes: {e}")
         
         new_articles = []
+        known_run_ids = {r.get('run_id') for r in existing_results}
+        image_index = build_image_index(static_dir) if static_dir.exists() else None
         if articulos_dir.exists():
             for article_file in articulos_dir.glob('*.json'):
+                run_id = article_file.stem
+                if run_id in known_run_ids:
+                    continue
                 try:
                     with open(article_file, 'r', encoding='utf-8') as f:
                         article_data = json.load(f)
                     
-                    run_id = article_file.stem
-                    
                     # Agregar información adicional para búsqueda de imagen
                     article_data['filename'] = article_file.name
                     article_data['run_id'] = run_id
                     
                     # Buscar imagen específica para este artículo SIN contexto Flask
-                    image_data = find_corresponding_image(article_data, static_dir, app_context=None)
+                    image_data = find_corresponding_image(article_data, static_dir, app_context=None,
+                                                          image_index=image_index)
                     
                     result_entry = {
                         "run_id": run_id,
@@ -509,10 +601,9 @@ def update_results_files():
                         "timestamp": article_data.get('generated_at', datetime.now().isoformat())
                     }
                     
-                    if not any(r.get('run_id') == run_id for r in existing_results):
-                        new_articles.append(result_entry)
-                        logger.info(f"➕ Nuevo artículo agregado: {run_id}")
-                        logger.info(f"   🖼️ Imagen: {image_data.get('source', 'N/A')} - {image_data.get('web_path', 'N/A')}")
+                    new_articles.append(result_entry)
+                    logger.info(f"➕ Nuevo artículo agregado: {run_id}")
+                    logger.info(f"   🖼️ Imagen: {image_data.get('source', 'N/A')} - {image_data.get('web_path', 'N/A')}")
                         
                 except Exception as e:
                     logger.error(f"Error procesando artículo {article_file}: {e}")
@@ -528,118 +619,261 @@ def update_results_files():
         with open(latest_articles_file, 'w', encoding='utf-8') as f:
             json.dump(latest_6, f, ensure_ascii=False, indent=2)
         
+        # Manifiesto indexado para las rutas (se construye aquí, no en cada petición)
+        write_articles_manifest(all_results, latest_results_file.stat().st_mtime)
+        
         logger.info(f"📝 Actualizados archivos de resultados: {len(new_articles)} nuevos artículos")
         
     except Exception as e:
         logger.error(f"Error actualizando archivos de resultados: {e}")
 
-# ✅ REEMPLAZAR LA FUNCIÓN DUPLICADA CON ESTA VERSIÓN ÚNICA
-def load_articles_from_latest_results():
-    """Cargar artículos desde latest_results.json - VERSIÓN CORREGIDA"""
+def process_result_entry(result):
+    """Entrada de latest_results.json -> diccionario de artículo para las plantillas"""
+    article_data = result.get('article', {})
+    image_data = result.get('image', {})
+    
+    # ✅ VERIFICAR QUE TENGA TÍTULO
+    title = article_data.get('title', '')
+    if not title:
+        return None
+    
+    content = article_data.get('content', '')
+    return {
+        'title': title,
+        'slug': slugify_title(title),
+        'content': content,
+        'excerpt': content[:300] + '...' if len(content) > 300 else content,
+        'meta_description': article_data.get('meta_description', ''),
+        'keywords': article_data.get('keywords', []),
+        'references': article_data.get('references', []),
+        'generated_at': article_data.get('generated_at', datetime.now().isoformat()),
+        'run_id': result.get('run_id', ''),
+        'filename': article_data.get('filename', ''),
+        'source_topics': article_data.get('source_topics', []),
+        'model_used': article_data.get('model_used', 'llama3-70b-8192'),
+        
+        # Datos de imagen (URL versionada: se puede cachear como inmutable)
+        'image_path': versioned_image_url(image_data.get('web_path', '/static/images/default-article.png'),
+                                          image_data.get('filename', '')),
+        'image_exists': image_data.get('exists', False),
+        'image_filename': image_data.get('filename', ''),
+        'has_image': image_data.get('exists', False),
+        
+        # Timestamp para ordenar
+        'timestamp': result.get('timestamp', datetime.now().isoformat())
+    }
+
+def build_articles_manifest(results_data, source_mtime):
+    """Manifiesto: artículos procesados y ordenados + índices por run_id y por slug"""
+    articles = []
+    for i, result in enumerate(results_data or []):
+        try:
+            processed_article = process_result_entry(result)
+        except Exception as e:
+            logger.error(f"❌ Error procesando artículo {i+1}: {e}")
+            continue
+        if processed_article is None:
+            logger.warning(f"⚠️ Artículo {i+1} sin título, saltando...")
+            continue
+        articles.append(processed_article)
+    
+    # Ordenar por fecha (más recientes primero)
+    articles.sort(key=lambda x: x['timestamp'], reverse=True)
+    
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'source_mtime': source_mtime,
+        'articles': articles,
+        'by_run_id': {article['run_id']: i for i, article in enumerate(articles) if article['run_id']},
+        'by_slug': {article['slug']: article['run_id'] for article in reversed(articles) if article['slug']}
+    }
+
+def write_articles_manifest(results_data, source_mtime):
+    """Construir el manifiesto, guardarlo junto a latest_results.json y cachearlo"""
+    manifest = build_articles_manifest(results_data, source_mtime)
+    manifest_file = get_seo_paths()['manifest']
     try:
-        paths = get_seo_paths()
-        latest_results_file = paths['latest_results']
-        
-        logger.info(f"📂 Cargando artículos desde: {latest_results_file}")
-        
-        if not latest_results_file.exists():
-            logger.warning(f"⚠️ Archivo no existe: {latest_results_file}")
-            return []
-        
-        # Leer archivo JSON
-        with open(latest_results_file, 'r', encoding='utf-8') as f:
-            results_data = json.load(f)
-        
-        if not results_data:
-            logger.warning("⚠️ No hay datos en latest_results.json")
-            return []
-        
-        logger.info(f"📄 Encontrados {len(results_data)} resultados en el archivo")
+        tmp_file = manifest_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_file, manifest_file)
+    except Exception as e:
+        logger.error(f"❌ Error guardando manifiesto de artículos: {e}")
+    
+    with _manifest_lock:
+        _manifest_cache['source_mtime'] = source_mtime
+        _manifest_cache['data'] = manifest
+    logger.info(f"🗂️ Manifiesto de artículos: {len(manifest['articles'])} artículos")
+    return manifest
+
+def get_articles_manifest():
+    """
+    Manifiesto vigente. Por petición solo cuesta un stat() de latest_results.json:
+    si su mtime no cambió se usa la copia en memoria; si cambió (p. ej. lo reescribió
+    seo_workflow.py) se usa el manifiesto en disco o se reconstruye una vez.
+    """
+    paths = get_seo_paths()
+    latest_results_file = paths['latest_results']
+    try:
+        source_mtime = latest_results_file.stat().st_mtime
+    except OSError:
+        logger.warning(f"⚠️ Archivo no existe: {latest_results_file}")
+        return build_articles_manifest([], None)
+    
+    with _manifest_lock:
+        if _manifest_cache['data'] is not None and _manifest_cache['source_mtime'] == source_mtime:
+            return _manifest_cache['data']
         
-        # Procesar artículos - ✅ SOLO LOS ÚLTIMOS 6
-        articles = []
-        for i, result in enumerate(results_data[:6]):  # ✅ SOLO LOS PRIMEROS 6
+        manifest = None
+        manifest_file = paths['manifest']
+        if manifest_file.exists():
             try:
-                # Extraer datos del artículo
-                article_data = result.get('article', {})
-                image_data = result.get('image', {})
-                
-                # ✅ VERIFICAR QUE TENGA TÍTULO
-                title = article_data.get('title', '')
-                if not title:
-                    logger.warning(f"⚠️ Artículo {i+1} sin título, saltando...")
-                    continue
-                
-                # ✅ CREAR OBJETO ARTÍCULO PROCESADO COMO DICCIONARIO
-                processed_article = {
-                    'title': title,
-                    'content': article_data.get('content', ''),
-                    'excerpt': article_data.get('content', '')[:300] + '...' if len(article_data.get('content', '')) > 300 else article_data.get('content', ''),
-                    'meta_description': article_data.get('meta_description', ''),
-                    'keywords': article_data.get('keywords', []),
-                    'references': article_data.get('references', []),
-                    'generated_at': article_data.get('generated_at', datetime.now().isoformat()),
-                    'run_id': result.get('run_id', ''),
-                    'filename': article_data.get('filename', ''),
-                    'source_topics': article_data.get('source_topics', []),
-                    'model_used': article_data.get('model_used', 'llama3-70b-8192'),
-                    
-                    # Datos de imagen
-                    'image_path': image_data.get('web_path', '/static/images/default-article.png'),
-                    'image_exists': image_data.get('exists', False),
-                    'image_filename': image_data.get('filename', ''),
-                    'has_image': image_data.get('exists', False),
-                    
-                    # Timestamp para ordenar
-                    'timestamp': result.get('timestamp', datetime.now().isoformat())
-                }
-                
-                articles.append(processed_article)
-                logger.debug(f"✅ Procesado artículo: {processed_article['title'][:50]}...")
-                
+                with open(manifest_file, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('source_mtime') != source_mtime:
+                    manifest = None
             except Exception as e:
-                logger.error(f"❌ Error procesando artículo {i+1}: {e}")
-                continue
-        
-        logger.info(f"✅ Procesados {len(articles)} artículos exitosamente")
-        
-        # Ordenar por fecha (más recientes primero)
-        articles.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        return articles
+                logger.warning(f"⚠️ Manifiesto ilegible, se reconstruye: {e}")
+                manifest = None
         
+        if manifest is not None:
+            _manifest_cache['source_mtime'] = source_mtime
+            _manifest_cache['data'] = manifest
+            return manifest
+    
+    logger.info(f"📂 Reconstruyendo manifiesto desde: {latest_results_file}")
+    try:
+        with open(latest_results_file, 'r', encoding='utf-8') as f:
+            results_data = json.load(f)
+    except Exception as e:
+        logger.error(f"❌ Error cargando artículos: {e}")
+        return build_articles_manifest([], None)
+    
+    return write_articles_manifest(results_data, source_mtime)
+
+def get_article_by_run_id(run_id):
+    """Artículo por run_id (o por slug del título) en O(1)"""
+    manifest = get_articles_manifest()
+    position = manifest['by_run_id'].get(run_id)
+    if position is None:
+        slug_run_id = manifest['by_slug'].get(run_id)
+        position = manifest['by_run_id'].get(slug_run_id) if slug_run_id else None
+    return manifest['articles'][position] if position is not None else None
+
+# ✅ REEMPLAZAR LA FUNCIÓN DUPLICADA CON ESTA VERSIÓN ÚNICA
+def load_articles_from_latest_results():
+    """Artículos a mostrar (los últimos 6) desde el manifiesto cacheado"""
+    try:
+        return get_articles_manifest()['articles'][:LISTED_ARTICLES]
     except Exception as e:
         logger.error(f"❌ Error cargando artículos: {e}")
         import traceback
         logger.error(f"📋 Traceback: {traceback.format_exc()}")
         return []
 
+def manifest_version(manifest):
+    """Versión del manifiesto: cambia cuando se reescribe latest_results.json"""
+    raw = f"{manifest.get('source_mtime')}|{manifest.get('generated_at')}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+def cached_response(cache_key, render):
+    """
+    Respuesta pública cacheada por versión del manifiesto, con ETag/Last-Modified.
+    
+    render(manifest) devuelve HTML (str) o un Response; solo se ejecuta si la versión
+    cambió, así que los picos de crawlers no tocan disco ni Jinja. Un If-None-Match
+    que coincide responde 304 sin cuerpo.
+    """
+    manifest = get_articles_manifest()
+    version = manifest_version(manifest)
+    
+    with _page_cache_lock:
+        if _page_cache['version'] != version:
+            _page_cache['version'] = version
+            _page_cache['entries'] = {}
+        entry = _page_cache['entries'].get(cache_key)
+    
+    if entry is None:
+        rendered = render(manifest)
+        if isinstance(rendered, str):
+            body, mimetype = rendered.encode('utf-8'), 'text/html'
+        else:
+            body, mimetype = rendered.get_data(), rendered.mimetype
+        
+        source_mtime = manifest.get('source_mtime')
+        entry = {
+            'body': body,
+            'mimetype': mimetype,
+            'etag': f"{version}-{hashlib.sha1(body).hexdigest()[:12]}",
+            'last_modified': datetime.fromtimestamp(source_mtime) if source_mtime else None
+        }
+        with _page_cache_lock:
+            if _page_cache['version'] == version:
+                _page_cache['entries'][cache_key] = entry
+    
+    response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+    response.set_etag(entry['etag'])
+    if entry['last_modified']:
+        response.last_modified = entry['last_modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_MAX_AGE
+    return response.make_conditional(request)
+
+def render_noticias_page(manifest):
+    """HTML de /noticias a partir del manifiesto"""
+    articles = manifest['articles'][:LISTED_ARTICLES]
+    
+    if not articles:
+        logger.warning("⚠️ No se encontraron artículos")
+        return render_template('noticias.html',
+                             articles=[],
+                             current_time=datetime.now(),
+                             total_articles=0,
+                             error_message="No hay artículos disponibles en este momento.")
+    
+    logger.info(f"📰 Renderizando {len(articles)} artículos en la página")
+    
+    return render_template('noticias.html',
+                         articles=articles,
+                         current_time=datetime.now(),
+                         total_articles=len(articles))
+
+def render_article_page(article_data):
+    """HTML de /articulo/<id> para un artículo del manifiesto"""
+    # ✅ RESTRUCTURAR DATOS PARA EL TEMPLATE
+    article_for_template = {
+        'article': {
+            'title': article_data.get('title', ''),
+            'content': article_data.get('content', ''),
+            'meta_description': article_data.get('meta_description', ''),
+            'keywords': article_data.get('keywords', []),
+            'references': article_data.get('references', []),
+            'generated_at': article_data.get('generated_at', '')
+        },
+        'image': {
+            'web_path': article_data.get('image_path', '/static/images/default-article.png'),
+            'timestamp': article_data.get('timestamp', ''),
+            'exists': article_data.get('image_exists', False)
+        },
+        'run_id': article_data.get('run_id', '')
+    }
+    
+    # ✅ RENDERIZAR CON ESTRUCTURA CORRECTA
+    return render_template('public_article.html', 
+                         article=article_for_template,
+                         current_time=datetime.now())
+
 @news_bp.route('/noticias')
 def noticias():
     """Página principal de noticias - VERSIÓN CORREGIDA FINAL"""
     try:
-        logger.info("📰 Cargando página de noticias...")
+        logger.debug("📰 Cargando página de noticias...")
         
         # Verificar y ejecutar SEO si es necesario
         check_and_run_seo()
         
-        # ✅ CARGAR ARTÍCULOS DESDE latest_results.json (SOLO LOS ÚLTIMOS 6)
-        articles = load_articles_from_latest_results()
-        
-        if not articles:
-            logger.warning("⚠️ No se encontraron artículos")
-            return render_template('noticias.html',
-                                 articles=[],
-                                 current_time=datetime.now(),
-                                 total_articles=0,
-                                 error_message="No hay artículos disponibles en este momento.")
-        
-        logger.info(f"📰 Mostrando {len(articles)} artículos en la página")
-        
-        return render_template('noticias.html',
-                             articles=articles,
-                             current_time=datetime.now(),
-                             total_articles=len(articles))
+        # ✅ PÁGINA CACHEADA POR VERSIÓN DEL MANIFIESTO (SOLO LOS ÚLTIMOS 6)
+        return cached_response('noticias', render_noticias_page)
         
     except Exception as e:
         logger.error(f"❌ Error en ruta noticias: {e}")
@@ -656,50 +890,15 @@ def noticias():
 def ver_articulo(article_id):
     """Ver un artículo específico - VERSIÓN CORREGIDA"""
     try:
-        logger.info(f"📖 Solicitando artículo: {article_id}")
-        
-        # Cargar todos los artículos desde latest_results.json
-        articles = load_articles_from_latest_results()
-        
-        if not articles:
-            logger.warning("⚠️ No se encontraron artículos")
-            abort(404)
-        
-        # Buscar el artículo específico por run_id
-        article_data = None
-        for art in articles:
-            if art.get('run_id') == article_id:
-                article_data = art
-                break
+        # Búsqueda directa en el índice del manifiesto
+        article_data = get_article_by_run_id(article_id)
         
         if not article_data:
             logger.warning(f"⚠️ Artículo no encontrado: {article_id}")
             abort(404)
         
-        logger.info(f"✅ Artículo encontrado: {article_data.get('title', 'Sin título')}")
-        
-        # ✅ RESTRUCTURAR DATOS PARA EL TEMPLATE
-        article_for_template = {
-            'article': {
-                'title': article_data.get('title', ''),
-                'content': article_data.get('content', ''),
-                'meta_description': article_data.get('meta_description', ''),
-                'keywords': article_data.get('keywords', []),
-                'references': article_data.get('references', []),
-                'generated_at': article_data.get('generated_at', '')
-            },
-            'image': {
-                'web_path': article_data.get('image_path', '/static/images/default-article.png'),
-                'timestamp': article_data.get('timestamp', ''),
-                'exists': article_data.get('image_exists', False)
-            },
-            'run_id': article_data.get('run_id', '')
-        }
-        
-        # ✅ RENDERIZAR CON ESTRUCTURA CORRECTA
-        return render_template('public_article.html', 
-                             article=article_for_template,
-                             current_time=datetime.now())
+        return cached_response(f"articulo:{article_data.get('run_id')}",
+                               lambda manifest: render_article_page(article_data))
         
     except Exception as e:
         logger.error(f"❌ Error cargando artículo {article_id}: {e}")
@@ -709,13 +908,15 @@ def ver_articulo(article_id):
 def api_noticias():
     """API para obtener noticias en formato JSON"""
     try:
-        articles = load_articles_from_latest_results()
+        def render_api(manifest):
+            articles = manifest['articles'][:LISTED_ARTICLES]
+            return jsonify({
+                'success': True,
+                'total': len(articles),
+                'articles': articles  # Todos los artículos (máximo 6)
+            })
         
-        return jsonify({
-            'success': True,
-            'total': len(articles),
-            'articles': articles  # Todos los artículos (máximo 6)
-        })
+        return cached_response('api_noticias', render_api)
         
     except Exception as e:
         logger.error(f"❌ Error en API noticias: {e}")
@@ -728,25 +929,104 @@ def api_noticias():
 # ✅ RUTA PARA SERVIR IMÁGENES SEO
 @news_bp.route('/static/seo_images/<filename>')
 def serve_seo_image(filename):
-    """Servir imágenes SEO generadas"""
+    """Servir imágenes SEO generadas (ETag/Last-Modified y cache inmutable si la URL lleva ?v=<hash>)"""
     try:
         paths = get_seo_paths()
         static_dir = paths['static_dir']
         
         image_path = static_dir / filename
         
-        if not image_path.exists():
+        if not image_path.is_file():
             logger.warning(f"⚠️ Imagen SEO no encontrada: {filename}")
             # Retornar imagen por defecto
             default_image = Path(__file__).parent.parent / 'static' / 'images' / 'default-article.png'
             if default_image.exists():
-                return send_from_directory(str(default_image.parent), 'default-article.png')
+                response = send_from_directory(str(default_image.parent), 'default-article.png', max_age=PAGE_MAX_AGE)
+                response.cache_control.public = True
+                return response
             else:
                 abort(404)
         
-        logger.info(f"🖼️ Sirviendo imagen SEO: {filename}")
-        return send_from_directory(str(static_dir), filename)
+        # Versión en la URL = hash del contenido actual: se puede cachear para siempre
+        requested_version = request.args.get('v')
+        immutable = bool(requested_version) and requested_version == image_version(image_path)
+        max_age = IMMUTABLE_MAX_AGE if immutable else IMAGE_MAX_AGE
+        
+        # Variante WebP/AVIF del tamaño pedido (?w=) si el cliente la acepta; los derivados
+        # salen del mismo contenido, así que la URL versionada sigue siendo inmutable
+        variant_path, mime_type = select_variant(image_path, request.headers.get('Accept', ''),
+                                                 request.args.get('w', type=int))
+        
+        # send_from_directory añade ETag/Last-Modified y responde 304 a peticiones condicionales
+        response = send_from_directory(str(variant_path.parent), variant_path.name, mimetype=mime_type, max_age=max_age)
+        response.headers['Cache-Control'] = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+        response.headers['Vary'] = 'Accept'
+        logger.debug(f"🖼️ Sirviendo imagen SEO: {filename} ({response.status_code})")
+        return response
         
     except Exception as e:
         logger.error(f"❌ Error sirviendo imagen SEO {filename}: {e}")
-        abort(500)
\ No newline at end of file
+        abort(500)
+
+# ✅ COLA DE TRABAJOS SEO
+SEO_JOB_MAX_ARTICLES = int(os.getenv('SEO_JOB_MAX_ARTICLES', '10'))
+SEO_RUN_ID_PATTERN = re.compile(r'^[\w-]{1,64}$')
+
+@news_bp.route('/api/seo/jobs', methods=['GET'])
+@login_required
+def api_seo_jobs():
+    """Listar trabajos SEO recientes con su estado y progreso"""
+    jobs = get_job_runner().list_jobs()
+    return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]})
+
+@news_bp.route('/api/seo/jobs', methods=['POST'])
+@login_required
+def api_submit_seo_job():
+    """Lanzar el flujo SEO (o reanudar un run_id con resume=true)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        articles = data.get('articles')
+        if articles in (None, ''):
+            articles = None
+        else:
+            try:
+                if isinstance(articles, bool):
+                    raise ValueError(articles)
+                articles = int(articles)
+            except (TypeError, ValueError):
+                articles = 0
+            if not 1 <= articles <= SEO_JOB_MAX_ARTICLES:
+                return jsonify({'success': False,
+                                'error': f'articles debe ser un entero entre 1 y {SEO_JOB_MAX_ARTICLES}'}), 400
+        
+        # run_id es el nombre de la carpeta de checkpoints: nada de rutas
+        run_id = data.get('run_id') or None
+        if run_id is not None and (not isinstance(run_id, str) or not SEO_RUN_ID_PATTERN.match(run_id)):
+            return jsonify({'success': False, 'error': 'run_id inválido'}), 400
+        
+        job = submit_seo_job(run_id=run_id,
+                             resume=bool(data.get('resume', False)),
+                             articles=articles)
+        return jsonify({'success': True, 'job': job.to_dict()}), 202
+    except Exception as e:
+        logger.error(f"❌ Error encolando trabajo SEO: {e}")
+        return jsonify({'success': False, 'error': 'No se pudo encolar el trabajo SEO'}), 500
+
+@news_bp.route('/api/seo/jobs/<job_id>', methods=['GET'])
+@login_required
+def api_seo_job_status(job_id):
+    """Estado, progreso y resultado de un trabajo SEO"""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@news_bp.route('/api/seo/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def api_cancel_seo_job(job_id):
+    """Cancelar un trabajo SEO (termina tras los nodos en marcha; se puede reanudar)"""
+    job = get_job_runner().cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})